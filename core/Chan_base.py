@@ -4,7 +4,7 @@ from datetime import datetime
 
 class KLine:
     """基础K线类：存储单根K线的时间、价格、成交量信息"""
-    def __init__(self, time=0, open=0, high=0, low=0, close=0, volume=0, symbol="", index=0):
+    def __init__(self, time=0, open=0, high=0, low=0, close=0, volume=0, symbol="", index=0, amount=0):
         self.time = time          # 时间戳（方便后续转换）
         self.open = open          # 开盘价
         self.high = high          # 最高价
@@ -13,6 +13,7 @@ class KLine:
         self.volume = volume      # 成交量
         self.symbol = symbol      # 标的代码（如HS300）
         self.index = index        # K线序号
+        self.amount = amount      # 成交额
 
     def __repr__(self):
         time_str = datetime.fromtimestamp(self.time).strftime("%Y-%m-%d")
@@ -131,6 +132,7 @@ class Stroke:
         self.end_fractal = end_fractal      # 结束分型
         self.direction = 'up' if isinstance(start_fractal, BottomFractal) else 'down'
         self.is_confirmed = False           # 是否被确认（外部逻辑更新）
+        self.stats_index = None             # 统计索引（StrokeStatsIndex.attach绑定）
 
     def confirm(self):
         """标记笔被后续K线确认（如出现反向分型）"""
@@ -156,3 +158,91 @@ class Stroke:
     @property
     def start_point(self):
         return self.start_fractal.start_point
+
+    @property
+    def high(self):
+        return self.end_fractal.price if self.direction == 'up' else self.start_fractal.price
+    @property
+    def low(self):
+        return self.start_fractal.price if self.direction == 'up' else self.end_fractal.price
+
+    @property
+    def raw_begin(self):
+        return self.start_fractal.combined_klines[1].pos_begin   # 起点分型中间K线的首根原始K线序号
+    @property
+    def raw_end(self):
+        return self.end_fractal.combined_klines[1].pos_end       # 终点分型中间K线的末根原始K线序号
+
+    @property
+    def amplitude(self):
+        return self.high - self.low
+    @property
+    def bar_count(self):
+        return self.raw_end - self.raw_begin + 1
+    @property
+    def speed(self):
+        return self.amplitude / self.bar_count                    # 每根原始K线的平均涨跌幅度
+
+    # 成交量/成交额由StrokeStatsIndex.attach绑定的前缀和索引O(1)给出，未绑定时为None
+    @property
+    def volume(self):
+        if self.stats_index is None:
+            return None
+        return self.stats_index.volume(self.raw_begin, self.raw_end)
+    @property
+    def amount(self):
+        if self.stats_index is None:
+            return None
+        return self.stats_index.amount(self.raw_begin, self.raw_end)
+
+
+class Segment:
+    """缠论线段类：由至少3笔构成，起点为首笔起点，终点为末笔终点"""
+    def __init__(self, strokes):
+        if not strokes:
+            raise ValueError("线段需至少1笔")
+        self.strokes = strokes              # 构成线段的笔列表
+        self.direction = strokes[0].direction
+        self.is_confirmed = False           # 是否被特征序列分型确认
+
+    @property
+    def start_stroke(self):
+        return self.strokes[0]
+    @property
+    def end_stroke(self):
+        return self.strokes[-1]
+
+    @property
+    def start_fractal(self):
+        return self.strokes[0].start_fractal
+    @property
+    def end_fractal(self):
+        return self.strokes[-1].end_fractal
+
+    @property
+    def end_index(self):
+        return self.end_fractal.end_index
+    @property
+    def start_index(self):
+        return self.start_fractal.start_index
+
+    @property
+    def raw_begin(self):
+        return self.strokes[0].raw_begin
+    @property
+    def raw_end(self):
+        return self.strokes[-1].raw_end
+
+    @property
+    def high(self):
+        return max(stroke.high for stroke in self.strokes)
+    @property
+    def low(self):
+        return min(stroke.low for stroke in self.strokes)
+
+    def __repr__(self):
+        status = "Confirmed" if self.is_confirmed else "Unconfirmed"
+        start_time = datetime.fromtimestamp(self.start_fractal.time).strftime("%Y-%m-%d")
+        end_time = datetime.fromtimestamp(self.end_fractal.time).strftime("%Y-%m-%d")
+        return f"<{status} {self.direction.upper()} Segment | {len(self.strokes)} strokes | {start_time}~{end_time}"
+
@@ -4,7 +4,8 @@ from .Chan_base import (
     Fractal,
     TopFractal,
     BottomFractal,
-    Stroke
+    Stroke,
+    Segment
 )
 
 __all__ = [
@@ -13,5 +14,6 @@ __all__ = [
     "Fractal",
     "TopFractal",
     "BottomFractal",
-    "Stroke"
+    "Stroke",
+    "Segment"
 ]
\ No newline at end of file
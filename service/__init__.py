@@ -0,0 +1,20 @@
+# service/__init__.py
+from .scanner import (
+    ChanScanner,
+    ReplaySource,
+    CallbackSink,
+    FileSink,
+    SocketSink
+)
+from .screener import Screener, summarize_state
+# 本地分析服务见service.http_service（python -m service.http_service启动，不在此导入以免runpy重复导入警告）
+
+__all__ = [
+    "ChanScanner",
+    "ReplaySource",
+    "CallbackSink",
+    "FileSink",
+    "SocketSink",
+    "Screener",
+    "summarize_state"
+]
@@ -0,0 +1,338 @@
+# service/http_service.py
+import contextlib
+import glob
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from core.Chan_base import KLine
+from utils.incremental_chan import IncrementalChan
+from utils.data_loader import load_kline_frame, frame_to_klines, symbol_from_path
+from utils.snapshot import SnapshotWriter, load_snapshot
+from utils.stage_log import quiet
+from service.screener import summarize_state
+
+
+RAW_TIMEFRAME = "raw"       # 数据文件本身的周期
+_SECTIONS = ("summary", "strokes", "fractals", "combined")
+
+
+def resample_frame(df, timeframe):
+    """
+    把load_kline_frame返回的K线按pandas周期规则（如"60min"、"1D"、"W"）重采样，标签为周期结束时刻
+
+    timeframe为RAW_TIMEFRAME时原样返回
+    """
+    if timeframe == RAW_TIMEFRAME:
+        return df
+    agg = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    if 'amount' in df.columns:
+        agg['amount'] = 'sum'
+    out = df.set_index('date').resample(timeframe, label='right', closed='right').agg(agg)
+    return out.dropna(subset=['open']).reset_index()
+
+
+def bars_from_json(items, symbol=""):
+    """
+    JSON中的K线（字典列表，时间为time（时间戳）或date（日期字符串））→ KLine列表
+
+    date按pd.Timestamp(date).timestamp()换算，与load_klines一致；价格与成交量转换为float，
+    格式不对时抛出TypeError/ValueError（缺少字段为KeyError），不会把半成品K线交给分析器
+    """
+    if not isinstance(items, list):
+        raise TypeError("bars须为K线字典的列表")
+    klines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise TypeError(f"K线须为JSON对象：{item!r}")
+        t = float(item["time"]) if "time" in item else pd.Timestamp(item["date"]).timestamp()
+        klines.append(KLine(time=t, open=float(item.get("open", item["close"])), high=float(item["high"]),
+                            low=float(item["low"]), close=float(item["close"]), volume=float(item.get("volume", 0)),
+                            symbol=symbol, amount=float(item.get("amount", 0))))
+    return klines
+
+
+class _CacheEntry:
+    """内部类：一个标的/周期的热缓存"""
+    __slots__ = ("analyzer", "lock")
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.lock = threading.Lock()
+
+
+class AnalysisCache:
+    """
+    常驻内存的分析缓存：每个(标的, 周期)一个IncrementalChan，合并K线/分型/笔常驻内存
+
+    - 数据文件（CSV）只在首次请求该标的/周期时读取一次，之后的请求直接读缓存
+    - 追加K线只增量更新（时间不晚于最后一根的K线忽略，可重复发送）
+    - 各缓存项有独立的锁，不同标的的请求可并行处理
+    - 可由快照（utils.snapshot）预热，关闭时保存快照
+    """
+    def __init__(self, paths="data/*.csv", snapshot_path=None):
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths))
+        self.paths = {symbol_from_path(p): p for p in paths}     # 标的 → 数据文件
+        self.snapshot_path = snapshot_path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        if snapshot_path and os.path.exists(snapshot_path):
+            analyzers, _ = load_snapshot(snapshot_path)
+            for key, analyzer in analyzers.items():
+                symbol, _, timeframe = key.rpartition("@")
+                analyzer.symbol = symbol
+                self._entries[(symbol, timeframe)] = _CacheEntry(analyzer)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def symbols(self):
+        """可用的标的及已缓存的周期"""
+        cached = {}
+        for symbol, timeframe in list(self._entries):
+            cached.setdefault(symbol, []).append(timeframe)
+        return {symbol: sorted(cached.get(symbol, [])) for symbol in sorted(set(self.paths) | set(cached))}
+
+    def _entry(self, symbol, timeframe):
+        """内部函数：取缓存项，不存在时从数据文件加载"""
+        key = (symbol, timeframe)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                analyzer = IncrementalChan(symbol)
+                path = self.paths.get(symbol)
+                if path is not None:
+                    df = resample_frame(load_kline_frame(path), timeframe)
+                    analyzer.extend(frame_to_klines(df, symbol))
+                entry = self._entries[key] = _CacheEntry(analyzer)
+        return entry
+
+    def append(self, symbol, bars, timeframe=RAW_TIMEFRAME):
+        """
+        追加K线（KLine列表或JSON字典列表）；只能追加到原始周期（追加的K线不做重采样）
+
+        返回:
+            int: 实际追加的K线数量
+        """
+        if timeframe != RAW_TIMEFRAME:
+            raise ValueError(f"只能向原始周期（{RAW_TIMEFRAME}）追加K线：{timeframe}")
+        if not bars or not all(isinstance(k, KLine) for k in bars):
+            bars = bars_from_json(bars, symbol)
+        entry = self._entry(symbol, timeframe)
+        with entry.lock:
+            analyzer = entry.analyzer
+            last_time = analyzer.klines[-1].time if analyzer.klines else None
+            new_bars = [k for k in bars if last_time is None or k.time > last_time]
+            analyzer.extend(new_bars)
+        return len(new_bars)
+
+    def analyze(self, symbol, timeframe=RAW_TIMEFRAME, include=("summary", "strokes"), tail=None):
+        """
+        返回标的的结构与信号
+
+        参数:
+            include: 返回的部分，取值见_SECTIONS
+            tail: strokes/fractals/combined只返回最后tail条（None为全部）
+        返回:
+            dict: 各部分的JSON可序列化结果
+        """
+        unknown = set(include) - set(_SECTIONS)
+        if unknown:
+            raise ValueError(f"未知的返回内容：{sorted(unknown)}")
+        if symbol not in self.paths and (symbol, timeframe) not in self._entries:
+            raise KeyError(f"未知的标的：{symbol}")
+        entry = self._entry(symbol, timeframe)
+        with entry.lock:
+            analyzer = entry.analyzer
+            result = {"symbol": symbol, "timeframe": timeframe, "bars": len(analyzer.klines)}
+            if "summary" in include:
+                result["summary"] = summarize_state(analyzer)
+            if "strokes" in include:
+                result["strokes"] = [
+                    {"direction": s.direction, "start_time": s.start_fractal.time, "end_time": s.end_fractal.time,
+                     "start_price": s.start_fractal.price, "end_price": s.end_fractal.price}
+                    for s in analyzer.strokes[-tail if tail else None:]]
+            if "fractals" in include:
+                tops, bottoms = analyzer.fractals()
+                fractals = sorted(tops + bottoms, key=lambda f: f.combined_klines[1].index)
+                result["fractals"] = [
+                    {"type": f.fractal_type, "time": f.time, "price": f.price, "confirmed": f.is_confirmed}
+                    for f in fractals[-tail if tail else None:]]
+            if "combined" in include:
+                result["combined"] = [
+                    {"time": k.data.time, "high": k.high, "low": k.low, "pos_begin": k.pos_begin, "pos_end": k.pos_end}
+                    for k in analyzer.combined[-tail if tail else None:]]
+        return result
+
+    def analyze_many(self, symbols, timeframe=RAW_TIMEFRAME, include=("summary", "strokes"), tail=None):
+        """批量分析：返回{"results": {标的: 结果}, "errors": {标的: 错误信息}}"""
+        results, errors = {}, {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self.analyze(symbol, timeframe, include, tail)
+            except (KeyError, ValueError) as e:
+                errors[symbol] = str(e.args[0]) if e.args else str(e)
+        return {"results": results, "errors": errors}
+
+    def save_snapshot(self, path=None):
+        """把全部缓存保存为快照（键为"标的@周期"）"""
+        path = path or self.snapshot_path
+        if self._writer is None or self._writer.path != path:
+            self._writer = SnapshotWriter(path)
+        entries = list(self._entries.items())
+        with contextlib.ExitStack() as stack:
+            for _, entry in entries:
+                stack.enter_context(entry.lock)
+            return self._writer.write({f"{symbol}@{timeframe}": entry.analyzer for (symbol, timeframe), entry in entries})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    HTTP接口（JSON）：
+        GET  /health                           → {"status": "ok", "cached": 缓存项数量}
+        GET  /symbols                          → {标的: [已缓存的周期]}
+        GET  /analyze?symbols=a,b&timeframe=raw&include=summary,strokes&tail=20
+        POST /analyze  {"symbols": [...], "timeframe": ..., "include": [...], "tail": ...}
+        POST /append   {"symbol": ..., "bars": [...]} 或 {"bars": {标的: [...]}}，只能追加到原始周期；
+                       返回{"appended": {标的: 追加数量}}，带include时同时返回分析结果
+    请求格式错误返回400，其他异常返回500（均为{"error": ...}）
+    """
+    cache = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+        if not isinstance(body, dict):
+            raise TypeError("请求体须为JSON对象")
+        return body
+
+    def _analyze(self, params):
+        symbols = params.get("symbols") or list(self.cache.paths)
+        if isinstance(symbols, str):
+            symbols = [s for s in symbols.split(",") if s]
+        include = params.get("include") or ("summary", "strokes")
+        if isinstance(include, str):
+            include = include.split(",")
+        tail = int(params["tail"]) if params.get("tail") else None
+        return self.cache.analyze_many(symbols, params.get("timeframe") or RAW_TIMEFRAME, include, tail)
+
+    def do_GET(self):
+        # 各请求在自己的线程中处理，阶段输出的开关按请求设置
+        with quiet(not self.verbose):
+            self._get()
+
+    def do_POST(self):
+        with quiet(not self.verbose):
+            self._post()
+
+    def _get(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/health":
+                self._send(200, {"status": "ok", "cached": len(self.cache)})
+            elif url.path == "/symbols":
+                self._send(200, self.cache.symbols())
+            elif url.path == "/analyze":
+                self._send(200, self._analyze(params))
+            else:
+                self._send(404, {"error": f"未知的路径：{url.path}"})
+        except KeyError as e:
+            self._send(400, {"error": f"缺少字段：{e.args[0]}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _post(self):
+        url = urlparse(self.path)
+        try:
+            params = self._body()
+            if url.path == "/analyze":
+                self._send(200, self._analyze(params))
+            elif url.path == "/append":
+                timeframe = params.get("timeframe") or RAW_TIMEFRAME
+                batches = params["bars"] if isinstance(params["bars"], dict) else {params["symbol"]: params["bars"]}
+                # 先全部解析，格式错误时整个请求返回400，不会只追加一部分标的
+                batches = {symbol: bars_from_json(bars, symbol) for symbol, bars in batches.items()}
+                appended = {symbol: self.cache.append(symbol, bars, timeframe) for symbol, bars in batches.items()}
+                payload = {"appended": appended}
+                if params.get("include"):
+                    payload.update(self._analyze(dict(params, symbols=list(batches))))
+                self._send(200, payload)
+            else:
+                self._send(404, {"error": f"未知的路径：{url.path}"})
+        except KeyError as e:
+            self._send(400, {"error": f"缺少字段：{e.args[0]}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def make_server(cache, host="127.0.0.1", port=8765, verbose=False):
+    """
+    创建绑定到cache的HTTP服务（ThreadingHTTPServer，调用serve_forever启动）
+
+    verbose: 是否保留请求处理中笔识别等阶段的打印输出
+    """
+    handler = type("ChanHandler", (_Handler,), {"cache": cache, "verbose": verbose})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(paths="data/*.csv", host="127.0.0.1", port=8765, snapshot_path=None, preload=False, verbose=False):
+    """
+    启动本地分析服务（阻塞，Ctrl+C退出；设置snapshot_path时启动前由快照预热、退出时保存快照）
+
+    参数:
+        paths: CSV路径列表或通配符
+        preload: 启动时即加载全部标的的原始周期
+        verbose: 是否保留笔识别等阶段的打印输出
+    """
+    cache = AnalysisCache(paths, snapshot_path)
+    server = make_server(cache, host, port, verbose)
+    print(f"[分析服务] http://{host}:{server.server_port} （{len(cache.paths)} 个标的）")
+    try:
+        if preload:
+            with quiet(not verbose):
+                for symbol in cache.paths:
+                    cache.analyze(symbol, include=("summary",))
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if snapshot_path:
+            cache.save_snapshot()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="easyChan本地分析服务")
+    parser.add_argument("--data", default="data/*.csv", help="CSV文件通配符")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--snapshot", default=None, help="快照文件路径")
+    parser.add_argument("--preload", action="store_true", help="启动时加载全部标的")
+    parser.add_argument("--verbose", action="store_true", help="保留各阶段的打印输出")
+    args = parser.parse_args()
+    serve(args.data, args.host, args.port, args.snapshot, args.preload, args.verbose)
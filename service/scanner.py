@@ -0,0 +1,373 @@
+# service/scanner.py
+import asyncio
+import contextvars
+import glob
+import heapq
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.incremental_chan import IncrementalChan
+from utils.bar_array import BAR_DTYPE, klines_to_array, array_to_klines
+from utils.snapshot import SnapshotWriter, load_snapshot
+from utils.signal_detector import detect_second_buy_sell
+from utils.data_loader import load_klines, symbol_from_path
+
+
+def _analyse(analyzer):
+    """
+    工作线程/进程中执行的重算任务：识别笔并判断二买二卖
+
+    返回:
+        tuple: (笔摘要列表[(起点时间, 终点时间, 起点价格, 终点价格, 方向)], is_second_buy, is_second_sell)
+    """
+    strokes = analyzer.strokes
+    tops, bottoms = analyzer.fractals()
+    is_second_buy, is_second_sell = detect_second_buy_sell(analyzer.combined, tops, bottoms, strokes)
+    summary = [(s.start_fractal.time, s.end_fractal.time, s.start_fractal.price, s.end_fractal.price, s.direction)
+               for s in strokes]
+    return summary, is_second_buy, is_second_sell
+
+
+# ----------------------------------------------------------------------
+# 事件输出
+# ----------------------------------------------------------------------
+class CallbackSink:
+    """回调输出：fn(event)，fn可以是普通函数或协程函数"""
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def publish(self, event):
+        result = self.fn(event)
+        if asyncio.iscoroutine(result):
+            await result
+
+    async def close(self):
+        pass
+
+
+class FileSink:
+    """文件输出：每个事件写一行JSON"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    async def publish(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    async def close(self):
+        self._file.close()
+
+
+class SocketSink:
+    """本地套接字输出：连接到host:port（或unix_path），每个事件发送一行JSON"""
+    def __init__(self, host="127.0.0.1", port=None, unix_path=None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self._writer = None
+
+    async def publish(self, event):
+        if self._writer is None:
+            if self.unix_path:
+                _, self._writer = await asyncio.open_unix_connection(self.unix_path)
+            else:
+                _, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+        await self._writer.drain()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+# ----------------------------------------------------------------------
+# 行情源
+# ----------------------------------------------------------------------
+class ReplaySource:
+    """
+    回放行情源：读取多个CSV文件，按时间顺序交错输出(symbol, kline)，用于替代实时行情
+
+    参数:
+        paths: CSV文件路径列表或通配符（默认data/*.csv）
+        speed: 回放速度倍数，0表示不等待（尽快回放）
+        tail_n: 每个文件只回放最后N根K线
+    """
+    def __init__(self, paths="data/*.csv", speed=0, tail_n=None):
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths))
+        self.series = {symbol_from_path(p): load_klines(p, tail_n=tail_n) for p in paths}
+        self.speed = speed
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        streams = [[(k.time, symbol, k) for k in klines] for symbol, klines in self.series.items()]
+        last_time = None
+        for bar_time, symbol, kline in heapq.merge(*streams, key=lambda x: (x[0], x[1])):
+            if self.speed and last_time is not None and bar_time > last_time:
+                await asyncio.sleep((bar_time - last_time) / self.speed)
+            else:
+                await asyncio.sleep(0)
+            last_time = bar_time
+            yield symbol, kline
+
+
+# ----------------------------------------------------------------------
+# 扫描器
+# ----------------------------------------------------------------------
+class _SymbolState:
+    """内部类：单个标的的分析状态"""
+    __slots__ = ("analyzer", "backlog", "seq", "busy", "queued", "strokes", "last_signal", "last_arrival")
+
+    def __init__(self, symbol):
+        self.analyzer = IncrementalChan(symbol)
+        self.backlog = []         # 重算期间到达、尚未并入分析器的K线
+        self.seq = 0              # 最近一次收到K线的全局序号（越大越活跃）
+        self.busy = False         # 是否正在工作池中重算
+        self.queued = False       # 是否已在待重算队列中
+        self.strokes = []         # 上次发布时的笔摘要
+        self.last_signal = None   # 上次发布的信号：(事件名, 当时的合并K线数)
+        self.last_arrival = None  # 最近一根待处理K线的到达时刻
+
+
+class ChanScanner:
+    """
+    asyncio多标的实时扫描器
+
+    - K线按标的路由到各自的IncrementalChan（合并K线/分型在事件循环内增量更新，开销很小）
+    - 笔识别等重计算放到线程池执行；同一标的的多次重算请求会合并，只计算最新状态。
+      重算是纯Python代码，受GIL限制，线程池只让重算与行情I/O交替进行，不能多核并行；
+      executor须为线程池（分析器在原处更新并缓存笔，进程池每次都要序列化整个分析器且丢弃子进程中的笔缓存）
+    - 某个标的重算或发布出错时记录到errors（stats["errors"]计数），丢弃其待处理状态，不影响其他标的
+    - 待重算标的按最近活跃程度排序，最近收到K线的标的优先
+    - 输入队列有界，行情源写入过快时feed会等待（背压）
+    - 笔变化与二买/二卖点以事件形式发布到各个输出（CallbackSink/FileSink/SocketSink）；
+      同一根合并K线上持续成立的信号只发布一次
+    - save_snapshot/restore保存、恢复各标的状态（utils.snapshot），重启后无需从全部历史重算
+    """
+    def __init__(self, sinks=(), executor=None, max_workers=4, queue_size=10000):
+        self.sinks = list(sinks)
+        self.max_workers = max_workers
+        self._executor = executor
+        self._own_executor = executor is None
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._ready = []                      # 待重算标的堆：(-seq, symbol)
+        self._ready_event = asyncio.Event()
+        self._states = {}
+        self._seq = 0
+        self._idle = asyncio.Event()          # 工作协程空闲时置位，run据此等待全部重算完成
+        self.stats = {"bars": 0, "recomputes": 0, "events": 0, "errors": 0, "max_latency": 0.0}
+        self.errors = {}                      # 标的 → 最近一次错误信息
+        self._snapshot_writer = None
+
+    def state(self, symbol):
+        """返回标的的增量分析器（不存在则为None）"""
+        s = self._states.get(symbol)
+        return s.analyzer if s else None
+
+    def save_snapshot(self, path):
+        """
+        保存各标的的分析状态快照（同一路径重复保存时只编码新增部分）
+
+        重算中到达、尚未并入分析器的K线记录在快照的附加信息中，恢复时补入
+        返回:
+            int: 写入的字节数
+        """
+        if self._snapshot_writer is None or self._snapshot_writer.path != path:
+            self._snapshot_writer = SnapshotWriter(path)
+        analyzers = {symbol: state.analyzer for symbol, state in self._states.items()}
+        backlog = {symbol: klines_to_array(state.backlog).tolist()
+                   for symbol, state in self._states.items() if state.backlog}
+        return self._snapshot_writer.write(analyzers, {"backlog": backlog})
+
+    def restore(self, path):
+        """
+        由快照恢复各标的的分析状态（在run之前调用）；快照中已有的笔不会重复发布
+
+        返回:
+            int: 恢复的标的数量
+        """
+        analyzers, meta = load_snapshot(path)
+        for symbol, analyzer in analyzers.items():
+            state = self._states[symbol] = _SymbolState(symbol)
+            state.analyzer = analyzer
+            if analyzer.klines:
+                state.strokes, is_second_buy, is_second_sell = _analyse(analyzer)
+                for flag, name in ((is_second_buy, "second_buy"), (is_second_sell, "second_sell")):
+                    if flag:
+                        state.last_signal = (name, len(analyzer.combined))
+            backlog = meta["backlog"].get(symbol)
+            if backlog:
+                analyzer.extend(array_to_klines(np.array([tuple(row) for row in backlog], dtype=BAR_DTYPE), symbol))
+                self._seq += 1
+                state.seq = self._seq
+                self._schedule(symbol, state)
+        return len(analyzers)
+
+    async def feed(self, symbol, kline):
+        """写入一根已完成的K线（队列满时等待）"""
+        await self._queue.put((symbol, kline, time.perf_counter()))
+
+    def _route(self, symbol, kline, arrival):
+        """内部函数：把K线并入标的状态并登记重算"""
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = _SymbolState(symbol)
+        self._seq += 1
+        state.seq = self._seq
+        if state.last_arrival is None:
+            state.last_arrival = arrival
+        if state.busy:
+            state.backlog.append(kline)
+            return
+        state.analyzer.append(kline)
+        self._schedule(symbol, state)
+
+    def _schedule(self, symbol, state):
+        """内部函数：登记（或以新的优先级重新登记）待重算标的"""
+        state.queued = True
+        heapq.heappush(self._ready, (-state.seq, symbol))
+        self._ready_event.set()
+
+    async def _dispatch(self):
+        """内部协程：从输入队列取K线并路由"""
+        while True:
+            symbol, kline, arrival = await self._queue.get()
+            self.stats["bars"] += 1
+            self._route(symbol, kline, arrival)
+            self._queue.task_done()
+
+    def _pop_ready(self):
+        """内部函数：取出优先级最高的待重算标的（跳过过期条目）"""
+        while self._ready:
+            neg_seq, symbol = heapq.heappop(self._ready)
+            state = self._states[symbol]
+            if state.queued and not state.busy and -neg_seq == state.seq:
+                state.queued = False
+                return symbol, state
+        return None, None
+
+    async def _worker(self):
+        """内部协程：重算任务调度"""
+        loop = asyncio.get_running_loop()
+        while True:
+            symbol, state = self._pop_ready()
+            if symbol is None:
+                self._idle.set()
+                self._ready_event.clear()
+                await self._ready_event.wait()
+                continue
+
+            state.busy = True
+            arrival, state.last_arrival = state.last_arrival, None
+            try:
+                try:
+                    # 在当前上下文中执行，使调用方的utils.stage_log.quiet对工作线程同样生效
+                    result = await loop.run_in_executor(self._executor, contextvars.copy_context().run,
+                                                        _analyse, state.analyzer)
+                finally:
+                    state.busy = False
+                self.stats["recomputes"] += 1
+                await self._publish_changes(symbol, state, *result)
+            except Exception as e:
+                self._fail(symbol, state, e)
+                continue
+            finally:
+                self._idle.set()
+            if arrival is not None:
+                self.stats["max_latency"] = max(self.stats["max_latency"], time.perf_counter() - arrival)
+
+            # 重算期间到达的K线
+            if state.backlog:
+                backlog, state.backlog = state.backlog, []
+                for kline in backlog:
+                    state.analyzer.append(kline)
+                self._schedule(symbol, state)
+
+    def _fail(self, symbol, state, error):
+        """内部函数：记录标的的重算/发布错误，并清除其待处理状态（之后收到新K线时重新登记）"""
+        self.stats["errors"] += 1
+        self.errors[symbol] = f"{type(error).__name__}: {error}"
+        print(f"[扫描器] {symbol} 处理出错：{self.errors[symbol]}")
+        for kline in state.backlog:
+            state.analyzer.append(kline)
+        state.backlog = []
+        state.queued = False
+        state.last_arrival = None
+
+    def _has_work(self):
+        """内部函数：是否还有待重算或正在重算的标的"""
+        return any(s.queued or s.busy or s.backlog for s in self._states.values())
+
+    async def _publish_changes(self, symbol, state, strokes, is_second_buy, is_second_sell):
+        """内部协程：比较笔的变化并发布事件"""
+        common = 0
+        for old, new in zip(state.strokes, strokes):
+            if old != new:
+                break
+            common += 1
+        state.strokes = strokes
+        for start_time, end_time, start_price, end_price, direction in strokes[common:]:
+            await self.publish({
+                "type": "stroke", "symbol": symbol, "direction": direction,
+                "start_time": start_time, "end_time": end_time,
+                "start_price": start_price, "end_price": end_price,
+            })
+
+        last_kline = state.analyzer.klines[-1]
+        for flag, name in ((is_second_buy, "second_buy"), (is_second_sell, "second_sell")):
+            signal = (name, len(state.analyzer.combined))
+            if flag and signal != state.last_signal:
+                state.last_signal = signal
+                await self.publish({"type": name, "symbol": symbol, "time": last_kline.time,
+                                    "price": last_kline.close, "index": last_kline.index})
+
+    async def publish(self, event):
+        """把事件发布到所有输出"""
+        self.stats["events"] += 1
+        for sink in self.sinks:
+            await sink.publish(event)
+
+    async def _snapshot_loop(self, path, interval):
+        """内部协程：定时保存快照"""
+        while True:
+            await asyncio.sleep(interval)
+            self.save_snapshot(path)
+
+    async def run(self, source, snapshot_path=None, snapshot_interval=60.0):
+        """
+        消费行情源直到结束，并等待所有重算完成
+
+        参数:
+            source: 异步可迭代对象，产出(symbol, kline)，如ReplaySource
+            snapshot_path: 快照文件路径（None为不保存）；运行期间每snapshot_interval秒保存一次，结束时再保存一次
+            snapshot_interval: 快照间隔（秒）
+        """
+        if self._own_executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        tasks = [asyncio.create_task(self._dispatch())]
+        tasks += [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        if snapshot_path:
+            tasks.append(asyncio.create_task(self._snapshot_loop(snapshot_path, snapshot_interval)))
+        try:
+            async for symbol, kline in source:
+                await self.feed(symbol, kline)
+            await self._queue.join()
+            while self._has_work():
+                self._idle.clear()
+                await self._idle.wait()
+            if snapshot_path:
+                self.save_snapshot(snapshot_path)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for sink in self.sinks:
+                await sink.close()
+            if self._own_executor:
+                self._executor.shutdown(wait=True)
@@ -0,0 +1,223 @@
+# service/screener.py
+import glob
+import heapq
+import os
+import time
+from utils.incremental_chan import IncrementalChan
+from utils.signal_detector import detect_second_buy_sell
+from utils.stroke_identifier import STROKE_METHODS
+from utils.data_loader import load_kline_frame, frame_to_klines, symbol_from_path
+from utils.stage_log import quiet
+from utils.snapshot import SnapshotWriter, load_snapshot
+
+
+# 可用的筛选条件
+CONDITION_KEYS = (
+    "direction",            # 当前（最后）一笔的方向：'up'/'down'
+    "last_fractal",         # 最后一个分型（含临时分型）的类型：'top'/'bottom'
+    "second_buy",           # 是否处于二买点
+    "second_sell",          # 是否处于二卖点
+    "min_amplitude", "max_amplitude",           # 当前一笔的幅度（价格）
+    "min_amplitude_pct", "max_amplitude_pct",   # 当前一笔的幅度（相对起点价格）
+    "where",                # 自定义条件：where(summary) → bool
+)
+
+
+def summarize_state(analyzer, pattern_strokes=4):
+    """
+    由增量分析器的当前状态生成筛选摘要
+
+    返回:
+        dict: symbol, time/close（最后一根K线）, bars, strokes, direction, amplitude, amplitude_pct, stroke_bars,
+              last_fractal, last_fractal_time, second_buy, second_sell（无K线或无笔时相应字段为None/0）
+    """
+    last_kline = analyzer.klines[-1] if analyzer.klines else None
+    strokes = analyzer.strokes if analyzer.klines else []
+    tops, bottoms = analyzer.fractals()
+    last_top = tops[-1] if tops else None
+    last_bottom = bottoms[-1] if bottoms else None
+    if last_top is None or (last_bottom is not None and last_bottom.end_index > last_top.end_index):
+        last_fractal = last_bottom
+    else:
+        last_fractal = last_top
+
+    if strokes:
+        stroke = strokes[-1]
+        start_price = stroke.start_fractal.price
+        direction, amplitude, stroke_bars = stroke.direction, stroke.amplitude, stroke.bar_count
+        amplitude_pct = amplitude / abs(start_price) if start_price else 0.0
+        is_second_buy, is_second_sell = detect_second_buy_sell(analyzer.combined, tops, bottoms, strokes, pattern_strokes)
+    else:
+        direction, amplitude, amplitude_pct, stroke_bars = None, 0.0, 0.0, 0
+        is_second_buy = is_second_sell = False
+
+    return {
+        "symbol": analyzer.symbol,
+        "time": last_kline.time if last_kline else None,
+        "close": last_kline.close if last_kline else None,
+        "bars": len(analyzer.klines),
+        "strokes": len(strokes),
+        "direction": direction,
+        "amplitude": amplitude,
+        "amplitude_pct": amplitude_pct,
+        "stroke_bars": stroke_bars,
+        "last_fractal": last_fractal.fractal_type if last_fractal else None,
+        "last_fractal_time": last_fractal.time if last_fractal else None,
+        "second_buy": is_second_buy,
+        "second_sell": is_second_sell,
+    }
+
+
+def match(summary, conditions):
+    """判断摘要是否满足全部条件（条件键见CONDITION_KEYS，值为None的条件忽略）"""
+    for key, value in conditions.items():
+        if value is None:
+            continue
+        if key in ("direction", "last_fractal", "second_buy", "second_sell"):
+            if summary[key] != value:
+                return False
+        elif key.startswith("min_"):
+            if summary[key[4:]] < value:
+                return False
+        elif key.startswith("max_"):
+            if summary[key[4:]] > value:
+                return False
+        elif key == "where":
+            if not value(summary):
+                return False
+    return True
+
+
+class Screener:
+    """
+    全市场选股器：保存每个标的的增量分析状态，每次运行只并入新增K线
+
+    - 每个标的一个IncrementalChan，记录最后一根K线时间；更新时只追加时间更晚的K线
+    - 没有新K线的标的直接复用上次的摘要（见summarize_state），筛选只在摘要上进行
+    - 按条件过滤后用堆取排序前k名
+    - save/load把全部状态保存为快照（utils.snapshot），下次运行在此基础上增量更新
+    - stroke_method="greedy"时笔改用单遍贪心识别（见identify_strokes_greedy），适合大范围初筛
+    """
+    def __init__(self, pattern_strokes=4, stroke_method="dp"):
+        self.pattern_strokes = pattern_strokes
+        self.stroke_method = stroke_method
+        self.analyzers = {}         # 标的 → IncrementalChan
+        self.summaries = {}         # 标的 → 最近一次的摘要
+        self.stats = {"symbols": 0, "updated": 0, "bars": 0, "seconds": 0.0}
+        self._writer = None
+
+    def __len__(self):
+        return len(self.analyzers)
+
+    def last_time(self, symbol):
+        """标的最后一根K线的时间（无状态为None）"""
+        analyzer = self.analyzers.get(symbol)
+        return analyzer.klines[-1].time if analyzer and analyzer.klines else None
+
+    def update(self, symbol, kline_list):
+        """
+        并入标的的K线（只追加时间晚于已有最后一根K线的部分）
+
+        返回:
+            int: 新追加的K线数量
+        """
+        analyzer = self.analyzers.get(symbol)
+        if analyzer is None:
+            analyzer = self.analyzers[symbol] = IncrementalChan(symbol, self.stroke_method)
+        last_time = self.last_time(symbol)
+        new_klines = [k for k in kline_list if last_time is None or k.time > last_time]
+        if new_klines or symbol not in self.summaries:
+            analyzer.extend(new_klines)
+            self.summaries[symbol] = summarize_state(analyzer, self.pattern_strokes)
+        return len(new_klines)
+
+    def update_csv(self, file_path, symbol=None):
+        """读取CSV文件并并入新增K线（只把新增部分转换为KLine对象）"""
+        symbol = symbol if symbol is not None else symbol_from_path(file_path)
+        df = load_kline_frame(file_path)
+        last_time = self.last_time(symbol)
+        if last_time is not None:
+            df = df[df['date'].map(lambda d: d.timestamp()) > last_time]
+        return self.update(symbol, frame_to_klines(df, symbol))
+
+    def update_all(self, paths, verbose=False):
+        """
+        批量更新
+
+        参数:
+            paths: CSV路径列表或通配符，或{标的: KLine列表}字典
+            verbose: 是否保留笔识别等阶段的打印输出
+        返回:
+            dict: 本次更新的统计（symbols/updated/bars/seconds）
+        """
+        start = time.perf_counter()
+        with quiet(not verbose):
+            if isinstance(paths, dict):
+                counts = [self.update(symbol, kline_list) for symbol, kline_list in paths.items()]
+            else:
+                if isinstance(paths, str):
+                    paths = sorted(glob.glob(paths))
+                counts = [self.update_csv(path) for path in paths]
+        self.stats = {
+            "symbols": len(counts),
+            "updated": sum(1 for c in counts if c),
+            "bars": sum(counts),
+            "seconds": time.perf_counter() - start,
+        }
+        print(f"[选股] 更新 {self.stats['symbols']} 个标的（{self.stats['updated']} 个有新K线，"
+              f"共 {self.stats['bars']} 根），耗时 {self.stats['seconds']:.2f}s")
+        return dict(self.stats)
+
+    def screen(self, conditions=None, rank_by="amplitude_pct", k=20, ascending=False):
+        """
+        筛选并排序
+
+        参数:
+            conditions: 条件字典（键见CONDITION_KEYS），如{"second_buy": True, "min_amplitude_pct": 0.05}
+            rank_by: 排序字段名，或rank(summary) → 数值
+            k: 返回前k名（None为全部）
+            ascending: True取最小的k个
+        返回:
+            list: 满足条件的摘要字典，按rank_by排序
+        """
+        conditions = conditions or {}
+        unknown = set(conditions) - set(CONDITION_KEYS)
+        if unknown:
+            raise ValueError(f"未知的筛选条件：{sorted(unknown)}")
+        key = rank_by if callable(rank_by) else (lambda s: s[rank_by])
+        matched = (s for s in self.summaries.values() if match(s, conditions))
+        if k is None:
+            return sorted(matched, key=key, reverse=not ascending)
+        return (heapq.nsmallest if ascending else heapq.nlargest)(k, matched, key=key)
+
+    def save(self, path):
+        """保存全部标的的分析状态（快照格式见utils.snapshot，重复保存到同一路径时只编码新增部分）"""
+        if self._writer is None or self._writer.path != path:
+            self._writer = SnapshotWriter(path)
+        return self._writer.write(self.analyzers, {"pattern_strokes": self.pattern_strokes,
+                                                  "stroke_method": self.stroke_method})
+
+    @classmethod
+    def load(cls, path, pattern_strokes=None, stroke_method=None):
+        """
+        读取save保存的状态并重建摘要（文件不存在时返回空的Screener）
+
+        参数:
+            pattern_strokes, stroke_method: None时沿用快照中保存的值；给出且与快照不同时以给出的为准，
+                笔按新的识别方式重新识别（首次访问时），摘要按新参数重建
+        """
+        if stroke_method is not None and stroke_method not in STROKE_METHODS:
+            raise ValueError(f"未知的笔识别方式：{stroke_method}")
+        if not os.path.exists(path):
+            return cls(4 if pattern_strokes is None else pattern_strokes, stroke_method or "dp")
+        analyzers, meta = load_snapshot(path)
+        screener = cls(meta["pattern_strokes"] if pattern_strokes is None else pattern_strokes,
+                       stroke_method or meta.get("stroke_method", "dp"))
+        for analyzer in analyzers.values():
+            # 笔缓存的标识含识别方式，方式改变后缓存自动失效
+            analyzer.stroke_method = screener.stroke_method
+        screener.analyzers = analyzers
+        with quiet(True):
+            for symbol, analyzer in analyzers.items():
+                screener.summaries[symbol] = summarize_state(analyzer, screener.pattern_strokes)
+        return screener
@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# 测试直接导入仓库根目录下的core/utils/service，并以根目录为工作目录读取data/*.csv
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,82 @@
+# tests/test_backtest.py
+import numpy as np
+import pytest
+from utils.backtest import backtest_signals, backtest_universe, signals_from_points, target_positions
+
+BARS = np.array([(t, o, o + 0.5) for t, o in enumerate([10.0, 11.0, 12.0, 13.0, 14.0, 15.0])],
+                dtype=[('time', 'f8'), ('open', 'f8'), ('close', 'f8')])
+SIGNALS = np.array([1, 0, -1, 0, 1, 0])
+COSTS = dict(multiplier=10.0, size=2.0, slippage=0.1, commission_per_unit=1.0, commission_rate=0.001)
+
+
+def test_target_positions():
+    assert target_positions(SIGNALS, "both").tolist() == [1, 1, -1, -1, 1, 1]
+    assert target_positions(SIGNALS, "long").tolist() == [1, 1, 0, 0, 1, 1]
+    assert target_positions(SIGNALS, "short").tolist() == [0, 0, -1, -1, 0, 0]
+    with pytest.raises(ValueError):
+        target_positions(SIGNALS, "hedge")
+
+
+def test_reversal_pnl_and_costs():
+    # 下一根开盘成交；单边成本/手 = 0.1*10 + 0.001*开盘价*10 + 1 = 2 + 0.01*开盘价
+    result = backtest_signals(BARS, SIGNALS, mode="both", initial_capital=1000.0, **COSTS)
+    assert result["position"].tolist() == [0, 1, 1, -1, -1, 1]
+    trades = result["trades"]
+    assert trades['direction'].tolist() == [1, -1, 1]
+    assert trades['entry_index'].tolist() == [1, 3, 5]
+    assert trades['exit_index'].tolist() == [3, 5, 5]
+    assert trades['entry_price'].tolist() == [11.0, 13.0, 15.0]
+    assert trades['exit_price'].tolist() == [13.0, 15.0, 15.5]     # 未平仓按最后收盘价
+    assert trades['is_open'].tolist() == [False, False, True]
+    np.testing.assert_allclose(trades['cost'], [(2.11 + 2.13) * 2, (2.13 + 2.15) * 2, 2.15 * 2])
+    np.testing.assert_allclose(trades['pnl'], [40 - 8.48, -40 - 8.56, 10 - 4.30])
+    # 每根K线盈亏：反手K线成交量为2倍手数
+    np.testing.assert_allclose(result["pnl"], [0.0, 10 - 4.22, 20.0, -8.52, -20.0, -8.60])
+    assert result["pnl"].sum() == pytest.approx(trades['pnl'].sum())
+    np.testing.assert_allclose(result["equity"], [1000.0, 1005.78, 1025.78, 1017.26, 997.26, 988.66])
+
+    stats = result["stats"]
+    assert (stats["trades"], stats["closed"], stats["hit_rate"]) == (3, 2, 0.5)
+    assert stats["avg_win"] == pytest.approx(31.52)
+    assert stats["avg_loss"] == pytest.approx(-48.56)
+    assert stats["profit_factor"] == pytest.approx(31.52 / 48.56)
+    assert stats["max_drawdown"] == pytest.approx(37.12)
+    assert stats["max_drawdown_pct"] == pytest.approx(37.12 / 1025.78)
+
+
+def test_fill_at_close():
+    result = backtest_signals(BARS, SIGNALS, mode="long", fill="close")
+    trades = result["trades"]
+    assert result["position"].tolist() == [1, 1, 0, 0, 1, 1]
+    assert trades['entry_price'].tolist() == [10.5, 14.5]
+    assert trades['exit_price'].tolist() == [12.5, 15.5]
+    assert trades['pnl'].tolist() == [2.0, 1.0]
+    assert result["pnl"].sum() == pytest.approx(3.0)
+    with pytest.raises(ValueError):
+        backtest_signals(BARS, SIGNALS, fill="vwap")
+
+
+@pytest.mark.parametrize("signals, expected", [
+    ([1, 0, -1, 0, 0, 0], float('inf')),        # 只有盈利
+    ([0, 0, 0, 1, 0, 0], 0.0),                  # 只有未平仓
+    ([0, 0, 0, 0, 0, 0], 0.0),                  # 没有交易
+])
+def test_profit_factor_branches(signals, expected):
+    assert backtest_signals(BARS, np.array(signals))["stats"]["profit_factor"] == expected
+
+
+def test_only_losses_profit_factor_zero():
+    bars = BARS.copy()
+    bars['open'][3] = 5.0
+    stats = backtest_signals(bars, SIGNALS)["stats"]
+    assert stats["closed"] == 1 and stats["profit_factor"] == 0.0
+
+
+def test_universe_and_signals_from_points():
+    signals = signals_from_points(BARS, [{"time": 0.0}, {"time": 4.0}, {"time": 9.0}], [{"time": 2.0}])
+    assert signals.tolist() == SIGNALS.tolist()
+    table, results = backtest_universe({"a": (BARS, SIGNALS), "b": (BARS, SIGNALS)}, multipliers={"b": 2.0},
+                                       mode="both")
+    assert table["symbol"].tolist() == ["a", "b", "ALL"]
+    assert table.set_index("symbol").loc["b", "total_pnl"] == pytest.approx(2 * results["a"]["stats"]["total_pnl"])
+    assert table.set_index("symbol").loc["ALL", "total_pnl"] == pytest.approx(3 * results["a"]["stats"]["total_pnl"])
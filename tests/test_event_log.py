@@ -0,0 +1,99 @@
+# tests/test_event_log.py
+import copy
+import numpy as np
+from utils.data_loader import load_klines
+from utils.incremental_chan import IncrementalChan
+from utils.event_log import EventLogWriter, EventLogReader, BAR, SIGNAL, STROKE_NEW, STROKE_EXTEND, STROKE_CONFIRM
+from utils.stage_log import quiet
+
+
+KLINES = load_klines("data/113.au2512.csv", tail_n=300)
+
+
+def _intrabar(kline):
+    """内部函数：K线的一个盘中版本（随后由最终版本replace_last）"""
+    partial = copy.copy(kline)
+    partial.high = partial.low = partial.close = partial.open
+    return partial
+
+
+def _write(path, klines, chan=None, **kwargs):
+    """内部函数：逐根K线写日志（每根先append盘中版本再replace_last为最终版本），返回分析器"""
+    chan = chan or IncrementalChan("au2512")
+    with quiet(True), EventLogWriter(path, "au2512", **kwargs) as chan.event_log:
+        for kline in klines:
+            chan.append(_intrabar(kline))
+            chan.replace_last(kline)
+    chan.event_log = None
+    return chan
+
+
+def _assert_same_structure(chan, expected):
+    for name in ("klines", "combined", "fractals"):
+        assert np.array_equal(chan.export_state()[name], expected.export_state()[name]), name
+
+
+def _stroke_ends(chan):
+    with quiet(True):
+        return [(s.start_fractal.combined_klines[1].index, s.end_fractal.combined_klines[1].index, s.is_confirmed)
+                for s in chan.strokes]
+
+
+def test_default_log_skips_strokes(tmp_path):
+    path = str(tmp_path / "au.evlog")
+    _write(path, KLINES)
+    reader = EventLogReader(path)
+    events = reader.events
+    assert not np.isin(events['kind'], [STROKE_NEW, STROKE_EXTEND, STROKE_CONFIRM, SIGNAL]).any()
+    assert (events[events['kind'] == BAR]['i2'] == -1).all()
+    reader.close()
+
+
+def test_restore_matches_fresh_analysis(tmp_path):
+    path = str(tmp_path / "au.evlog")
+    _write(path, KLINES, track_strokes=True)
+    reader = EventLogReader(path)
+    for bar in (10, 57, 150, len(KLINES) - 1):
+        fresh = IncrementalChan("au2512")
+        fresh.extend(KLINES[:bar + 1])
+        restored = reader.restore(bar)
+        _assert_same_structure(restored, fresh)
+        assert _stroke_ends(restored) == _stroke_ends(fresh)
+
+        # 恢复后继续处理与从未中断一致
+        restored.extend(KLINES[bar + 1:])
+        full = IncrementalChan("au2512")
+        full.extend(KLINES)
+        _assert_same_structure(restored, full)
+        assert _stroke_ends(restored) == _stroke_ends(full)
+    reader.close()
+
+
+def test_signals_logged_once_per_combined_bar(tmp_path):
+    path = str(tmp_path / "au.evlog")
+    _write(path, KLINES, track_strokes=True)
+    reader = EventLogReader(path)
+    signals = reader.events[reader.events['kind'] == SIGNAL]
+    fired = list(zip(signals['flag'].tolist(), signals['slot'].tolist()))
+    assert fired and len(fired) == len(set(fired))
+    reader.close()
+
+
+def test_append_resumes_log(tmp_path):
+    whole, split = str(tmp_path / "whole.evlog"), str(tmp_path / "split.evlog")
+    _write(whole, KLINES, track_strokes=True)
+
+    half = len(KLINES) // 2
+    _write(split, KLINES[:half], track_strokes=True)
+    reader = EventLogReader(split)
+    chan = reader.restore()
+    reader.close()
+    _write(split, KLINES[half:], chan=chan, append=True)
+
+    a, b = EventLogReader(whole), EventLogReader(split)
+    assert len(a) == len(b)
+    assert np.array_equal(a.index[['bar', 'begin', 'end']], b.index[['bar', 'begin', 'end']])
+    for name in ("kind", "flag", "bar", "slot", "i0", "i1", "i2"):
+        assert np.array_equal(a.events[name], b.events[name]), name
+    a.close()
+    b.close()
@@ -0,0 +1,47 @@
+# tests/test_export.py
+import pandas as pd
+import pytest
+from utils.data_loader import load_klines
+from utils.export import analysis_frames, concat_symbols, export_frames, pq
+from utils.stage_log import quiet
+from utils.stroke_identifier import identify_strokes_from_klines
+
+
+@pytest.fixture(scope="module")
+def frames():
+    by_symbol = {}
+    for symbol, tail_n in (("a", 400), ("b", 300)):
+        with quiet():
+            strokes, combined, tops, bottoms = identify_strokes_from_klines(load_klines("data/142.ec2602.csv", tail_n=tail_n))
+        by_symbol[symbol] = analysis_frames(combined=combined, fractals=tops + bottoms, strokes=strokes)
+    return concat_symbols(by_symbol)
+
+
+def test_default_format_follows_pyarrow(frames, tmp_path):
+    paths = export_frames(frames, str(tmp_path))
+    expected = "parquet" if pq is not None else "csv"
+    assert sorted(paths) == ["combined", "fractals", "strokes"]
+    assert all(path.endswith("." + expected) for path in paths.values())
+
+
+def test_csv_round_trip(frames, tmp_path):
+    paths = export_frames(frames, str(tmp_path), fmt="csv")
+    for name, df in frames.items():
+        back = pd.read_csv(paths[name])
+        assert list(back.columns) == list(df.columns)
+        expected = df.assign(symbol=df["symbol"].astype(str))
+        pd.testing.assert_frame_equal(back, expected, check_dtype=False)
+        time_columns = [c for c in back.columns if c.endswith("time")]
+        assert time_columns and all(back[c].dtype == "int64" for c in time_columns)
+
+
+def test_parquet_round_trip(frames, tmp_path):
+    pytest.importorskip("pyarrow")
+    paths = export_frames(frames, str(tmp_path), fmt="parquet")
+    for name, df in frames.items():
+        pd.testing.assert_frame_equal(pd.read_parquet(paths[name]), df)
+
+
+def test_unknown_format(frames, tmp_path):
+    with pytest.raises(ValueError):
+        export_frames(frames, str(tmp_path), fmt="xlsx")
@@ -0,0 +1,146 @@
+# tests/test_http_service.py
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from utils.data_loader import load_klines
+from utils.stroke_identifier import identify_strokes_from_klines
+from utils.stage_log import quiet
+from service.http_service import AnalysisCache, make_server
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = make_server(AnalysisCache("data/*.csv"), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    with quiet(True):
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+    server.server_close()
+
+
+def _request(url, payload=None, raw=None):
+    """内部函数：GET（payload为None）或POST JSON（raw为原始请求体），返回(状态码, 响应JSON)"""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else raw
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _expected_strokes(path):
+    """内部函数：对整个数据文件一次性识别的笔（与/analyze的strokes字段格式相同）"""
+    with quiet(True):
+        strokes = identify_strokes_from_klines(load_klines(path))[0]
+    return [{"direction": s.direction, "start_time": s.start_fractal.time, "end_time": s.end_fractal.time,
+             "start_price": s.start_fractal.price, "end_price": s.end_fractal.price} for s in strokes]
+
+
+def test_health_and_symbols(base_url):
+    status, payload = _request(base_url + "/health")
+    assert status == 200 and payload["status"] == "ok"
+    status, payload = _request(base_url + "/symbols")
+    assert status == 200
+    assert {"113.au2512", "113.rb2601", "142.ec2602", "hs300_k_data_week"} <= set(payload)
+
+
+def test_analyze_get_and_post_batch(base_url):
+    symbols = ["113.au2512", "113.rb2601", "142.ec2602"]
+    status, got = _request(base_url + "/analyze?symbols=" + ",".join(symbols) + "&include=summary,strokes")
+    assert status == 200 and not got["errors"]
+    assert sorted(got["results"]) == symbols
+    for symbol in symbols:
+        result = got["results"][symbol]
+        assert result["strokes"] == _expected_strokes(f"data/{symbol}.csv")
+        assert result["bars"] == len(load_klines(f"data/{symbol}.csv"))
+        assert "summary" in result
+
+    status, posted = _request(base_url + "/analyze", {"symbols": symbols, "include": ["summary", "strokes"]})
+    assert status == 200 and posted == got
+
+    status, tailed = _request(base_url + "/analyze", {"symbols": symbols[:1], "include": ["strokes", "fractals"],
+                                                      "tail": 3})
+    result = tailed["results"][symbols[0]]
+    assert result["strokes"] == got["results"][symbols[0]]["strokes"][-3:]
+    assert len(result["fractals"]) == 3
+
+
+def test_append_is_idempotent(base_url):
+    bars = [{"time": 1.0e9 + 3600 * i, "open": 10 + i % 5, "high": 11 + i % 5 + (i % 3),
+             "low": 9 + i % 5 - (i % 2), "close": 10 + i % 5} for i in range(40)]
+    payload = {"symbol": "test.append", "bars": bars, "include": ["summary", "strokes"]}
+    status, first = _request(base_url + "/append", payload)
+    assert status == 200 and first["appended"] == {"test.append": 40}
+    status, again = _request(base_url + "/append", payload)
+    assert status == 200 and again["appended"] == {"test.append": 0}
+    assert again["results"] == first["results"]
+
+    # 部分重叠：只追加时间晚于最后一根的K线
+    more = bars[-5:] + [dict(bars[-1], time=bars[-1]["time"] + 3600 * (i + 1)) for i in range(3)]
+    status, extended = _request(base_url + "/append", {"bars": {"test.append": more}})
+    assert status == 200 and extended["appended"] == {"test.append": 3}
+    status, got = _request(base_url + "/analyze?symbols=test.append&include=summary")
+    assert got["results"]["test.append"]["bars"] == 43
+
+
+def test_bad_requests(base_url):
+    status, payload = _request(base_url + "/append", {"bars": []})
+    assert status == 400 and "symbol" in payload["error"]
+    status, payload = _request(base_url + "/analyze?symbols=113.au2512&tail=abc")
+    assert status == 400 and "error" in payload
+    status, payload = _request(base_url + "/analyze", {"symbols": ["113.au2512"], "tail": "x"})
+    assert status == 400
+    status, payload = _request(base_url + "/nowhere")
+    assert status == 404
+
+
+def test_errors_reported_per_symbol(base_url):
+    status, payload = _request(base_url + "/analyze", {"symbols": ["113.au2512", "no.such"]})
+    assert status == 200
+    assert list(payload["results"]) == ["113.au2512"] and list(payload["errors"]) == ["no.such"]
+
+    status, payload = _request(base_url + "/analyze", {"symbols": ["113.rb2601"], "timeframe": "not-a-rule"})
+    assert status == 200
+    assert not payload["results"] and "113.rb2601" in payload["errors"]
+
+
+def test_malformed_bodies_get_400(base_url):
+    cases = [
+        {"symbol": "x", "bars": [1, 2]},
+        {"symbol": "x", "bars": "not a list"},
+        {"symbol": "x", "bars": [{"time": 1, "high": "abc", "low": 1, "close": 1}]},
+        {"symbol": "x", "bars": [{"time": 1, "low": 1, "close": 1}]},
+        {"bars": {"x": [{"time": 1, "high": 2, "low": 1, "close": 1}], "y": [3]}},
+        {"symbol": "113.au2512", "timeframe": "1D", "bars": [{"time": 2e9, "high": 2, "low": 1, "close": 1}]},
+    ]
+    for payload in cases:
+        status, body = _request(base_url + "/append", payload)
+        assert status == 400 and "error" in body, payload
+    for raw in (b"[1, 2]", b"{not json"):
+        status, body = _request(base_url + "/analyze", raw=raw)
+        assert status == 400 and "error" in body, raw
+    # 出错的请求没有追加任何K线
+    status, body = _request(base_url + "/symbols")
+    assert "x" not in body and "y" not in body
+
+
+def test_unexpected_errors_get_500():
+    class BrokenCache(AnalysisCache):
+        def analyze_many(self, *args, **kwargs):
+            raise RuntimeError("disk on fire")
+
+    server = make_server(BrokenCache("data/*.csv"), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/analyze"
+        for payload in (None, {"symbols": ["113.au2512"]}):
+            status, body = _request(url, payload)
+            assert status == 500 and "disk on fire" in body["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,62 @@
+# tests/test_indicators.py
+import numpy as np
+import pytest
+from utils.data_loader import load_kline_frame
+from utils.indicators import IncrementalMACD, MACDIndex, compute_macd
+
+CLOSE = load_kline_frame("data/142.ec2602.csv")["close"].to_numpy(dtype='f8')[-1500:]
+
+
+def _spans(n, count=300, seed=7):
+    rng = np.random.default_rng(seed)
+    spans = [(0, 0), (0, n - 1), (n - 1, n - 1)]
+    for _ in range(count):
+        begin, end = sorted(rng.integers(0, n, size=2))
+        spans.append((int(begin), int(end)))
+    return spans
+
+
+def _check_index(index, close):
+    dif, dea, hist = compute_macd(close)
+    assert len(index) == len(close)
+    np.testing.assert_allclose(index.dif, dif, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(index.dea, dea, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(index.hist, hist, rtol=1e-9, atol=1e-6)
+    for begin, end in _spans(len(close)):
+        part = hist[begin:end + 1]
+        assert index.area(begin, end) == pytest.approx(part.sum(), rel=1e-9, abs=1e-6)
+        assert index.up_area(begin, end) == pytest.approx(part[part > 0].sum(), rel=1e-9, abs=1e-6)
+        assert index.down_area(begin, end) == pytest.approx(-part[part < 0].sum(), rel=1e-9, abs=1e-6)
+        assert index.peak_dif(begin, end, 'up') == pytest.approx(dif[begin:end + 1].max(), rel=1e-9, abs=1e-6)
+        assert index.peak_dif(begin, end, 'down') == pytest.approx(dif[begin:end + 1].min(), rel=1e-9, abs=1e-6)
+        assert index.peak_hist(begin, end, 'up') == pytest.approx(part.max(), rel=1e-9, abs=1e-6)
+        assert index.peak_hist(begin, end, 'down') == pytest.approx(part.min(), rel=1e-9, abs=1e-6)
+
+
+def test_incremental_macd_matches_vectorized():
+    macd = IncrementalMACD()
+    got = np.array([macd.update(c) for c in CLOSE])
+    for column, expected in zip(got.T, compute_macd(CLOSE)):
+        np.testing.assert_allclose(column, expected, rtol=1e-9, atol=1e-6)
+
+
+def test_index_matches_brute_force():
+    _check_index(MACDIndex(CLOSE), CLOSE)
+
+
+@pytest.mark.parametrize("built", [0, 1, 2, 3, 700])
+def test_appended_index_matches_brute_force(built):
+    # 稀疏表的层数随追加增长（包括从空表、只有一项开始）
+    index = MACDIndex(CLOSE[:built])
+    for close in CLOSE[built:]:
+        index.append(close)
+    _check_index(index, CLOSE)
+
+
+def test_invalid_span():
+    index = MACDIndex(CLOSE[:100])
+    for method in (index.area, index.up_area, index.down_area, index.peak_dif, index.peak_hist):
+        with pytest.raises(ValueError):
+            method(10, 9)
+        with pytest.raises(ValueError):
+            method(-5, 3)
@@ -0,0 +1,97 @@
+# tests/test_live_chart.py
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pytest
+from utils.data_loader import load_klines
+from utils.incremental_chan import IncrementalChan
+from utils.stage_log import quiet
+from visualization.live_chart import LiveChart
+
+pytestmark = pytest.mark.filterwarnings("ignore::UserWarning")    # 中文字体缺字
+
+KLINES = load_klines("data/142.ec2602.csv", tail_n=300)
+
+
+class _CountingChan(IncrementalChan):
+    """记录strokes被读取的次数"""
+    stroke_reads = 0
+
+    @property
+    def strokes(self):
+        self.stroke_reads += 1
+        return IncrementalChan.strokes.fget(self)
+
+
+@pytest.fixture
+def chart():
+    chan = _CountingChan("ec2602")
+    chart = LiveChart(chan, window=60, min_interval=0.0)
+    yield chart
+    chart.close()
+    plt.close(chart.ax.figure)
+
+
+def _feed(chart, klines):
+    with quiet():
+        for kline in klines:
+            chart.analyzer.append(kline)
+            chart.sync()
+
+
+def test_sync_matches_analyzer(chart):
+    _feed(chart, KLINES[:50])
+    chan = chart.analyzer
+    assert len(chart._bodies.get_paths()) == 50
+    assert len(chart._tops.get_xdata()) == len(chan.top_fractals)
+    strokes = chan.strokes
+    assert len(chart._strokes.get_segments()) == len(strokes) - 1
+    last = strokes[-1]
+    assert list(chart._tentative.get_ydata()) == [last.start_fractal.price, last.end_fractal.price]
+
+
+def test_strokes_read_only_when_fractals_change(chart):
+    _feed(chart, KLINES[:80])
+    reads = chart.analyzer.stroke_reads
+    chart.sync()
+    chart.sync()
+    assert chart.analyzer.stroke_reads == reads
+    # 盘中替换最后一根K线：分型集合不变时仍不读取笔
+    with quiet():
+        chart.analyzer.replace_last(KLINES[79])
+    chart.sync()
+    assert chart.analyzer.stroke_reads == reads
+
+
+def test_page_flip(chart):
+    _feed(chart, KLINES[:60])
+    chart.draw(force=True)
+    assert chart._view_start == 0 and not chart.sync()
+    _feed(chart, KLINES[60:61])
+    assert chart._view_start == 31 and chart._need_full
+    assert chart.ax.get_xlim() == (30.5, 90.5)
+    assert len(chart._bodies.get_paths()) == 30
+    # 翻页后笔图元只含终点在显示范围内的笔
+    _feed(chart, KLINES[61:150])
+    assert chart._view_start == 93
+    ends = [chart._x_of_time[s.end_fractal.time] for s in chart.analyzer.strokes[:-1]]
+    assert len(chart._strokes.get_segments()) == sum(1 for x in ends if x >= 93) > 0
+
+
+def test_update_full_draw_then_blit(chart, monkeypatch):
+    _feed(chart, KLINES[:40])
+    with quiet():
+        assert chart.update(force=True)
+        assert chart._background is not None and not chart._need_full
+        chart.analyzer.append(KLINES[40])
+        # 坐标范围不变：只blit动态图元，不整图重绘
+        monkeypatch.setattr(chart.ax.figure.canvas, "draw", lambda: pytest.fail("不应整图重绘"))
+        assert chart.update(force=True)
+        assert not chart._dirty
+        chart.min_interval = 3600.0
+        assert not chart.update()           # 节流：间隔不足时跳过
+        chart.add_signal(KLINES[40].time, KLINES[40].low, "buy")
+        assert chart.update(force=True)
+    assert list(chart._buys.get_xdata()) == [40]
+    with pytest.raises(ValueError):
+        chart.add_signal(0.0, 1.0, "buy")
@@ -0,0 +1,96 @@
+# tests/test_panel.py
+import numpy as np
+import pytest
+from utils.bar_array import array_to_klines, klines_to_array
+from utils.data_loader import load_klines
+from utils.indicators import compute_macd
+from utils.panel import Panel
+from utils.stage_log import quiet
+from utils.stroke_identifier import identify_strokes_from_klines
+
+BARS = {symbol: klines_to_array(load_klines(f"data/{name}.csv", symbol, tail_n=tail_n))
+        for symbol, name, tail_n in (("au", "113.au2512", 400), ("rb", "113.rb2601", 300), ("ec", "142.ec2602", 350))}
+# 去掉一段K线，使各标的在面板上有缺口
+BARS["rb"] = np.delete(BARS["rb"], np.s_[100:120])
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return Panel.from_bars(BARS)
+
+
+def _small_panel():
+    close = np.array([[1.0, 2.0, np.nan, 4.0],
+                      [1.0, np.nan, np.nan, 2.0],
+                      [np.nan, np.nan, np.nan, 3.0]])
+    fields = {name: close.copy() for name in ("open", "high", "low", "close", "volume", "amount")}
+    return Panel(["a", "b", "c"], [1.0, 2.0, 3.0, 4.0], fields)
+
+
+def test_breadth_matrix_and_vector():
+    panel = _small_panel()
+    mask = np.array([[True, True, True, False],
+                     [False, False, True, True],
+                     [True, False, False, True]])
+    # 分母为各时刻有K线的标的：无K线处的True不计入，全部缺失的时刻为NaN
+    np.testing.assert_array_equal(panel.breadth(mask), [0.5, 1.0, np.nan, 2 / 3])
+    assert panel.breadth(np.array([True, False, True])) == pytest.approx(2 / 3)
+    assert panel.breadth(np.array([True, False, True]), np.array([True, True, False])) == 0.5
+    assert np.isnan(panel.breadth(np.array([True, True, True]), np.zeros(3, dtype=bool)))
+
+
+def test_alignment(panel):
+    times = np.union1d(np.union1d(BARS["au"]['time'], BARS["rb"]['time']), BARS["ec"]['time'])
+    np.testing.assert_array_equal(panel.times, times)
+    for symbol, bars in BARS.items():
+        np.testing.assert_array_equal(panel.bars(symbol), bars)
+    inner = Panel.from_bars(BARS, how="inner")
+    assert inner.valid.all()
+    assert len(inner) == len(np.intersect1d(np.intersect1d(BARS["au"]['time'], BARS["rb"]['time']), BARS["ec"]['time']))
+    with pytest.raises(ValueError):
+        Panel.from_bars(BARS, how="left")
+
+
+def test_macd_and_cross_match_per_symbol(panel):
+    dif, dea, hist = panel.macd()
+    cross = panel.macd_cross()
+    for i, symbol in enumerate(panel.symbols):
+        cols = np.flatnonzero(panel.valid[i])
+        expected = compute_macd(BARS[symbol]['close'])
+        for got, want in zip((dif, dea, hist), expected):
+            np.testing.assert_allclose(got[i, cols], want, rtol=1e-9, atol=1e-6)
+            assert np.isnan(got[i, ~panel.valid[i]]).all()
+        diff = expected[0] - expected[1]
+        brute = np.zeros(len(cols), dtype='i1')
+        for j in range(1, len(cols)):
+            if diff[j] > 0 and diff[j - 1] <= 0:
+                brute[j] = 1
+            elif diff[j] < 0 and diff[j - 1] >= 0:
+                brute[j] = -1
+        np.testing.assert_array_equal(cross[i, cols], brute)
+        assert not cross[i, ~panel.valid[i]].any()
+        assert np.count_nonzero(brute) > 0
+    # 面积：前缀和与逐列求和一致
+    begin, end = panel.last_stroke_span()
+    area = panel.macd_area(begin, end)
+    for i in range(len(panel.symbols)):
+        assert area[i] == pytest.approx(np.nansum(hist[i, begin[i]:end[i] + 1]))
+
+
+def test_asof_is_a_prefix_view_without_lookahead(panel):
+    time = BARS["rb"]['time'][200]
+    past = panel.asof(time)
+    assert past.times[-1] == time and len(past) == np.searchsorted(panel.times, time, side='right')
+    assert np.shares_memory(past.fields["close"], panel.fields["close"])
+    truncated = Panel.from_bars({s: b[b['time'] <= time] for s, b in BARS.items()}, times=past.times)
+    np.testing.assert_array_equal(past.valid, truncated.valid)
+    np.testing.assert_array_equal(past.stroke_direction(), truncated.stroke_direction())
+    np.testing.assert_array_equal(past.macd_cross(), truncated.macd_cross())
+    # 历史时刻的笔与只用当时K线识别的结果一致
+    section = past.cross_section()
+    for i, symbol in enumerate(past.symbols):
+        with quiet():
+            strokes = identify_strokes_from_klines(array_to_klines(BARS[symbol][BARS[symbol]['time'] <= time], symbol))[0]
+        assert section["strokes"][i] == len(strokes) > 0
+        assert section["direction"][i] == (1 if strokes[-1].direction == 'up' else -1)
+        assert section["last_time"][i] == BARS[symbol]['time'][BARS[symbol]['time'] <= time][-1]
@@ -0,0 +1,195 @@
+# tests/test_pipeline_equivalence.py
+"""
+各实现与基准流水线（combine_kline → detect_fractals → find_all_necessary_points → identify_strokes）的一致性：
+笔端点在全部数据文件和随机（价格重复很多）序列上必须相同。前缀上的检查与identify_strokes_from_klines比较，
+后者在完整序列上与基准流水线的一致性由本模块第一组测试保证
+"""
+import copy
+import glob
+import random
+import numpy as np
+import pytest
+from core.Chan_base import KLine
+from utils import combine_kline, detect_fractals, find_all_necessary_points
+from utils.backend import available_backends
+from utils.bar_array import klines_to_array
+from utils.chan_analyzer import ChanAnalyzer
+from utils.chunked import ChunkedChan, load_chunked_results
+from utils.fractal_table import detect_fractal_table
+from utils.incremental_chan import IncrementalChan
+from utils.signal_detector import detect_second_buy_sell
+from utils.snapshot import save_snapshot, load_snapshot
+from utils.stroke_identifier import identify_strokes, identify_strokes_from_klines
+from utils.stage_log import quiet
+
+
+PATHS = sorted(glob.glob("data/*.csv"))
+
+
+def _random_klines(seed, n=400, tick=0.5):
+    """内部函数：整数跳动的随机K线，价格重复（相等的高低点）很多"""
+    rng = random.Random(seed)
+    price, klines = 100.0, []
+    for i in range(n):
+        price += tick * rng.randint(-3, 3)
+        high = price + tick * rng.randint(0, 2)
+        low = price - tick * rng.randint(0, 2)
+        klines.append(KLine(time=1.6e9 + 60 * i, open=price, high=high, low=low, close=price, volume=1,
+                            symbol="rand", index=i))
+    return klines
+
+
+def _datasets():
+    from utils.data_loader import load_klines
+    series = {path: load_klines(path) for path in PATHS}
+    series.update({f"random{seed}": _random_klines(seed) for seed in range(4)})
+    return series
+
+
+DATASETS = _datasets()
+
+
+def _ends(strokes):
+    """内部函数：笔 → (起点时间, 终点时间, 起点价格, 终点价格, 方向)"""
+    return [(s.start_fractal.time, s.end_fractal.time, s.start_fractal.price, s.end_fractal.price, s.direction)
+            for s in strokes]
+
+
+def _baseline(klines):
+    """内部函数：基准流水线（对象实现的分型与必经点，无分型表）"""
+    with quiet(True):
+        combined = combine_kline(klines)
+        tops, bottoms = detect_fractals(combined)
+        points = find_all_necessary_points(combined, tops, bottoms)
+        return _ends(identify_strokes(combined, points, tops, bottoms))
+
+
+def _pipeline(klines, **kwargs):
+    with quiet(True):
+        return _ends(identify_strokes_from_klines(klines, **kwargs)[0])
+
+
+BASELINE = {name: _baseline(klines) for name, klines in DATASETS.items()}
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+@pytest.mark.parametrize("backend", [None] + available_backends())
+def test_fractal_table_and_kernels_match_baseline(name, backend):
+    assert _pipeline(DATASETS[name], backend=backend) == BASELINE[name]
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_parallel_windows_match_baseline(name):
+    assert _pipeline(DATASETS[name], max_workers=3) == BASELINE[name]
+
+
+@pytest.mark.parametrize("name", PATHS)
+def test_tick_prices_match_baseline(name):
+    assert _pipeline(DATASETS[name], tick_size="auto") == BASELINE[name]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tick_prices_on_ties(seed):
+    assert _pipeline(_random_klines(seed), tick_size=0.5) == BASELINE[f"random{seed}"]
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_incremental_prefixes(name):
+    klines = DATASETS[name]
+    chan = IncrementalChan("x")
+    for n, kline in enumerate(klines, 1):
+        chan.append(kline)
+        if n % 23 == 0 or n > len(klines) - 5:
+            with quiet(True):
+                assert _ends(chan.strokes) == _pipeline(klines[:n]), n
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_greedy_paths_agree(name):
+    klines = DATASETS[name]
+    expected = _pipeline(klines, method="greedy")
+    assert expected
+    for backend in available_backends():
+        assert _pipeline(klines, method="greedy", backend=backend) == expected
+    chan = IncrementalChan("x", stroke_method="greedy")
+    for n, kline in enumerate(klines, 1):
+        chan.append(kline)
+        if n % 31 == 0:
+            with quiet(True):
+                assert _ends(chan.strokes) == _pipeline(klines[:n], method="greedy"), n
+    with quiet(True):
+        assert _ends(chan.strokes) == expected
+        assert _ends(ChanAnalyzer(klines, "x", stroke_method="greedy").strokes) == expected
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_chan_analyzer_with_replacements(name):
+    klines = DATASETS[name]
+    rng = random.Random(len(klines))
+    analyzer = ChanAnalyzer(klines[:50], "x")
+    for n in range(51, len(klines) + 1):
+        partial = copy.copy(klines[n - 1])
+        partial.high = partial.low = partial.close = partial.open
+        analyzer.append(partial)
+        if rng.random() < 0.5:
+            analyzer.last_stroke       # 中间版本也触发计算
+        analyzer.replace_last(klines[n - 1])
+        if n % 29 == 0 or n == len(klines):
+            with quiet(True):
+                strokes, combined, tops, bottoms = identify_strokes_from_klines(klines[:n])
+                last = analyzer.last_stroke
+                assert _ends([last] if last else []) == _ends(strokes[-1:]), n
+                assert _ends(analyzer.strokes) == _ends(strokes), n
+                assert analyzer.signals == detect_second_buy_sell(combined, tops, bottoms, strokes), n
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+@pytest.mark.parametrize("block_size", [1, 37, 100000])
+def test_chunked_matches_baseline(name, block_size, tmp_path):
+    bars = klines_to_array(DATASETS[name])
+    chunked = ChunkedChan(str(tmp_path))
+    for begin in range(0, len(bars), block_size):
+        chunked.feed(bars[begin:begin + block_size])
+    with quiet(True):
+        chunked.finish()
+    results = load_chunked_results(str(tmp_path))
+    with quiet(True):
+        table = detect_fractal_table(combine_kline(DATASETS[name]))
+    assert np.array_equal(results["fractals"]['mid'], table.mid)
+    assert np.array_equal(results["fractals"]['reach'], table.reach)
+    strokes = results["strokes"]
+    got = list(zip(strokes['start_time'].tolist(), strokes['end_time'].tolist(), strokes['start_price'].tolist(),
+                   strokes['end_price'].tolist(), np.where(strokes['direction'] == 1, 'up', 'down').tolist()))
+    assert got == BASELINE[name]
+
+
+def test_chunked_closes_files_on_error(tmp_path):
+    bars = klines_to_array(DATASETS[PATHS[0]])
+    chunked = ChunkedChan(str(tmp_path))
+    chunked.feed(bars[:100])
+    with pytest.raises(ValueError):
+        chunked.feed(np.zeros(3, dtype=[('time', 'f8')]))
+    assert all(f.closed for f in chunked._files.values())
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_snapshot_resume_matches_baseline(name, tmp_path):
+    klines = DATASETS[name]
+    path = str(tmp_path / "state.snap")
+    chan = IncrementalChan("x")
+    chan.extend(klines[:len(klines) // 2])
+    with quiet(True):
+        chan.strokes                    # 笔缓存一并写入快照
+    save_snapshot({"x": chan}, path)
+    restored = load_snapshot(path)[0]["x"]
+    with quiet(True):
+        assert _ends(restored.strokes) == _pipeline(klines[:len(klines) // 2])
+        restored.extend(klines[len(klines) // 2:])
+        assert _ends(restored.strokes) == BASELINE[name]
+    assert np.array_equal(restored.export_state()["combined"], _full_state(klines)["combined"])
+
+
+def _full_state(klines):
+    chan = IncrementalChan("x")
+    chan.extend(klines)
+    return chan.export_state()
@@ -0,0 +1,84 @@
+# tests/test_pivot_detector.py
+from types import SimpleNamespace
+import pytest
+from utils.data_loader import load_klines
+from utils.pivot_detector import PivotTracker, detect_pivots
+from utils.stage_log import quiet
+from utils.stroke_identifier import identify_strokes_from_klines
+
+
+def _zigzag(points):
+    """相邻转折点之间各一笔（时间即转折点序号）"""
+    return [SimpleNamespace(high=max(a, b), low=min(a, b),
+                            start_fractal=SimpleNamespace(time=float(k)),
+                            end_fractal=SimpleNamespace(time=float(k + 1)))
+            for k, (a, b) in enumerate(zip(points, points[1:]))]
+
+
+def _push_all(items):
+    tracker = PivotTracker()
+    return tracker, [tracker.push(item) for item in items]
+
+
+def test_new_extend_leave_third_buy():
+    tracker, events = _push_all(_zigzag([10, 20, 12, 19, 14, 25, 21]))
+    assert events == [None, None, 'new', 'extend', 'extend', 'leave']
+    pivot = tracker.pivots[0]
+    # 离开笔（14→25）不计入中枢，GG/DD恢复为前四笔的极值
+    assert (pivot.begin, pivot.end, pivot.count) == (0, 3, 4)
+    assert (pivot.zg, pivot.zd, pivot.gg, pivot.dd) == (19, 12, 20, 10)
+    assert pivot.end_time == 4.0
+    assert pivot.is_confirmed
+    assert tracker.third_points == [(5, 'buy', 0)]
+
+
+def test_third_sell():
+    tracker, events = _push_all(_zigzag([-10, -20, -12, -19, -14, -25, -21]))
+    assert events[-1] == 'leave'
+    assert tracker.third_points == [(5, 'sell', 0)]
+    assert (tracker.pivots[0].gg, tracker.pivots[0].dd) == (-10, -20)
+
+
+def test_leave_pulling_back_into_range_is_not_third_point():
+    # 离开笔之后的回抽笔与[ZD, ZG]有重叠，中枢延伸而不是结束
+    tracker, events = _push_all(_zigzag([10, 20, 12, 19, 14, 25, 18]))
+    assert events[-1] == 'extend'
+    assert tracker.third_points == []
+
+
+def test_minimal_pivot_leaving_stroke_cancels_pivot():
+    # 第三笔（12→30）即离开笔：剔除后只剩两笔，中枢不成立，也就没有第三类买点
+    tracker, events = _push_all(_zigzag([10, 20, 12, 30, 25]))
+    assert events == [None, None, 'new', 'cancel']
+    assert len(tracker.pivots) == 0
+    assert tracker.third_points == []
+    # 从第二笔起按滑动窗口继续寻找
+    assert tracker.push(_zigzag([25, 40])[0]) == 'new'
+    assert tracker.pivots[0].begin == 2
+
+
+@pytest.fixture(scope="module")
+def real_strokes():
+    with quiet():
+        return identify_strokes_from_klines(load_klines("data/142.ec2602.csv", tail_n=2000))[0]
+
+
+def test_third_points_exclude_leaving_stroke(real_strokes):
+    with quiet():
+        tracker = detect_pivots(real_strokes)
+    assert len(tracker.pivots) > 0
+    for pivot in tracker.pivots:
+        assert pivot.count >= 3
+        members = real_strokes[pivot.begin:pivot.end + 1]
+        assert pivot.zg == min(s.high for s in members[:3])
+        assert pivot.zd == max(s.low for s in members[:3])
+        if pivot.is_confirmed:
+            assert pivot.gg == max(s.high for s in members)
+            assert pivot.dd == min(s.low for s in members)
+    for i, kind, row in tracker.third_points:
+        pivot = tracker.pivots[row]
+        assert pivot.end == i - 2      # 离开笔i-1不在中枢内
+        if kind == 'buy':
+            assert real_strokes[i].low > pivot.zg
+        else:
+            assert real_strokes[i].high < pivot.zd
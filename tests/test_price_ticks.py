@@ -0,0 +1,51 @@
+# tests/test_price_ticks.py
+import numpy as np
+import pytest
+from utils.data_loader import load_klines
+from utils.price_ticks import (TICK_SIZES, decimals_of, from_ticks, infer_tick_size, resolve_tick_size,
+                               tick_size_of, to_ticks)
+
+
+@pytest.mark.parametrize("symbol, expected", [
+    ("113.rb2601", 1.0), ("rb2601", 1.0), ("142.ec2602", 0.1), ("au2512", 0.02),
+    ("IF2503", 0.2), ("SC2507", 0.1), ("i2509", 0.5), ("xx2601", None),
+])
+def test_tick_size_lookup(symbol, expected):
+    assert tick_size_of(symbol) == expected
+
+
+def test_tick_size_lookup_default():
+    assert tick_size_of("zz9999", default=0.5) == 0.5
+    assert all(tick_size_of(code + "2601") == size for code, size in TICK_SIZES.items())
+
+
+@pytest.mark.parametrize("tick", [1.0, 5.0, 0.5, 0.2, 0.1, 0.02, 0.01, 0.0001])
+def test_infer_clean_and_noisy(tick):
+    rng = np.random.default_rng(3)
+    prices = rng.integers(1000, 400000, size=500) * tick
+    assert infer_tick_size(prices) == tick
+    # 价格经过计算后带有浮点误差（远大于1e-6位的取整单位时原先会推断为1e-06）
+    noisy = prices + rng.uniform(-1e-6, 1e-6, size=len(prices)) * tick * 10
+    assert infer_tick_size(noisy) == tick
+
+
+def test_infer_edge_cases():
+    assert infer_tick_size([]) == 1.0
+    assert infer_tick_size([0.0, 0.0]) == 1.0
+    assert infer_tick_size([0.1 + 0.2, 0.6]) == 0.3
+    assert infer_tick_size([1.0000001, 2.0]) == 1.0
+    assert infer_tick_size([1.2345678, 2.0], max_decimals=3) == 0.005
+
+
+def test_infer_and_resolve_on_data():
+    assert infer_tick_size([k.high for k in load_klines("data/142.ec2602.csv", tail_n=500)]) == 0.1
+    assert resolve_tick_size("auto", load_klines("data/113.rb2601.csv", tail_n=500)) == 1.0
+    assert resolve_tick_size(0.5) == 0.5
+
+
+def test_ticks_round_trip():
+    prices = np.array([4012.4, 4012.3999999, 3999.9000001])
+    ticks = to_ticks(prices, 0.1)
+    assert ticks.tolist() == [40124, 40124, 39999]
+    assert from_ticks(ticks, 0.1).tolist() == [4012.4, 4012.4, 3999.9]
+    assert decimals_of(0.02) == 2 and decimals_of(5) == 0
@@ -0,0 +1,121 @@
+# tests/test_scanner.py
+import asyncio
+from utils.data_loader import load_klines
+from utils.incremental_chan import IncrementalChan
+from utils.stroke_identifier import identify_strokes_from_klines
+from utils.stage_log import quiet
+from service.scanner import ChanScanner, ReplaySource, CallbackSink
+
+
+def _expected_strokes(klines):
+    """内部函数：全部K线一次性识别的笔摘要（与scanner的事件字段对应）"""
+    with quiet(True):
+        strokes = identify_strokes_from_klines(klines)[0]
+    return [(s.start_fractal.time, s.end_fractal.time, s.start_fractal.price, s.end_fractal.price, s.direction)
+            for s in strokes]
+
+
+def _run(source, **kwargs):
+    """内部函数：运行扫描器，返回(扫描器, 事件列表)"""
+    events = []
+    scanner = ChanScanner(sinks=[CallbackSink(events.append)], **kwargs)
+    with quiet(True):
+        asyncio.run(scanner.run(source))
+    return scanner, events
+
+
+def _replay_strokes(events, symbol):
+    """内部函数：按发布顺序应用笔事件（新事件替换起点不早于它的笔），得到订阅方看到的最终笔列表"""
+    strokes = []
+    for e in events:
+        if e["type"] == "stroke" and e["symbol"] == symbol:
+            strokes = [s for s in strokes if s[0] < e["start_time"]]
+            strokes.append((e["start_time"], e["end_time"], e["start_price"], e["end_price"], e["direction"]))
+    return strokes
+
+
+def test_replay_matches_full_identification():
+    source = ReplaySource("data/*.csv")
+    scanner, events = _run(source)
+    assert scanner.stats["bars"] == sum(len(k) for k in source.series.values())
+    for symbol, klines in source.series.items():
+        expected = _expected_strokes(klines)
+        assert expected
+        assert _replay_strokes(events, symbol) == expected
+        assert [tuple(s) for s in scanner._states[symbol].strokes] == expected
+
+
+def test_signals_published_once_per_combined_bar():
+    source = ReplaySource("data/*.csv")
+    _, events = _run(source)
+    for symbol, klines in source.series.items():
+        chan = IncrementalChan(symbol)
+        combined_at = {}
+        for kline in klines:
+            chan.append(kline)
+            combined_at[kline.time] = len(chan.combined)
+        fired = [(e["type"], combined_at[e["time"]]) for e in events
+                 if e["symbol"] == symbol and e["type"] in ("second_buy", "second_sell")]
+        assert len(fired) == len(set(fired))
+
+
+class _BurstSource:
+    """行情源：不让出事件循环、尽快产出全部K线，并记录生产者领先于扫描器消费的最大K线数"""
+    def __init__(self, series, scanner):
+        self.series = series
+        self.scanner = scanner
+        self.max_ahead = 0
+
+    async def __aiter__(self):
+        produced = 0
+        for symbol, klines in self.series.items():
+            for kline in klines:
+                self.max_ahead = max(self.max_ahead, produced - self.scanner.stats["bars"])
+                produced += 1
+                yield symbol, kline
+
+
+def test_bounded_queue_applies_backpressure():
+    queue_size = 4
+    source = ReplaySource("data/*.csv", tail_n=200)
+    events = []
+    scanner = ChanScanner(sinks=[CallbackSink(events.append)], queue_size=queue_size)
+    burst = _BurstSource(source.series, scanner)
+    with quiet(True):
+        asyncio.run(scanner.run(burst))
+
+    # 生产者被限制在队列容量以内，且确实被阻塞过；K线全部处理，没有丢弃
+    assert burst.max_ahead == queue_size
+    assert scanner.stats["bars"] == sum(len(k) for k in source.series.values())
+    for symbol, klines in source.series.items():
+        assert _replay_strokes(events, symbol) == _expected_strokes(klines)
+
+
+def test_errors_are_isolated_per_symbol(monkeypatch):
+    import service.scanner as scanner_module
+    analyse = scanner_module._analyse
+
+    def failing_analyse(analyzer):
+        if analyzer.symbol == "113.au2512":
+            raise RuntimeError("boom")
+        return analyse(analyzer)
+
+    def sink(event):
+        if event["symbol"] == "142.ec2602":
+            raise ValueError("sink down")
+
+    monkeypatch.setattr(scanner_module, "_analyse", failing_analyse)
+    source = ReplaySource("data/*.csv", tail_n=150)
+    events = []
+    scanner = ChanScanner(sinks=[CallbackSink(sink), CallbackSink(events.append)], max_workers=2)
+    with quiet(True):
+        asyncio.run(asyncio.wait_for(scanner.run(source), timeout=60))
+
+    assert scanner.stats["errors"] > 0
+    assert set(scanner.errors) == {"113.au2512", "142.ec2602"}
+    assert "RuntimeError: boom" in scanner.errors["113.au2512"]
+    assert scanner.stats["bars"] == sum(len(k) for k in source.series.values())
+    # 出错标的的K线仍全部并入分析器；其他标的不受影响
+    assert len(scanner.state("113.au2512").klines) == len(source.series["113.au2512"])
+    for symbol in ("113.rb2601", "hs300_k_data_week"):
+        assert _replay_strokes(events, symbol) == _expected_strokes(source.series[symbol])
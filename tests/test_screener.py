@@ -0,0 +1,49 @@
+# tests/test_screener.py
+import pytest
+from service.screener import Screener
+from utils.data_loader import load_klines
+
+SOURCES = {symbol: load_klines(f"data/{name}.csv", symbol, tail_n=600)
+           for symbol, name in (("au", "113.au2512"), ("rb", "113.rb2601"), ("ec", "142.ec2602"))}
+
+
+def _fresh(pattern_strokes=4, stroke_method="dp"):
+    screener = Screener(pattern_strokes, stroke_method)
+    screener.update_all(SOURCES)
+    return screener
+
+
+@pytest.fixture(scope="module")
+def saved(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("screener") / "state.npz")
+    _fresh(pattern_strokes=4, stroke_method="dp").save(path)
+    return path
+
+
+def test_load_keeps_saved_parameters(saved):
+    screener = Screener.load(saved)
+    assert (screener.pattern_strokes, screener.stroke_method) == (4, "dp")
+    assert screener.summaries == _fresh().summaries
+
+
+@pytest.mark.parametrize("pattern_strokes, stroke_method", [(6, None), (None, "greedy"), (6, "greedy")])
+def test_load_rebuilds_with_new_parameters(saved, pattern_strokes, stroke_method):
+    screener = Screener.load(saved, pattern_strokes, stroke_method)
+    expected = _fresh(pattern_strokes or 4, stroke_method or "dp")
+    assert (screener.pattern_strokes, screener.stroke_method) == (expected.pattern_strokes, expected.stroke_method)
+    assert screener.summaries == expected.summaries
+    for symbol, analyzer in screener.analyzers.items():
+        strokes = expected.analyzers[symbol].strokes
+        assert [(s.start_fractal.time, s.end_fractal.time) for s in analyzer.strokes] == \
+               [(s.start_fractal.time, s.end_fractal.time) for s in strokes]
+
+
+def test_load_missing_file_uses_given_parameters(tmp_path):
+    screener = Screener.load(str(tmp_path / "missing.npz"), 5, "greedy")
+    assert len(screener) == 0
+    assert (screener.pattern_strokes, screener.stroke_method) == (5, "greedy")
+
+
+def test_load_rejects_unknown_method(saved):
+    with pytest.raises(ValueError):
+        Screener.load(saved, stroke_method="fast")
@@ -0,0 +1,102 @@
+# tests/test_segment_identifier.py
+from types import SimpleNamespace
+import pytest
+from utils.data_loader import load_klines
+from utils.incremental_chan import IncrementalChan
+from utils.segment_identifier import SegmentBuilder, identify_segments
+from utils.stage_log import quiet
+
+
+def _zigzag(points):
+    """相邻转折点之间各一笔（时间即转折点序号）"""
+    return [SimpleNamespace(direction='up' if b > a else 'down', high=max(a, b), low=min(a, b),
+                            start_fractal=SimpleNamespace(time=float(k)),
+                            end_fractal=SimpleNamespace(time=float(k + 1)))
+            for k, (a, b) in enumerate(zip(points, points[1:]))]
+
+
+def _build(strokes):
+    builder = SegmentBuilder()
+    confirmed_at = {}
+    for i, stroke in enumerate(strokes):
+        for segment in builder.push(stroke):
+            confirmed_at[len(segment.strokes)] = i
+    return builder, confirmed_at
+
+
+def _bounds(segments):
+    return [(s.start_fractal.time, s.end_fractal.time) for s in segments]
+
+
+def test_case1_no_gap_confirms_at_fractal():
+    # 特征序列（向下笔）：(10,5) (15,12) (20,14) (17,8)，顶分型第一二元素间无缺口
+    strokes = _zigzag([0, 10, 5, 15, 12, 20, 14, 17, 8])
+    builder, confirmed_at = _build(strokes)
+    assert _bounds(builder.segments) == [(0.0, 5.0)]
+    assert confirmed_at == {5: 7}
+    assert builder.current_segment.direction == 'down'
+
+
+def test_case2_gap_waits_for_reverse_fractal():
+    # (25,18)与(15,12)之间有缺口：需反向特征序列（向上笔）出现底分型才确认
+    points = [0, 10, 5, 15, 12, 25, 18, 22, 11, 20, 15]
+    builder, _ = _build(_zigzag(points))
+    assert builder.segments == []
+    confirmed = builder.push(_zigzag(points[-1:] + [21])[0])
+    assert _bounds(confirmed[:1]) == [(0.0, 5.0)]
+
+
+def test_case2_broken_peak_continues_segment():
+    points = [0, 10, 5, 15, 12, 25, 18, 22, 11, 20, 15, 30]
+    builder, _ = _build(_zigzag(points))
+    assert builder.segments == []
+    assert builder.current_segment.direction == 'up'
+
+
+def test_no_inclusion_between_first_and_second_element():
+    # (25,10)包含(15,12)且创出新高：不与之合并，缺口按(15,12)判断（无缺口，第一种情况）
+    builder, confirmed_at = _build(_zigzag([0, 10, 5, 15, 12, 25, 10, 20, 8]))
+    assert _bounds(builder.segments) == [(0.0, 5.0)]
+    assert confirmed_at == {5: 7}
+
+
+def test_pop_and_replace_last_restore_state():
+    points = [0, 10, 5, 15, 12, 25, 18, 22, 11, 20, 15, 19, 13, 17]
+    strokes = _zigzag(points)
+    direct, _ = _build(strokes)
+    builder, _ = _build(strokes)
+    # 撤销确认线段的那一笔，线段随之撤销
+    for _ in range(4):
+        builder.pop()
+    assert builder.segments == []
+    for stroke in strokes[-4:]:
+        builder.push(stroke)
+    assert _bounds(builder.segments) == _bounds(direct.segments)
+    # 最后一笔先以较短的版本出现，再被替换
+    builder = SegmentBuilder()
+    for stroke in strokes[:-1]:
+        builder.push(stroke)
+    provisional = _zigzag(points[-2:-1] + [16])[0]
+    builder.replace_last(builder.strokes[-1])
+    builder.push(provisional)
+    builder.replace_last(strokes[-1])
+    assert _bounds(builder.segments) == _bounds(direct.segments)
+    assert len(builder.strokes) == len(strokes)
+    with pytest.raises(IndexError):
+        SegmentBuilder().pop()
+
+
+def test_sync_with_incremental_strokes():
+    klines = load_klines("data/142.ec2602.csv", tail_n=1500)
+    chan = IncrementalChan("ec2602")
+    builder = SegmentBuilder()
+    with quiet():
+        for kline in klines:
+            chan.append(kline)
+            builder.sync(chan.strokes)
+        strokes = chan.strokes
+        expected = identify_segments(strokes)
+    assert [(s.start_fractal.time, s.end_fractal.time) for s in builder.strokes] == \
+           [(s.start_fractal.time, s.end_fractal.time) for s in strokes]
+    assert len(builder.segments) > 0
+    assert _bounds(builder.segments) == _bounds([s for s in expected if s.is_confirmed])
@@ -0,0 +1,105 @@
+# tests/test_shared_arrays.py
+import gc
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from utils.bar_array import klines_to_array
+from utils.data_loader import load_klines
+from utils.fractal_table import detect_fractal_table
+from utils.kline_combiner import combine_kline
+from utils.shared_arrays import SharedArrays, _attached, open_bars, open_columns, open_shared, release_shared
+from utils.stage_log import quiet
+
+KLINES = load_klines("data/142.ec2602.csv", "ec2602", tail_n=300)
+
+
+def _sum_close(handle):
+    """工作进程：由句柄打开K线数组"""
+    bars = handle.open()
+    total = float(bars['close'].sum())
+    del bars
+    release_shared(handle)
+    return total
+
+
+def _exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.parametrize("mode", ["shm", "mmap"])
+def test_round_trip_read_only(mode):
+    data = np.arange(12, dtype='i8').reshape(3, 4)
+    with SharedArrays(mode) as shared:
+        handle = shared.put("a", data)
+        handle = pickle.loads(pickle.dumps(handle))
+        view = open_shared(handle)
+        np.testing.assert_array_equal(view, data)
+        assert not view.flags.writeable
+        assert handle.open() is view        # 同一进程内复用映射
+        empty = open_shared(shared.put("empty", np.empty(0, dtype='f8')))
+        assert empty.shape == (0,)
+        del view, empty
+        release_shared()
+    assert _attached == {}
+
+
+def test_bars_and_fractal_table_columns():
+    with quiet():
+        table = detect_fractal_table(combine_kline(KLINES))
+    with SharedArrays() as shared:
+        bars_handle = shared.put_bars("ec", KLINES)
+        columns = open_columns(shared.put_fractal_table("ec", table))
+        for name in ("kind", "mid", "price", "reach", "highs", "lows"):
+            np.testing.assert_array_equal(columns[name], getattr(table, name))
+        rebuilt = open_bars(bars_handle, "ec2602")
+        assert [(k.time, k.high, k.low, k.close, k.volume) for k in rebuilt] == \
+               [(k.time, k.high, k.low, k.close, k.volume) for k in KLINES]
+        del columns
+        release_shared()
+
+
+def test_close_unlinks_segments_and_directory(tmp_path):
+    shared = SharedArrays()
+    name = shared.put("a", np.ones(4)).name
+    assert _exists(name)
+    shared.close()
+    shared.close()      # 可重复调用
+    assert not _exists(name)
+    assert len(shared) == 0
+    with pytest.raises(RuntimeError):
+        shared.put("b", np.ones(4))
+
+    shared = SharedArrays("mmap", directory=str(tmp_path))
+    path = shared.put("a", np.ones(4)).name
+    directory = os.path.dirname(path)
+    assert os.path.exists(path) and directory.startswith(str(tmp_path))
+    shared.close()
+    assert not os.path.exists(directory)
+
+
+def test_garbage_collected_holder_cleans_up():
+    shared = SharedArrays()
+    name = shared.put("a", np.ones(4)).name
+    del shared
+    gc.collect()
+    assert not _exists(name)
+
+
+def test_workers_open_handles():
+    bars = klines_to_array(KLINES)
+    with SharedArrays() as shared, ProcessPoolExecutor(max_workers=2) as executor:
+        handles = [shared.put_bars(k, bars[k * 100:(k + 1) * 100]) for k in range(3)]
+        totals = list(executor.map(_sum_close, handles))
+    assert totals == pytest.approx([float(bars['close'][k * 100:(k + 1) * 100].sum()) for k in range(3)])
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        SharedArrays("pipe")
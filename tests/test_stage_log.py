@@ -0,0 +1,47 @@
+# tests/test_stage_log.py
+import threading
+from utils.data_loader import load_klines
+from utils.stage_log import quiet, stage_print, is_verbose
+from utils.stroke_identifier import identify_strokes_from_klines
+from utils.sweep import run_sweep
+
+
+KLINES = load_klines("data/113.rb2601.csv", tail_n=200)
+
+
+def test_quiet_suppresses_stage_output(capsys):
+    with quiet():
+        identify_strokes_from_klines(KLINES)
+        with quiet(False):
+            stage_print("visible")
+    assert capsys.readouterr().out == "visible\n"
+    identify_strokes_from_klines(KLINES)
+    assert "[笔识别]" in capsys.readouterr().out
+
+
+def test_quiet_is_local_to_the_thread():
+    seen = {}
+    entered, checked = threading.Event(), threading.Event()
+
+    def other():
+        entered.wait()
+        seen["other"] = is_verbose()
+        checked.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with quiet():
+        entered.set()
+        checked.wait()
+        seen["main"] = is_verbose()
+    thread.join()
+    assert seen == {"other": True, "main": False}
+
+
+def test_sweep_threads_follow_verbose(capsys):
+    with quiet():
+        run_sweep({"a": KLINES, "b": KLINES}, {"min_gap": [3]}, max_workers=2, pool="thread", verbose=True)
+    out = capsys.readouterr().out
+    assert "[笔识别]" in out      # verbose=True在工作线程中生效
+    run_sweep({"a": KLINES, "b": KLINES}, {"min_gap": [3]}, max_workers=2, pool="thread")
+    assert "[笔识别]" not in capsys.readouterr().out
@@ -0,0 +1,83 @@
+# tests/test_stroke_compare.py
+from types import SimpleNamespace
+import pytest
+from utils.data_loader import load_klines
+from utils.stage_log import quiet
+from utils.stroke_compare import compare_stroke_methods, compare_universe, diff_strokes, stroke_diff_report
+from utils.stroke_identifier import identify_strokes_from_klines
+
+DAY = 86400.0
+
+
+def _strokes(points):
+    """[(中间合并K线序号, 'top'/'bottom', 价格)] → 首尾相接的笔（时间为序号天数）"""
+    fractals = [SimpleNamespace(combined_klines=[None, SimpleNamespace(index=mid)], fractal_type=kind,
+                                time=mid * DAY, price=price)
+                for mid, kind, price in points]
+    return [SimpleNamespace(start_fractal=a, end_fractal=b) for a, b in zip(fractals, fractals[1:])]
+
+
+A = _strokes([(0, 'bottom', 10), (5, 'top', 20), (10, 'bottom', 12), (15, 'top', 25), (20, 'bottom', 15)])
+B = _strokes([(0, 'bottom', 10), (5, 'top', 20), (8, 'bottom', 14), (11, 'top', 18), (13, 'bottom', 13),
+              (15, 'top', 25), (22, 'bottom', 16)])
+
+
+def test_diff_counts():
+    result = diff_strokes(A, B)
+    assert (result["strokes_a"], result["strokes_b"]) == (4, 6)
+    assert result["common_strokes"] == 1            # (0, 5)
+    assert result["common_endpoints"] == 3          # 0, 5, 15
+    assert result["endpoint_jaccard"] == pytest.approx(3 / 9)
+
+
+def test_diff_regions():
+    regions = diff_strokes(A, B)["regions"]
+    assert [(r["begin_mid"], r["end_mid"]) for r in regions] == [(5, 15), (15, None)]
+    assert [e[0] for e in regions[0]["a"]] == [10]
+    assert [e[0] for e in regions[0]["b"]] == [8, 11, 13]
+    assert (regions[0]["begin_time"], regions[0]["end_time"]) == (5 * DAY, 15 * DAY)
+    assert (regions[1]["a"][0][0], regions[1]["b"][0][0], regions[1]["end_time"]) == (20, 22, None)
+    # 起点不同：第一个分歧区间从序列开头开始
+    head = diff_strokes(_strokes([(2, 'bottom', 9), (5, 'top', 20)]), A[1:])["regions"][0]
+    assert (head["begin_mid"], head["end_mid"], head["begin_time"]) == (-1, 5, None)
+    assert [e[0] for e in head["a"]] == [2] and head["b"] == []
+
+
+def test_diff_identical_and_empty():
+    same = diff_strokes(A, A)
+    assert same["common_strokes"] == 4 and same["endpoint_jaccard"] == 1.0 and same["regions"] == []
+    empty = diff_strokes([], [])
+    assert (empty["strokes_a"], empty["common_endpoints"], empty["endpoint_jaccard"], empty["regions"]) == (0, 0, 1.0, [])
+
+
+def test_report_numbers():
+    result = dict(diff_strokes(A, B), dp_seconds=0.25, greedy_seconds=0.0125)
+    lines = stroke_diff_report(result, max_regions=1).splitlines()
+    assert lines[0] == "[笔对比] 必经点+动态规划：4 笔，耗时 0.250s"
+    assert lines[1] == "[笔对比] 单遍贪心：6 笔，耗时 0.013s"
+    assert lines[2] == "[笔对比] 相同的笔 1 笔，共有端点 3 个，端点一致率 33.3%，分歧区间 2 个"
+    assert lines[3] == "  1970-01-06 00:00 ~ 1970-01-16 00:00：dp端点 底12@1970-01-11 00:00；" \
+                       "贪心端点 底14@1970-01-09 00:00、顶18@1970-01-12 00:00、底13@1970-01-14 00:00"
+    assert lines[4] == "  ……另有 1 个分歧区间"
+    assert "结尾" in stroke_diff_report(result).splitlines()[-1]
+
+
+def test_compare_on_data():
+    klines = load_klines("data/113.rb2601.csv", "rb2601", tail_n=500)
+    with quiet():
+        result = compare_stroke_methods(klines)
+        dp = identify_strokes_from_klines(klines)[0]
+        greedy = identify_strokes_from_klines(klines, method="greedy")[0]
+        table = compare_universe({"rb2601": klines})
+    key = lambda strokes: [(s.start_fractal.time, s.end_fractal.time) for s in strokes]
+    assert key(result["dp"]) == key(dp) and key(result["greedy"]) == key(greedy)
+    assert (result["strokes_a"], result["strokes_b"]) == (len(dp), len(greedy))
+    # 各分歧区间的端点 + 共有端点 = 两边端点的并集
+    mids = lambda strokes: {s.start_fractal.combined_klines[1].index for s in strokes} | \
+                           {s.end_fractal.combined_klines[1].index for s in strokes}
+    in_regions = {e[0] for r in result["regions"] for e in r["a"] + r["b"]}
+    assert in_regions | (mids(dp) & mids(greedy)) == mids(dp) | mids(greedy)
+    assert len(mids(dp) & mids(greedy)) == result["common_endpoints"]
+    row = table.iloc[0]
+    assert (row["dp_strokes"], row["greedy_strokes"], row["common_strokes"], row["regions"]) == \
+           (len(dp), len(greedy), result["common_strokes"], len(result["regions"]))
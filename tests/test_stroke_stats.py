@@ -0,0 +1,50 @@
+# tests/test_stroke_stats.py
+import pytest
+from utils.data_loader import load_klines
+from utils.stage_log import quiet
+from utils.stroke_identifier import identify_strokes_from_klines
+from utils.stroke_stats import StrokeStatsIndex
+
+KLINES = load_klines("data/142.ec2602.csv", tail_n=500)
+
+
+@pytest.fixture(scope="module")
+def strokes():
+    with quiet():
+        return identify_strokes_from_klines(KLINES)[0]
+
+
+def test_unattached_stroke_has_no_volume():
+    with quiet():
+        stroke = identify_strokes_from_klines(KLINES[:300])[0][0]
+    assert stroke.stats_index is None
+    assert stroke.volume is None and stroke.amount is None
+
+
+def test_prefix_sums_match_brute_force(strokes):
+    index = StrokeStatsIndex(KLINES)
+    assert len(index) == len(KLINES)
+    index.attach(strokes)
+    assert len(strokes) > 10
+    for stroke in strokes:
+        bars = KLINES[stroke.raw_begin:stroke.raw_end + 1]
+        assert stroke.volume == pytest.approx(sum(k.volume for k in bars))
+        assert stroke.amount == pytest.approx(sum(k.amount for k in bars))
+        stats = index.stroke_stats(stroke)
+        assert stats["bar_count"] == len(bars) == stroke.bar_count
+        assert stats["volume"] == stroke.volume
+        assert stats["speed"] == pytest.approx(stroke.amplitude / len(bars))
+    for begin, end in [(0, 0), (0, len(KLINES) - 1), (17, 401), (len(KLINES) - 1, len(KLINES) - 1)]:
+        assert index.volume(begin, end) == pytest.approx(sum(k.volume for k in KLINES[begin:end + 1]))
+        assert index.bar_count(begin, end) == end - begin + 1
+
+
+def test_append_matches_build():
+    built = StrokeStatsIndex(KLINES)
+    grown = StrokeStatsIndex(KLINES[:100])
+    for kline in KLINES[100:]:
+        grown.append(kline)
+    assert len(grown) == len(built)
+    for begin, end in [(0, len(KLINES) - 1), (50, 150), (99, 100), (len(KLINES) - 200, len(KLINES) - 1)]:
+        assert grown.volume(begin, end) == pytest.approx(built.volume(begin, end))
+        assert grown.amount(begin, end) == pytest.approx(built.amount(begin, end))
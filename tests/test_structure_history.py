@@ -0,0 +1,66 @@
+# tests/test_structure_history.py
+import pytest
+from utils import combine_kline, detect_fractals
+from utils.data_loader import load_klines
+from utils.stage_log import quiet
+from utils.stroke_identifier import identify_strokes_from_klines
+from utils.structure_history import StructureHistory, STROKE_NEW, STROKE_EXTEND, STROKE_CONFIRM
+
+
+KLINES = load_klines("data/142.ec2602.csv", tail_n=260)
+
+
+@pytest.fixture(scope="module")
+def history():
+    return StructureHistory.build(KLINES, "ec2602")
+
+
+def _ends(strokes):
+    return [(s.start_fractal.time, s.end_fractal.time) for s in strokes]
+
+
+def test_build_is_quiet(capsys):
+    StructureHistory.build(KLINES[:80])
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("bar", list(range(0, 260, 17)) + [259])
+def test_as_of_matches_prefix_recompute(history, bar):
+    prefix = KLINES[:bar + 1]
+    with quiet():
+        expected = identify_strokes_from_klines(prefix)[0]
+        tops, bottoms = detect_fractals(combine_kline(prefix))
+    assert _ends(history.strokes_as_of(bar)) == _ends(expected)
+    assert history.stroke_count_as_of(bar) == len(expected)
+    got_tops, got_bottoms = history.fractals_as_of(bar)
+    assert [(f.time, f.price) for f in got_tops] == [(f.time, f.price) for f in tops]
+    assert [(f.time, f.price) for f in got_bottoms] == [(f.time, f.price) for f in bottoms]
+
+
+def test_confirmation_times(history):
+    last = len(history) - 1
+    count = history.stroke_count_as_of(last)
+    assert history.confirmed_at_of(count - 1) is None
+    for p in range(count - 1):
+        at = history.confirmed_at_of(p)
+        stroke = history.stroke_as_of(last, p)
+        # 确认时刻该位置已是同一笔且其后已有下一笔；前一根K线时尚未以这笔确认
+        assert at is not None and at <= last
+        assert _ends([history.stroke_as_of(at, p)]) == _ends([stroke])
+        assert history.stroke_count_as_of(at) > p + 1
+        before = history.stroke_state_as_of(at - 1, p)
+        assert before is None or not before[1] or _ends([before[0]]) != _ends([stroke])
+
+
+def test_stroke_events_replay(history):
+    strokes = []
+    kinds = set()
+    for bar, kind, position, stroke in history.stroke_events:
+        kinds.add(kind)
+        if kind == STROKE_NEW and position == len(strokes):
+            strokes.append(stroke)
+        else:
+            strokes[position] = stroke
+    assert {STROKE_NEW, STROKE_EXTEND, STROKE_CONFIRM} <= kinds
+    count = history.stroke_count_as_of(len(history) - 1)
+    assert _ends(strokes[:count]) == _ends(history.strokes_as_of(len(history) - 1))
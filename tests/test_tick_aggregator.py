@@ -0,0 +1,94 @@
+# tests/test_tick_aggregator.py
+import pandas as pd
+import pytest
+from utils.incremental_chan import IncrementalChan
+from utils.tick_aggregator import TickAggregator, futures_sessions
+
+
+def _ts(text):
+    return pd.Timestamp(text).timestamp()
+
+
+@pytest.fixture
+def bars():
+    return []
+
+
+@pytest.fixture
+def aggregator(bars):
+    return TickAggregator((60, 900), futures_sessions("02:30"), "rb",
+                          on_bar=lambda interval, kline: bars.append((interval, kline)))
+
+
+def _closed(bars, interval):
+    return [(k.time, k.open, k.high, k.low, k.close, k.volume) for iv, k in bars if iv == interval]
+
+
+def test_first_tick_of_session(aggregator, bars):
+    assert aggregator.on_tick(_ts("2025-01-06 09:00:00"), 100.0, 2)
+    kline = aggregator.current_bar(900)
+    assert (kline.time, kline.open, kline.high, kline.low, kline.close, kline.volume) == \
+           (_ts("2025-01-06 09:15"), 100.0, 100.0, 100.0, 100.0, 2)
+    assert aggregator.current_bar(60).time == _ts("2025-01-06 09:01")
+    assert bars == []
+
+
+def test_tick_exactly_at_session_end(aggregator, bars):
+    aggregator.on_tick(_ts("2025-01-06 10:05"), 100.0, 1)
+    assert aggregator.on_tick(_ts("2025-01-06 10:15"), 101.0, 1)
+    # 10:15:00的tick计入10:00-10:15，而不是新开一根K线
+    assert aggregator.current_bar(900).time == _ts("2025-01-06 10:15")
+    assert aggregator.current_bar(60).time == _ts("2025-01-06 10:15")
+    aggregator.on_tick(_ts("2025-01-06 10:30"), 102.0, 1)
+    assert _closed(bars, 900) == [(_ts("2025-01-06 10:15"), 100.0, 101.0, 100.0, 101.0, 2)]
+    assert aggregator.current_bar(900).time == _ts("2025-01-06 10:45")
+
+
+def test_night_session_crossing_midnight(aggregator, bars):
+    ticks = [("2025-01-06 21:00", 100.0), ("2025-01-06 23:55", 103.0), ("2025-01-07 00:05", 98.0),
+             ("2025-01-07 02:30", 99.0), ("2025-01-07 09:00", 97.0)]
+    for text, price in ticks:
+        assert aggregator.on_tick(_ts(text), price, 1)
+    assert [t for t, *_ in _closed(bars, 900)] == \
+           [_ts("2025-01-06 21:15"), _ts("2025-01-07 00:00"), _ts("2025-01-07 00:15"), _ts("2025-01-07 02:30")]
+    assert aggregator.current_bar(900).time == _ts("2025-01-07 09:15")
+    # 休市时段的tick不被采用
+    assert not aggregator.on_tick(_ts("2025-01-07 03:00"), 99.0, 1)
+    assert not aggregator.on_tick(_ts("2025-01-07 20:00"), 99.0, 1)
+
+
+def test_late_ticks_are_counted_not_merged(aggregator, bars):
+    aggregator.on_tick(_ts("2025-01-06 09:00:10"), 100.0, 1)
+    aggregator.on_tick(_ts("2025-01-06 09:01:10"), 101.0, 1)
+    # 09:00的1分钟K线已收盘：只在15分钟K线上采用
+    assert aggregator.on_tick(_ts("2025-01-06 09:00:50"), 90.0, 1)
+    assert aggregator.late == {60: 1, 900: 0}
+    assert _closed(bars, 60) == [(_ts("2025-01-06 09:01"), 100.0, 100.0, 100.0, 100.0, 1)]
+    assert aggregator.current_bar(900).low == 90.0
+
+    # on_time收盘后的迟到tick不会重新打开同一根K线
+    aggregator.on_time(_ts("2025-01-06 09:15"))
+    assert aggregator.on_tick(_ts("2025-01-06 09:14:59"), 80.0, 1)     # 09:14的1分钟K线尚未出现
+    assert aggregator.late == {60: 1, 900: 1}
+    assert not aggregator.on_tick(_ts("2025-01-06 09:01:30"), 80.0, 1)
+    assert aggregator.late == {60: 2, 900: 2}
+    aggregator.flush()
+    assert [t for t, *_ in _closed(bars, 900)] == [_ts("2025-01-06 09:15")]
+    assert [t for t, *_ in _closed(bars, 60)] == [_ts("2025-01-06 09:01"), _ts("2025-01-06 09:02"),
+                                                   _ts("2025-01-06 09:15")]
+
+
+def test_amend_matches_closed_bars():
+    amended, plain = IncrementalChan("rb"), IncrementalChan("rb")
+    aggregator = TickAggregator((300,), futures_sessions())
+    aggregator.attach(300, amended, amend=True)
+    reference = TickAggregator((300,), futures_sessions(), on_bar=lambda interval, kline: plain.append(kline))
+    start = _ts("2025-01-06 09:00")
+    for k in range(0, 4 * 3600, 37):
+        price = 100.0 + (k % 900) / 60.0 - (k % 2000) / 90.0
+        aggregator.on_tick(start + k, price, 1)
+        reference.on_tick(start + k, price, 1)
+    aggregator.flush()
+    reference.flush()
+    assert [(k.time, k.high, k.low, k.close) for k in amended.klines] == \
+           [(k.time, k.high, k.low, k.close) for k in plain.klines]
@@ -2,8 +2,30 @@
 # 从各细分文件导入核心函数，对外提供统一接口（避免用户关心内部拆分）
 from .kline_combiner import combine_kline
 from .fractal_detector import detect_fractals
-from .necessary_point_finder import find_all_necessary_points, print_necessary_points
-from .stroke_identifier import identify_strokes, identify_strokes_from_necessary_points, identify_strokes_from_pandas, identify_strokes_from_klines
+from .fractal_table import FractalTable, detect_fractal_table
+from .necessary_point_finder import find_all_necessary_points, find_all_necessary_points_from_table, print_necessary_points
+from .stroke_identifier import identify_strokes, identify_strokes_from_necessary_points, identify_strokes_from_table, identify_strokes_from_pandas, identify_strokes_from_klines, identify_strokes_greedy
+from .incremental_chan import IncrementalChan
+from .chan_analyzer import ChanAnalyzer
+from .tick_aggregator import TickAggregator, futures_sessions
+from .signal_detector import detect_second_buy_sell
+from .data_loader import load_kline_frame, load_klines
+from .segment_identifier import SegmentBuilder, identify_segments
+from .pivot_detector import PivotTracker, PivotTable, detect_pivots
+from .indicators import compute_macd, IncrementalMACD, MACDIndex, find_divergences
+from .stroke_stats import StrokeStatsIndex
+from .backend import set_backend, get_backend, available_backends
+from .chunked import ChunkedChan, process_bar_file, load_chunked_results
+from .structure_history import StructureHistory
+from .sweep import parameter_grid, analyze_with_params, run_sweep
+from .backtest import backtest_signals, backtest_universe, signals_from_points
+from .snapshot import SnapshotWriter, save_snapshot, load_snapshot
+from .event_log import EventLogWriter, EventLogReader
+from .panel import Panel
+from .export import analysis_frames, concat_symbols, export_frames, write_frame
+from .shared_arrays import SharedArrays, open_shared, open_bars
+from .price_ticks import to_ticks, from_ticks, infer_tick_size, tick_size_of
+from .stage_log import quiet, set_verbose
 
 # 定义__all__：明确对外暴露的函数列表（规范导入）
 __all__ = [
@@ -14,5 +36,59 @@ __all__ = [
     "identify_strokes",        # 笔识别
     "identify_strokes_from_necessary_points"  # 基于必经点的笔识别
     "identify_strokes_from_pandas",
-    "identify_strokes_from_klines"
+    "identify_strokes_from_klines",
+    "identify_strokes_greedy", # 单遍贪心笔识别（快速模式）
+    "IncrementalChan",        # 增量分析器
+    "ChanAnalyzer",           # 惰性求值的分析流水线
+    "TickAggregator",         # Tick→多周期K线聚合
+    "futures_sessions",       # 期货交易时段
+    "detect_second_buy_sell", # 二买二卖判断
+    "load_kline_frame",       # 读取K线CSV
+    "load_klines",
+    "SegmentBuilder",         # 增量线段识别
+    "identify_segments",      # 线段识别
+    "PivotTracker",           # 增量中枢识别
+    "PivotTable",
+    "detect_pivots",          # 中枢识别
+    "compute_macd",           # MACD
+    "IncrementalMACD",
+    "MACDIndex",              # MACD区间统计
+    "find_divergences",       # 背驰
+    "StrokeStatsIndex",       # 笔统计前缀和索引
+    "FractalTable",           # 分型表
+    "detect_fractal_table",   # 向量化分型检测
+    "find_all_necessary_points_from_table",
+    "identify_strokes_from_table",
+    "set_backend",            # 计算后端（python/numba）
+    "get_backend",
+    "available_backends",
+    "ChunkedChan",            # 分块（外存）处理
+    "process_bar_file",
+    "load_chunked_results",
+    "StructureHistory",       # 历史时点结构查询
+    "parameter_grid",         # 规则参数扫描
+    "analyze_with_params",
+    "run_sweep",
+    "backtest_signals",       # 向量化信号回测
+    "backtest_universe",
+    "signals_from_points",
+    "SnapshotWriter",         # 分析状态快照
+    "save_snapshot",
+    "load_snapshot",
+    "EventLogWriter",         # 结构事件日志
+    "EventLogReader",
+    "Panel",                  # 多标的面板（截面/宽度统计）
+    "analysis_frames",        # 列式导出（DataFrame/Arrow/Parquet/CSV）
+    "concat_symbols",
+    "export_frames",
+    "write_frame",
+    "SharedArrays",           # 共享内存数组（多进程）
+    "open_shared",
+    "open_bars",
+    "to_ticks",               # 定点整数价格（最小变动价位）
+    "from_ticks",
+    "infer_tick_size",
+    "tick_size_of",
+    "quiet",                  # 各阶段输出开关（按上下文，线程安全）
+    "set_verbose"
 ]
\ No newline at end of file
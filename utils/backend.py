@@ -0,0 +1,76 @@
+# utils/backend.py
+import importlib
+import os
+import sys
+import warnings
+
+try:
+    import numba
+except ImportError:  # numba为可选依赖
+    numba = None
+
+
+# 内核注册表：{内核名: {后端名: 函数}}
+_KERNELS = {}
+# 默认后端：auto = 安装了numba时用numba，否则python；可用环境变量EASYCHAN_BACKEND覆盖
+_default_backend = os.environ.get("EASYCHAN_BACKEND", "auto")
+_warned = set()
+
+
+def available_backends():
+    """当前环境可用的后端列表"""
+    return ["python", "numba"] if numba is not None else ["python"]
+
+
+def set_backend(backend):
+    """设置全局默认后端：'auto' / 'python' / 'numba'"""
+    global _default_backend
+    if backend not in ("auto", "python", "numba"):
+        raise ValueError(f"未知后端：{backend}")
+    _default_backend = backend
+
+
+def get_backend():
+    """返回全局默认后端"""
+    return _default_backend
+
+
+def resolve_backend(backend=None):
+    """把'auto'/None解析为实际使用的后端名，不可用的后端回退到python"""
+    backend = backend or _default_backend
+    if backend == "auto":
+        return "numba" if numba is not None else "python"
+    if backend == "numba" and numba is None:
+        if "numba" not in _warned:
+            _warned.add("numba")
+            warnings.warn("未安装numba，回退到python后端", RuntimeWarning)
+        return "python"
+    return backend
+
+
+def register_kernel(name, backend="python", jit=False):
+    """
+    装饰器：注册内核实现
+
+    参数:
+        name: 内核名
+        backend: 注册到的后端名；为"numba"时以njit(cache=True, nogil=True)编译（首次调用时编译，
+                 结果缓存到磁盘；释放GIL，可在线程池中并行），未安装numba则不注册
+        jit: 为True时同一函数同时作为python参考实现和numba实现注册
+    """
+    def decorator(fn):
+        impls = _KERNELS.setdefault(name, {})
+        if backend != "numba":
+            impls[backend] = fn
+        if (backend == "numba" or jit) and numba is not None:
+            impls["numba"] = numba.njit(cache=True, nogil=True)(fn)
+        return fn
+    return decorator
+
+
+def get_kernel(name, backend=None):
+    """取得内核函数：按指定（或默认）后端查找，缺失时回退到python参考实现"""
+    if "utils.kernels" not in sys.modules:
+        importlib.import_module("utils.kernels")  # 注册循环形式的JIT内核
+    impls = _KERNELS[name]
+    return impls.get(resolve_backend(backend), impls["python"])
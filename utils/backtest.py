@@ -0,0 +1,198 @@
+# utils/backtest.py
+import numpy as np
+import pandas as pd
+
+
+# 交易记录格式
+TRADE_DTYPE = np.dtype([
+    ('direction', 'i1'),        # 1=多，-1=空
+    ('entry_index', 'i8'), ('exit_index', 'i8'),      # 开/平仓成交所在K线序号（未平仓为最后一根）
+    ('entry_time', 'f8'), ('exit_time', 'f8'),
+    ('entry_price', 'f8'), ('exit_price', 'f8'),      # 成交价（未计滑点）
+    ('pnl', 'f8'),              # 扣除手续费、滑点后的盈亏
+    ('cost', 'f8'),             # 手续费 + 滑点
+    ('bars', 'i8'),             # 持仓K线数
+    ('is_open', '?'),           # 回测结束时仍未平仓（按最后收盘价计）
+])
+
+
+def signals_from_points(bars, buy_points=(), sell_points=()):
+    """
+    twobuytwosale_v2.py风格的买卖点列表（含'time'的字典）→ 信号数组（1=买，-1=卖，0=无）
+
+    买卖点按时间对齐到bars['time']（时间不在bars中的点忽略）
+    """
+    times = np.asarray(bars['time'], dtype='f8')
+    signals = np.zeros(len(times), dtype='i1')
+    for points, value in ((buy_points, 1), (sell_points, -1)):
+        point_times = np.array([p['time'] for p in points], dtype='f8')
+        idx = np.searchsorted(times, point_times)
+        idx = idx[(idx < len(times)) & (times[np.minimum(idx, len(times) - 1)] == point_times)]
+        signals[idx] += value
+    return np.sign(signals).astype('i1')
+
+
+def target_positions(signals, mode="long"):
+    """
+    信号数组 → 每根K线收盘后的目标持仓（1/0/-1，信号向后延续）
+
+    mode: "long"（买开卖平）、"short"（卖开买平）、"both"（多空反手）
+    """
+    signals = np.asarray(signals)
+    last = np.where(signals != 0, np.arange(len(signals)), -1)
+    last = np.maximum.accumulate(last) if len(last) else last
+    state = np.where(last >= 0, signals[np.maximum(last, 0)], 0).astype('i8')
+    if mode == "long":
+        return np.where(state > 0, 1, 0)
+    if mode == "short":
+        return np.where(state < 0, -1, 0)
+    if mode == "both":
+        return state
+    raise ValueError(f"未知的回测模式：{mode}")
+
+
+def backtest_signals(bars, signals, mode="long", fill="next_open", multiplier=1.0, size=1.0,
+                     commission_rate=0.0, commission_per_unit=0.0, slippage=0.0, initial_capital=0.0):
+    """
+    向量化信号回测
+
+    参数:
+        bars: BAR_DTYPE结构化数组（至少含time/open/close）
+        signals: 与bars等长的信号数组（1=买，-1=卖，0=无），信号在该K线收盘时产生
+        mode: "long"/"short"/"both"（见target_positions）
+        fill: "next_open"（下一根K线开盘成交，默认，无未来函数）或"close"（信号K线收盘成交）
+        multiplier: 合约乘数（股票为1）
+        size: 每次交易的手数/股数
+        commission_rate: 按成交额计的手续费率（单边）
+        commission_per_unit: 每手/每股固定手续费（单边）
+        slippage: 滑点（价格单位，单边）
+        initial_capital: 初始资金（只用于权益曲线和回撤比例）
+    返回:
+        dict: trades（TRADE_DTYPE数组）, position（每根K线成交后的持仓）, pnl（每根K线盈亏）,
+              equity（权益曲线）, drawdown（回撤，非正）, stats（统计指标，见trade_stats）
+    """
+    times = np.asarray(bars['time'], dtype='f8')
+    close = np.asarray(bars['close'], dtype='f8')
+    n = len(close)
+    target = target_positions(signals, mode)
+    if fill == "next_open":
+        fill_price = np.asarray(bars['open'], dtype='f8')
+        position = np.concatenate([[0], target[:-1]]) if n else target
+    elif fill == "close":
+        fill_price = close
+        position = target
+    else:
+        raise ValueError(f"未知的成交方式：{fill}")
+
+    # 每根K线盈亏：成交前沿用上一持仓（上一收盘→成交价），成交后为新持仓（成交价→本收盘）
+    prev_position = np.concatenate([[0], position[:-1]]) if n else position
+    prev_close = np.concatenate([[close[0]], close[:-1]]) if n else close
+    unit = multiplier * size
+    side_cost = slippage * multiplier + commission_rate * fill_price * multiplier + commission_per_unit
+    traded = np.abs(position - prev_position) * size
+    pnl = (prev_position * (fill_price - prev_close) + position * (close - fill_price)) * unit - traded * side_cost
+    equity = initial_capital + np.cumsum(pnl)
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, initial_capital)) if n else equity
+
+    # 交易：持仓不为0且保持不变的区间
+    changes = np.flatnonzero(position != prev_position)
+    entries = changes[position[changes] != 0]
+    k = np.searchsorted(changes, entries, side='right')
+    is_open = k >= len(changes)
+    exits = np.where(is_open, n - 1, changes[np.minimum(k, len(changes) - 1)]) if len(changes) else entries
+    direction = position[entries]
+    exit_price = np.where(is_open, close[exits], fill_price[exits])
+    entry_cost = side_cost[entries] * size
+    exit_cost = np.where(is_open, 0.0, side_cost[exits] * size)
+
+    trades = np.empty(len(entries), dtype=TRADE_DTYPE)
+    trades['direction'] = direction
+    trades['entry_index'], trades['exit_index'] = entries, exits
+    trades['entry_time'], trades['exit_time'] = times[entries], times[exits]
+    trades['entry_price'], trades['exit_price'] = fill_price[entries], exit_price
+    trades['cost'] = entry_cost + exit_cost
+    trades['pnl'] = direction * (exit_price - fill_price[entries]) * unit - trades['cost']
+    trades['bars'] = exits - entries
+    trades['is_open'] = is_open
+
+    return {
+        "trades": trades,
+        "position": position,
+        "pnl": pnl,
+        "equity": equity,
+        "drawdown": drawdown,
+        "stats": trade_stats(trades, pnl, initial_capital),
+    }
+
+
+def trade_stats(trades, pnl, initial_capital=0.0):
+    """
+    统计指标
+
+    返回:
+        dict: trades（笔数，含未平仓）, closed, hit_rate（已平仓胜率）, total_pnl, avg_pnl, avg_win, avg_loss,
+              profit_factor, avg_bars（平均持仓K线数）, max_drawdown（最大回撤金额），
+              max_drawdown_pct（相对回撤前权益高点，initial_capital为0时不计算）
+    """
+    closed = trades[~trades['is_open']]
+    wins = closed['pnl'][closed['pnl'] > 0]
+    losses = closed['pnl'][closed['pnl'] <= 0]
+    equity = initial_capital + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital)) if len(equity) else equity
+    drawdown = equity - peak
+    k = int(np.argmin(drawdown)) if len(drawdown) else 0
+    return {
+        "trades": len(trades),
+        "closed": len(closed),
+        "hit_rate": len(wins) / len(closed) if len(closed) else 0.0,
+        "total_pnl": float(np.sum(pnl)),
+        "avg_pnl": float(closed['pnl'].mean()) if len(closed) else 0.0,
+        "avg_win": float(wins.mean()) if len(wins) else 0.0,
+        "avg_loss": float(losses.mean()) if len(losses) else 0.0,
+        "profit_factor": _profit_factor(wins, losses),
+        "avg_bars": float(trades['bars'].mean()) if len(trades) else 0.0,
+        "max_drawdown": float(-drawdown.min()) if len(drawdown) else 0.0,
+        "max_drawdown_pct": float(-drawdown[k] / peak[k]) if len(drawdown) and initial_capital > 0 else 0.0,
+    }
+
+
+def _profit_factor(wins, losses):
+    """内部函数：盈利总额 / 亏损总额（无亏损时有盈利为inf，否则为0）"""
+    gross_loss = -losses.sum()
+    if gross_loss > 0:
+        return float(wins.sum() / gross_loss)
+    if len(wins):
+        return float('inf')
+    return 0.0
+
+
+def backtest_universe(data, multipliers=None, initial_capital=0.0, **kwargs):
+    """
+    多标的回测并汇总
+
+    参数:
+        data: {标的: (bars, signals)}
+        multipliers: {标的: 合约乘数}（缺省为kwargs中的multiplier或1）
+        initial_capital: 初始资金（各标的与组合统计均以此为基准）
+        kwargs: 传给backtest_signals的其余参数
+    返回:
+        tuple: (各标的统计DataFrame（最后一行ALL为组合，按时间合并各标的逐K线盈亏）, {标的: backtest_signals返回值})
+    """
+    multipliers = multipliers or {}
+    results = {}
+    rows = []
+    for symbol, (bars, signals) in data.items():
+        params = dict(kwargs, initial_capital=initial_capital)
+        if symbol in multipliers:
+            params["multiplier"] = multipliers[symbol]
+        result = backtest_signals(bars, signals, **params)
+        results[symbol] = result
+        rows.append(dict({"symbol": symbol}, **result["stats"]))
+
+    if results:
+        trades = np.concatenate([r["trades"] for r in results.values()])
+        portfolio_pnl = pd.concat(
+            [pd.Series(r["pnl"], index=np.asarray(data[s][0]['time'], dtype='f8')) for s, r in results.items()]
+        ).groupby(level=0).sum()
+        rows.append(dict({"symbol": "ALL"}, **trade_stats(trades, portfolio_pnl.to_numpy(), initial_capital)))
+    return pd.DataFrame(rows), results
@@ -0,0 +1,59 @@
+# utils/bar_array.py
+import numpy as np
+from core.Chan_base import KLine
+
+
+# 原始K线的数组格式（结构化数组，可直接memmap/共享内存）
+BAR_DTYPE = np.dtype([
+    ('time', 'f8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+    ('amount', 'f8'),
+])
+
+
+def klines_to_array(kline_list):
+    """KLine对象列表 → BAR_DTYPE结构化数组"""
+    bars = np.empty(len(kline_list), dtype=BAR_DTYPE)
+    for name in BAR_DTYPE.names:
+        bars[name] = [getattr(k, name, 0) for k in kline_list]
+    return bars
+
+
+def array_to_klines(bars, symbol="", start_index=0):
+    """BAR_DTYPE结构化数组 → KLine对象列表"""
+    columns = [bars[name].tolist() for name in BAR_DTYPE.names]
+    return [
+        KLine(time=t, open=o, high=h, low=l, close=c, volume=v, symbol=symbol, index=start_index + i, amount=a)
+        for i, (t, o, h, l, c, v, a) in enumerate(zip(*columns))
+    ]
+
+
+def frame_to_array(df):
+    """DataFrame（load_kline_frame返回值）→ BAR_DTYPE结构化数组，时间换算方式与KLine一致"""
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['time'] = df['date'].map(lambda d: d.timestamp()).to_numpy(dtype='f8')
+    for name in BAR_DTYPE.names[1:]:
+        bars[name] = df[name].to_numpy(dtype='f8') if name in df.columns else 0.0
+    return bars
+
+
+def combined_to_arrays(combined_klines):
+    """
+    合并K线 → 列数组字典
+
+    返回:
+        dict: time/high/low（float64）, pos_begin/pos_end/pos_extreme（int64）, is_up（bool）
+    """
+    return {
+        "time": np.array([k.data.time for k in combined_klines], dtype='f8'),
+        "high": np.array([k.high for k in combined_klines], dtype='f8'),
+        "low": np.array([k.low for k in combined_klines], dtype='f8'),
+        "pos_begin": np.array([k.pos_begin for k in combined_klines], dtype='i8'),
+        "pos_end": np.array([k.pos_end for k in combined_klines], dtype='i8'),
+        "pos_extreme": np.array([k.pos_extreme for k in combined_klines], dtype='i8'),
+        "is_up": np.array([k.isUp for k in combined_klines], dtype=bool),
+    }
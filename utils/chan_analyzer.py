@@ -0,0 +1,200 @@
+# utils/chan_analyzer.py
+import copy
+from utils.incremental_chan import IncrementalChan
+from utils.fractal_table import FractalTable
+from utils.necessary_point_finder import find_all_necessary_points_from_table
+from utils.stroke_identifier import identify_strokes, identify_strokes_greedy, identify_strokes_from_table
+from utils.signal_detector import detect_second_buy_sell
+from core.Chan_base import Stroke
+
+
+# 各阶段及其依赖：合并K线 → 分型 → 分型表 → 必经点 → 笔 → 信号
+STAGES = ("combined", "fractals", "fractal_table", "necessary_points", "strokes", "last_stroke", "signals")
+
+
+class ChanAnalyzer:
+    """
+    惰性求值的缠论分析流水线：各阶段（合并K线、分型、必经点、笔、信号）在首次访问时计算并缓存
+
+    - append/extend只登记K线，不做任何计算；访问任一阶段时才把新K线并入合并K线（增量，见IncrementalChan）
+    - 新K线并入后，各阶段按其输入是否真的变化决定是否失效：合并K线只影响最后一根，分型表/必经点/笔
+      只在分型集合（确认分型数量 + 临时分型）变化时重算，信号另随合并K线数量变化
+    - 只需要分型或最后一笔时，不会计算全部的笔：last_stroke只对最后一个有效必经点窗口做动态规划
+
+    用法:
+        analyzer = ChanAnalyzer(kline_list, "rb2601")
+        tops, bottoms = analyzer.fractals
+        analyzer.append(kline)
+        stroke = analyzer.last_stroke
+    """
+    def __init__(self, kline_list=None, symbol="", stroke_method="dp", pattern_strokes=4, backend=None):
+        """
+        参数:
+            kline_list: 初始K线（KLine列表），可为None
+            symbol: 标的代码
+            stroke_method: 笔识别方式（见STROKE_METHODS）
+            pattern_strokes: 二买/二卖形态的笔数（见detect_second_buy_sell）
+            backend: 分型表内核的计算后端（见utils.backend）
+        """
+        self._chan = IncrementalChan(symbol, stroke_method)
+        self.pattern_strokes = pattern_strokes
+        self.backend = backend
+        self._pending = []          # 已登记、尚未并入的K线
+        self._cache = {}            # 阶段名 → (输入标识, 结果)
+        if kline_list:
+            self.extend(kline_list)
+
+    @property
+    def symbol(self):
+        return self._chan.symbol
+
+    @property
+    def stroke_method(self):
+        return self._chan.stroke_method
+
+    def __len__(self):
+        return len(self._chan.klines) + len(self._pending)
+
+    # ------------------------------------------------------------------
+    # 输入
+    # ------------------------------------------------------------------
+    def append(self, kline):
+        """登记一根已完成的K线（保存副本，计算推迟到下次访问任一阶段时）"""
+        self._pending.append(copy.copy(kline))
+
+    def extend(self, kline_list):
+        """登记多根K线"""
+        self._pending.extend(copy.copy(kline) for kline in kline_list)
+
+    def replace_last(self, kline):
+        """替换最后一根K线（盘中未完成K线的更新，见IncrementalChan.replace_last）"""
+        if self._pending:
+            self._pending[-1] = copy.copy(kline)
+        elif self._chan.klines:
+            self._chan.replace_last(kline)
+        else:
+            raise ValueError("尚无K线，无法替换")
+
+    def _sync(self):
+        """内部函数：把登记的K线并入合并K线与分型"""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            for kline in pending:
+                self._chan.append(kline)
+
+    # ------------------------------------------------------------------
+    # 缓存
+    # ------------------------------------------------------------------
+    def _fractal_key(self):
+        """内部函数：分型集合的标识（分型表、必经点、笔的输入；先并入登记的K线）"""
+        self._sync()
+        return self._chan._fractal_key()
+
+    def _memo(self, stage, key, compute):
+        """内部函数：key与缓存一致时返回缓存结果，否则重新计算"""
+        entry = self._cache.get(stage)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        value = compute()
+        self._cache[stage] = (key, value)
+        return value
+
+    def cached_stages(self):
+        """当前仍然有效（无需重算）的阶段名列表"""
+        key = self._fractal_key()
+        keys = {
+            "combined": None,
+            "fractals": key,
+            "fractal_table": key,
+            "necessary_points": key,
+            "strokes": key,
+            "last_stroke": key,
+            "signals": (key, len(self._chan.combined), self.pattern_strokes),
+        }
+        return [stage for stage in STAGES
+                if stage == "combined" or (stage in self._cache and self._cache[stage][0] == keys[stage])]
+
+    def invalidate(self):
+        """清空全部缓存（修改了pattern_strokes以外的参数后调用）"""
+        self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # 各阶段
+    # ------------------------------------------------------------------
+    @property
+    def klines(self):
+        """已接收的原始K线"""
+        self._sync()
+        return self._chan.klines
+
+    @property
+    def combined(self):
+        """合并K线（stCombineK列表；最后一根会随新K线变化）"""
+        self._sync()
+        return self._chan.combined
+
+    @property
+    def fractals(self):
+        """(顶分型列表, 底分型列表)，含临时分型，与detect_fractals的结果一致"""
+        return self._memo("fractals", self._fractal_key(), self._chan.fractals)
+
+    @property
+    def fractal_table(self):
+        """分型表（FractalTable）"""
+        def compute():
+            return FractalTable.from_fractals(self._chan.combined, *self.fractals, backend=self.backend)
+        return self._memo("fractal_table", self._fractal_key(), compute)
+
+    @property
+    def necessary_points(self):
+        """必经点列表（find_all_necessary_points_from_table的结果）"""
+        def compute():
+            return find_all_necessary_points_from_table(self.fractal_table)
+        return self._memo("necessary_points", self._fractal_key(), compute)
+
+    @property
+    def strokes(self):
+        """笔列表，与对全部K线调用identify_strokes_from_klines（method=stroke_method）的结果一致"""
+        def compute():
+            if self.stroke_method == "greedy":
+                return identify_strokes_greedy(self._chan.combined, self.fractal_table)
+            return identify_strokes(self._chan.combined, self.necessary_points, None, None,
+                                    fractal_table=self.fractal_table)
+        return self._memo("strokes", self._fractal_key(), compute)
+
+    @property
+    def last_stroke(self):
+        """
+        最后一笔（Stroke或None），端点与strokes[-1]一致
+
+        笔已计算时直接取strokes[-1]；否则（dp方式）从最后一个必经点窗口向前，只对第一个能识别出笔的窗口做动态规划
+        """
+        key = self._fractal_key()
+        entry = self._cache.get("strokes")
+        if entry is not None and entry[0] == key:
+            return entry[1][-1] if entry[1] else None
+        if self.stroke_method == "greedy":
+            strokes = self.strokes
+            return strokes[-1] if strokes else None
+        return self._memo("last_stroke", key, self._last_window_stroke)
+
+    def _last_window_stroke(self):
+        """内部函数：最后一个有效必经点窗口内的最后一笔（窗口划分与identify_strokes相同）"""
+        table = self.fractal_table
+        points = sorted((p for p in self.necessary_points if p.get("fractal")), key=lambda p: p["fractal"].time)
+        for begin, end in reversed(list(zip(points, points[1:]))):
+            if begin["top_or_bottom"] == end["top_or_bottom"]:
+                continue
+            window_fractals = identify_strokes_from_table(table, begin["fractal"], end["fractal"])
+            if len(window_fractals) >= 2:
+                return Stroke(start_fractal=window_fractals[-2], end_fractal=window_fractals[-1])
+        return None
+
+    @property
+    def signals(self):
+        """最后一根合并K线处的(是否二买, 是否二卖)，见detect_second_buy_sell"""
+        def compute():
+            tops, bottoms = self.fractals
+            return detect_second_buy_sell(self._chan.combined, tops, bottoms, self.strokes, self.pattern_strokes)
+        key = (self._fractal_key(), len(self._chan.combined), self.pattern_strokes)
+        return self._memo("signals", key, compute)
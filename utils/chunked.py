@@ -0,0 +1,277 @@
+# utils/chunked.py
+import os
+import numpy as np
+import pandas as pd
+from utils.backend import get_kernel
+from utils.bar_array import BAR_DTYPE, frame_to_array
+from utils.data_loader import _COLUMN_MAP
+from utils.kline_combiner import new_combine_state, open_combined_bar
+from utils.necessary_point_finder import find_necessary_rows
+from utils.stroke_identifier import identify_stroke_rows
+from utils.stage_log import stage_print
+
+
+# 分块处理的输出格式（无文件头的定长记录，按记录顺序追加写入，读取见load_chunked_results）
+COMBINED_DTYPE = np.dtype([
+    ('time', 'f8'), ('high', 'f8'), ('low', 'f8'),
+    ('pos_begin', 'i8'), ('pos_end', 'i8'), ('pos_extreme', 'i8'), ('is_up', '?'),
+])
+FRACTAL_DTYPE = np.dtype([
+    ('kind', 'i1'),         # 1=顶分型，-1=底分型
+    ('mid', 'i8'),          # 中间合并K线序号
+    ('time', 'f8'),
+    ('price', 'f8'),
+    ('reach', 'i8'),        # 见FractalTable.reach；在后续块中被突破时回填，finish()后未被突破的为合并K线总数
+])
+_REACH_OFFSET = FRACTAL_DTYPE.fields['reach'][1]
+STROKE_DTYPE = np.dtype([
+    ('start_row', 'i8'), ('end_row', 'i8'),          # 起止分型在fractals中的行号
+    ('start_time', 'f8'), ('end_time', 'f8'),
+    ('start_price', 'f8'), ('end_price', 'f8'),
+    ('direction', 'i1'),    # 1=向上笔，-1=向下笔
+])
+_OUTPUTS = {"combined": COMBINED_DTYPE, "fractals": FRACTAL_DTYPE, "strokes": STROKE_DTYPE}
+
+
+def open_bar_file(path):
+    """以内存映射方式打开BAR_DTYPE格式的K线文件（.npy，或无文件头的定长记录文件）"""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+    return np.memmap(path, dtype=BAR_DTYPE, mode="r")
+
+
+def csv_to_bar_file(csv_path, bar_path, block_size=500000):
+    """
+    分块把CSV格式的K线（列名与load_kline_frame兼容）转换为无文件头的BAR_DTYPE记录文件
+
+    返回:
+        int: 写入的K线数量
+    """
+    count = 0
+    with open(bar_path, "wb") as f:
+        for df in pd.read_csv(csv_path, chunksize=block_size):
+            df = df.rename(columns=_COLUMN_MAP)
+            df['date'] = pd.to_datetime(df['date'])
+            f.write(frame_to_array(df).tobytes())
+            count += len(df)
+    return count
+
+
+def load_chunked_results(out_dir):
+    """
+    读取ChunkedChan的输出
+
+    返回:
+        dict: combined/fractals/strokes → 结构化数组（内存映射，只读）
+    """
+    result = {}
+    for name, dtype in _OUTPUTS.items():
+        path = os.path.join(out_dir, name + ".bin")
+        if os.path.getsize(path) == 0:
+            result[name] = np.empty(0, dtype=dtype)
+        else:
+            result[name] = np.memmap(path, dtype=dtype, mode="r")
+    return result
+
+
+class ChunkedChan:
+    """
+    分块缠论处理：按块接收原始K线数组，块与块之间只保留边界状态，结果逐块追加写入out_dir
+
+    - 合并K线：保留未完成的最后一根合并K线（及其极值K线），已固定的合并K线写入combined.bin
+    - 分型：保留最后两根已固定的合并K线，以之为左侧/中间K线的分型在下一块中确认，写入fractals.bin
+    - 分型的reach（之后第一根突破分型价的合并K线）：块内由单调栈求出，尚未被突破的顶/底分型
+      （价格单调的两个栈）跨块保留，被后续块突破时回填到fractals.bin
+    - 笔：依赖全局必经点（全局最高顶、最低底），无法在块内确定；finish()时基于磁盘上的分型表
+      （内存映射）做一次必经点搜索和窗口动态规划，写入strokes.bin
+
+    常驻内存：合并K线与分型部分与块大小成正比，另加尚未被突破的分型；finish()中的笔识别另需
+    与分型数成正比的整数数组（不读入合并K线）。结果与identify_strokes_from_klines对全部K线一次计算一致
+
+    用法:
+        with ChunkedChan(out_dir) as chan:
+            for block in blocks:
+                chan.feed(block)
+            chan.finish()
+    """
+    def __init__(self, out_dir, backend=None):
+        self.out_dir = out_dir
+        self.backend = backend
+        os.makedirs(out_dir, exist_ok=True)
+        self._files = {}
+        try:
+            for name in _OUTPUTS:
+                self._files[name] = open(os.path.join(out_dir, name + ".bin"), "w+b" if name == "fractals" else "wb")
+        except BaseException:
+            self.close()
+            raise
+        self.counts = {name: 0 for name in _OUTPUTS}
+        self.bar_count = 0
+        self._state_f, self._state_i = new_combine_state()
+        self._tail = np.empty(0, dtype=COMBINED_DTYPE)   # 最后两根已固定的合并K线
+        # 尚未被突破的分型：kind → (分型行号, 分型价格)，顶分型价格自底向上递减，底分型递增
+        self._pending = {kind: (np.empty(0, dtype='i8'), np.empty(0)) for kind in (1, -1)}
+        self._finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """关闭输出文件（出错或未调用finish时输出不完整；可重复调用）"""
+        for f in self._files.values():
+            f.close()
+
+    def _write(self, name, records):
+        if len(records):
+            self._files[name].write(records.tobytes())
+            self.counts[name] += len(records)
+
+    def _fill_reach(self, rows, reach):
+        """内部函数：回填已写入fractals.bin的分型的reach"""
+        f = self._files["fractals"]
+        for row, value in zip(rows.tolist(), np.asarray(reach, dtype='<i8').tolist()):
+            f.seek(row * FRACTAL_DTYPE.itemsize + _REACH_OFFSET)
+            f.write(np.int64(value).tobytes())
+        f.seek(0, os.SEEK_END)
+
+    def _resolve_pending(self, combined, first_index):
+        """内部函数：用新固定的合并K线突破跨块保留的分型（运行最高价/最低价上二分查找）"""
+        if not len(combined):
+            return
+        for kind, values in ((1, combined['high']), (-1, -combined['low'])):
+            rows, prices = self._pending[kind]
+            if not len(rows):
+                continue
+            running = np.maximum.accumulate(values)
+            pos = np.searchsorted(running, kind * prices, side='right')
+            broken = pos < len(combined)
+            self._fill_reach(rows[broken], first_index + pos[broken])
+            self._pending[kind] = (rows[~broken], prices[~broken])
+
+    def _push_combined(self, combined):
+        """内部函数：写入新固定的合并K线，并检测以其为右侧K线的分型"""
+        first_index = self.counts["combined"]
+        self._write("combined", combined)
+        self._resolve_pending(combined, first_index)
+        window = np.concatenate([self._tail, combined])
+        offset = first_index - len(self._tail)       # window[0]的合并K线序号
+        self._tail = window[-2:].copy()
+
+        highs, lows = np.ascontiguousarray(window['high']), np.ascontiguousarray(window['low'])
+        marks = get_kernel("fractal_marks", self.backend)(highs, lows)
+        pos = np.flatnonzero(marks)
+        fractals = np.empty(len(pos), dtype=FRACTAL_DTYPE)
+        fractals['kind'] = marks[pos]
+        fractals['mid'] = pos + offset
+        fractals['time'] = window['time'][pos]
+        fractals['price'] = np.where(marks[pos] == 1, highs[pos], lows[pos])
+
+        # 窗口内被突破的分型直接得到reach，其余留待后续块
+        next_break = get_kernel("next_break", self.backend)
+        reach = np.where(marks[pos] == 1, next_break(highs, 1.0)[pos], next_break(lows, -1.0)[pos])
+        unresolved = reach >= len(window)
+        fractals['reach'] = np.where(unresolved, -1, reach + offset)
+        rows = self.counts["fractals"] + np.arange(len(pos))
+        self._write("fractals", fractals)
+        for kind in (1, -1):
+            keep = unresolved & (fractals['kind'] == kind)
+            old_rows, old_prices = self._pending[kind]
+            self._pending[kind] = (np.concatenate([old_rows, rows[keep]]),
+                                   np.concatenate([old_prices, fractals['price'][keep]]))
+
+    def feed(self, bars):
+        """
+        处理一块原始K线（BAR_DTYPE结构化数组或其切片，须紧接上一块）；出错时关闭输出文件后抛出
+
+        返回:
+            int: 本块新固定的合并K线数量
+        """
+        if self._finished:
+            raise RuntimeError("ChunkedChan已结束，不能继续追加K线")
+        try:
+            columns = get_kernel("combine", self.backend)(
+                np.ascontiguousarray(bars['time'], dtype='f8'),
+                np.ascontiguousarray(bars['high'], dtype='f8'),
+                np.ascontiguousarray(bars['low'], dtype='f8'),
+                self.bar_count, self._state_f, self._state_i)
+            count = columns[-1]
+            combined = np.empty(count, dtype=COMBINED_DTYPE)
+            for name, column in zip(COMBINED_DTYPE.names, columns[:-1]):
+                combined[name] = column[:count]
+            self.bar_count += len(bars)
+            self._push_combined(combined)
+        except BaseException:
+            self.close()
+            raise
+        return count
+
+    def finish(self):
+        """
+        固定最后一根合并K线，识别笔并关闭输出文件
+
+        返回:
+            dict: 各输出的记录数（combined/fractals/strokes）
+        """
+        if self._finished:
+            return dict(self.counts)
+        try:
+            if self._state_i[0]:
+                self._push_combined(np.array([open_combined_bar(self._state_f, self._state_i)], dtype=COMBINED_DTYPE))
+            for kind in (1, -1):
+                rows = self._pending[kind][0]
+                self._fill_reach(rows, np.full(len(rows), self.counts["combined"]))
+                self._pending[kind] = (rows[:0], self._pending[kind][1][:0])
+            for name in ("combined", "fractals"):
+                self._files[name].flush()
+            self._write("strokes", self._identify_strokes())
+        finally:
+            self.close()
+        self._finished = True
+        stage_print(f"[分块处理] {self.bar_count} 根K线 → {self.counts['combined']} 根合并K线，"
+              f"{self.counts['fractals']} 个分型，{self.counts['strokes']} 笔")
+        return dict(self.counts)
+
+    def _identify_strokes(self):
+        """内部函数：基于磁盘上的分型表（内存映射，reach已随分块求出）识别笔"""
+        if self.counts["fractals"] == 0:
+            return np.empty(0, dtype=STROKE_DTYPE)
+        fractals = np.memmap(os.path.join(self.out_dir, "fractals.bin"), dtype=FRACTAL_DTYPE, mode="r")
+        kind = np.ascontiguousarray(fractals['kind'])
+        mid = np.ascontiguousarray(fractals['mid'])
+        price = np.ascontiguousarray(fractals['price'])
+        reach = np.ascontiguousarray(fractals['reach'])
+
+        point_rows, _ = find_necessary_rows(kind, mid, price, self.counts["combined"], self.backend)
+        rows = np.array(identify_stroke_rows(kind, mid, reach, point_rows, self.backend), dtype='i8')
+        if len(rows) < 2:
+            return np.empty(0, dtype=STROKE_DTYPE)
+        strokes = np.empty(len(rows) - 1, dtype=STROKE_DTYPE)
+        strokes['start_row'], strokes['end_row'] = rows[:-1], rows[1:]
+        strokes['start_time'], strokes['end_time'] = fractals['time'][rows[:-1]], fractals['time'][rows[1:]]
+        strokes['start_price'], strokes['end_price'] = price[rows[:-1]], price[rows[1:]]
+        strokes['direction'] = np.where((kind[rows[:-1]] == -1) & (kind[rows[1:]] == 1), 1, -1)
+        return strokes
+
+
+def process_bar_file(bar_path, out_dir, block_size=500000, backend=None):
+    """
+    分块处理一个K线文件（见open_bar_file），结果写入out_dir
+
+    参数:
+        bar_path: BAR_DTYPE格式的K线文件路径
+        out_dir: 输出目录（combined.bin/fractals.bin/strokes.bin）
+        block_size: 每块K线数量
+        backend: 计算后端（见utils.backend）
+    返回:
+        dict: 各输出的记录数
+    """
+    bars = open_bar_file(bar_path)
+    with ChunkedChan(out_dir, backend=backend) as chan:
+        for start in range(0, len(bars), block_size):
+            chan.feed(bars[start:start + block_size])
+        return chan.finish()
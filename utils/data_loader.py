@@ -0,0 +1,49 @@
+# utils/data_loader.py
+import os
+import pandas as pd
+from core.Chan_base import KLine
+
+
+# 东方财富期货导出数据的中文列名 → 统一列名
+_COLUMN_MAP = {'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close', '成交量': 'volume', '成交额': 'amount'}
+
+
+def load_kline_frame(file_path, tail_n=None):
+    """
+    读取CSV格式的K线数据（兼容data目录下的指数周线和期货15分钟数据），返回统一列名的DataFrame
+
+    参数:
+        file_path: CSV文件路径
+        tail_n: 只保留最后N条数据（None表示全部）
+    返回:
+        DataFrame: 至少包含date/open/high/low/close/volume列（数据含成交额时另有amount列），date为datetime类型
+    """
+    df = pd.read_csv(file_path)
+    df = df.rename(columns=_COLUMN_MAP)
+    if tail_n:
+        df = df.tail(tail_n)
+    df['date'] = pd.to_datetime(df['date'])
+    return df.reset_index(drop=True)
+
+
+def frame_to_klines(df, symbol=""):
+    """将DataFrame转换为KLine对象列表（时间戳换算方式与main.py一致）"""
+    times = df['date'].map(lambda d: d.timestamp()).tolist()
+    amounts = df['amount'].tolist() if 'amount' in df.columns else [0] * len(df)
+    return [
+        KLine(time=t, open=o, high=h, low=l, close=c, volume=v, symbol=symbol, index=i, amount=a)
+        for i, (t, o, h, l, c, v, a) in enumerate(zip(
+            times, df['open'].tolist(), df['high'].tolist(), df['low'].tolist(),
+            df['close'].tolist(), df['volume'].tolist(), amounts))
+    ]
+
+
+def symbol_from_path(file_path):
+    """由文件名推断标的代码，如data/113.rb2601.csv → 113.rb2601"""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def load_klines(file_path, symbol=None, tail_n=None):
+    """读取CSV文件并直接返回KLine对象列表"""
+    df = load_kline_frame(file_path, tail_n)
+    return frame_to_klines(df, symbol if symbol is not None else symbol_from_path(file_path))
@@ -0,0 +1,400 @@
+# utils/event_log.py
+import json
+import os
+import struct
+import time
+import numpy as np
+import pandas as pd
+from core.Chan_base import Stroke
+from utils.bar_array import BAR_DTYPE
+from utils.incremental_chan import IncrementalChan, STATE_COMBINED_DTYPE, STATE_FRACTAL_DTYPE, STATE_STROKE_DTYPE
+from utils.signal_detector import detect_second_buy_sell
+
+
+# 事件日志文件格式：
+#   MAGIC(8字节) | 版本号(uint32) | 头部长度(uint32) | 头部JSON(utf-8) | 定长事件记录...
+# 每根K线（含replace_last替换）产生一组事件，组内第一条为BAR；索引文件（日志路径 + ".idx"）每组一条
+# (bar, time, begin, end)记录，end为组结束后的事件序号。两个文件都只追加，进程中断最多丢失最后一组
+MAGIC = b"ECEVLOG\x00"
+VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+
+# 事件类型
+BAR = 1                 # 收到K线：slot=K线序号，flag=1为替换，f0~f5=open/high/low/close/volume/amount，
+                        # i0/i1/i2=处理后的合并K线数/确认分型数/笔数（未记录笔时为-1）
+COMBINED_NEW = 2        # 新合并K线：slot=合并K线序号，flag=是否向上，f0~f2=time/high/low，i0~i2=pos_begin/pos_end/pos_extreme
+COMBINED_UPDATE = 3     # 合并K线被修改（字段同COMBINED_NEW）
+FRACTAL = 4             # 分型确认：slot=确认顺序，flag=1顶/-1底，i0=中间合并K线序号，f0/f1=价格/时间
+STROKE_NEW = 5          # 笔产生（或起点改变）：slot=笔序号，flag=1向上/-1向下，i0/i1=起止分型中间合并K线序号，
+                        # i2=是否确认，f0/f1=起止价格，f2/f3=起止时间
+STROKE_EXTEND = 6       # 笔延伸：起点不变、终点改变（字段同STROKE_NEW）
+STROKE_CONFIRM = 7      # 笔确认：其后出现了下一笔（字段同STROKE_NEW）
+SIGNAL = 8              # 信号：flag=1二买/-1二卖，slot=最后一根合并K线序号，f0=收盘价
+EVENT_NAMES = {
+    BAR: "bar", COMBINED_NEW: "combined_new", COMBINED_UPDATE: "combined_update", FRACTAL: "fractal",
+    STROKE_NEW: "stroke_new", STROKE_EXTEND: "stroke_extend", STROKE_CONFIRM: "stroke_confirm", SIGNAL: "signal",
+}
+
+EVENT_DTYPE = np.dtype([
+    ('kind', 'i1'), ('flag', 'i1'),
+    ('bar', 'i8'),          # 所属K线序号
+    ('time', 'f8'),         # 所属K线时间
+    ('slot', 'i8'),
+    ('i0', 'i8'), ('i1', 'i8'), ('i2', 'i8'),
+    ('f0', 'f8'), ('f1', 'f8'), ('f2', 'f8'), ('f3', 'f8'), ('f4', 'f8'), ('f5', 'f8'),
+])
+INDEX_DTYPE = np.dtype([('bar', 'i8'), ('time', 'f8'), ('begin', 'i8'), ('end', 'i8')])
+_EVENT = struct.Struct("<bbqdqqqqdddddd")
+_INDEX = struct.Struct("<qdqq")
+
+
+def _read_header(f):
+    """内部函数：校验文件标识与版本并读取头部，返回(头部, 事件记录起始位置)"""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise ValueError("事件日志文件不完整")
+    magic, version, header_len = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("不是easyChan事件日志文件")
+    if version != VERSION:
+        raise ValueError(f"不支持的事件日志版本：{version}（当前版本 {VERSION}）")
+    return json.loads(f.read(header_len).decode("utf-8")), _PREFIX.size + header_len
+
+
+def _stroke_row(stroke):
+    """内部函数：笔 → (起点中间合并K线序号, 终点中间合并K线序号)"""
+    return stroke.start_fractal.combined_klines[1].index, stroke.end_fractal.combined_klines[1].index
+
+
+class EventLogWriter:
+    """
+    结构事件日志写入器：挂到IncrementalChan上（chan.event_log = writer），逐根K线把结构变化写成定长二进制记录
+
+    记录的事件：收到K线、合并K线新增/修改、分型确认、笔产生/延伸/确认、二买二卖信号。
+    每根K线只编码实际变化的部分（通常为1~3条记录）。笔和信号的记录需要访问chan.strokes（分型集合每次变化都要重新识别笔，
+    代价远高于合并K线与分型），默认关闭，由track_strokes开启；同一根合并K线上持续成立的信号只记录一次
+
+    用法:
+        chan = IncrementalChan("rb2601")
+        with EventLogWriter("rb2601.evlog", "rb2601") as chan.event_log:
+            chan.extend(kline_list)
+    """
+    def __init__(self, path, symbol="", stroke_method="dp", track_strokes=False, pattern_strokes=4, flush=False,
+                 append=False):
+        """
+        参数:
+            path: 日志文件路径（索引文件为path + ".idx"）
+            symbol: 标的代码（写入头部）
+            stroke_method: 分析器的笔识别方式（写入头部，恢复时沿用）
+            track_strokes: 是否记录笔与信号事件（追加到已有日志时此项与pattern_strokes沿用日志头部的设置）
+            pattern_strokes: 二买/二卖形态的笔数（见detect_second_buy_sell）
+            flush: 是否每根K线写完后立即flush（生产环境审计用；默认由文件缓冲批量写出）
+            append: 追加到已有日志（分析器须由EventLogReader(path).restore()恢复，状态与日志末尾一致）
+        """
+        self.path = path
+        self.stroke_method = stroke_method
+        self.track_strokes = track_strokes
+        self.pattern_strokes = pattern_strokes
+        self.flush_each = flush
+        self._combined = 0          # 已记录的合并K线数
+        self._strokes = []          # 已记录的笔：[(起点, 终点, 是否确认)]
+        self._stroke_list = None    # 上次比较过的chan.strokes（笔缓存未重算时为同一列表，无需逐笔比较）
+        self._signals = {}          # 各信号最近一次记录时的合并K线序号：{1: 二买, -1: 二卖}
+        if append and os.path.exists(path):
+            reader = EventLogReader(path)
+            header, index, offset = reader.header, np.array(reader.index), reader.offset
+            self._records = int(index['end'][-1]) if len(index) else 0
+            if len(index):
+                state = reader.state_at()
+                self._combined = len(state["combined"])
+                self._strokes = [tuple(row) for row in state["strokes"].tolist()]
+                signals = reader.events[:self._records]
+                signals = signals[signals['kind'] == SIGNAL]
+                self._signals = {int(flag): int(slot) for flag, slot in zip(signals['flag'], signals['slot'])}
+            reader.close()
+            # 截掉进程中断时未写完的一组事件，索引按完整的组重写
+            with open(path, "r+b") as f:
+                f.truncate(offset + self._records * EVENT_DTYPE.itemsize)
+            index.tofile(path + ".idx")
+            self.symbol = header["symbol"]
+            self.stroke_method = header["stroke_method"]
+            self.track_strokes = header["track_strokes"]
+            self.pattern_strokes = header["pattern_strokes"]
+            self._file = open(path, "ab")
+            self._index = open(path + ".idx", "ab")
+        else:
+            self.symbol = symbol
+            self._records = 0
+            header = {
+                "created": time.time(),
+                "symbol": symbol,
+                "stroke_method": stroke_method,
+                "track_strokes": track_strokes,
+                "pattern_strokes": pattern_strokes,
+                "dtype": [[name, EVENT_DTYPE.fields[name][0].str] for name in EVENT_DTYPE.names],
+            }
+            header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            self._file = open(path, "wb")
+            self._file.write(_PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            self._file.write(header_bytes)
+            self._index = open(path + ".idx", "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, chan, fractal=None, replaced=False):
+        """
+        记录chan刚处理完的最后一根K线引起的变化（由IncrementalChan.append/replace_last调用）
+
+        参数:
+            chan: IncrementalChan
+            fractal: 本次确认的分型
+            replaced: 是否为replace_last
+        """
+        bar = len(chan.klines) - 1
+        kline = chan.klines[-1]
+        t = kline.time
+        pack = _EVENT.pack
+        rows = []
+
+        # 合并K线：替换时回滚可能恢复倒数第二根，一并记录
+        combined = chan.combined
+        for slot in range(max(len(combined) - (2 if replaced else 1), 0), len(combined)):
+            k = combined[slot]
+            kind = COMBINED_NEW if slot >= self._combined else COMBINED_UPDATE
+            rows.append(pack(kind, k.isUp, bar, t, slot, k.pos_begin, k.pos_end, k.pos_extreme,
+                             k.data.time, k.data.high, k.data.low, 0.0, 0.0, 0.0))
+        self._combined = len(combined)
+
+        n_fractals = len(chan.top_fractals) + len(chan.bottom_fractals)
+        if fractal is not None:
+            rows.append(pack(FRACTAL, 1 if fractal.fractal_type == 'top' else -1, bar, t, n_fractals - 1,
+                             fractal.combined_klines[1].index, 0, 0, fractal.price, fractal.time, 0.0, 0.0, 0.0, 0.0))
+
+        n_strokes = -1
+        if self.track_strokes:
+            if chan.stroke_method != self.stroke_method:
+                raise ValueError(f"分析器的笔识别方式（{chan.stroke_method}）与事件日志（{self.stroke_method}）不一致")
+            strokes = chan.strokes
+            n_strokes = len(strokes)
+            if strokes is not self._stroke_list:
+                self._stroke_list = strokes
+                rows += self._stroke_rows(strokes, bar, t)
+
+            is_buy, is_sell = detect_second_buy_sell(combined, *chan.fractals(), strokes, self.pattern_strokes)
+            for flag, fired in ((1, is_buy), (-1, is_sell)):
+                if fired and self._signals.get(flag) != len(combined) - 1:
+                    self._signals[flag] = len(combined) - 1
+                    rows.append(pack(SIGNAL, flag, bar, t, len(combined) - 1, 0, 0, 0,
+                                     kline.close, 0.0, 0.0, 0.0, 0.0, 0.0))
+
+        rows.insert(0, pack(BAR, 1 if replaced else 0, bar, t, bar, len(combined), n_fractals, n_strokes,
+                            kline.open, kline.high, kline.low, kline.close, kline.volume, kline.amount))
+        begin = self._records
+        self._records += len(rows)
+        self._file.write(b"".join(rows))
+        self._index.write(_INDEX.pack(bar, t, begin, self._records))
+        if self.flush_each:
+            self.flush()
+
+    def _stroke_rows(self, strokes, bar, t):
+        """内部函数：与已记录的笔逐个比较，返回有变化的笔的事件记录"""
+        count = len(strokes)
+        current = [_stroke_row(s) + (p < count - 1,) for p, s in enumerate(strokes)]
+        logged = self._strokes
+        rows = []
+        for p, row in enumerate(current):
+            old = logged[p] if p < len(logged) else None
+            if old == row:
+                continue
+            if old is None or old[0] != row[0]:
+                kind = STROKE_NEW
+            elif old[1] != row[1]:
+                kind = STROKE_EXTEND
+            else:
+                kind = STROKE_CONFIRM
+            s = strokes[p]
+            rows.append(_EVENT.pack(kind, 1 if s.direction == 'up' else -1, bar, t, p, row[0], row[1], row[2],
+                                    s.start_fractal.price, s.end_fractal.price, s.start_fractal.time,
+                                    s.end_fractal.time, 0.0, 0.0))
+        self._strokes = current
+        return rows
+
+    def flush(self):
+        """把缓冲区写入文件（先写事件再写索引，索引不会指向未写出的事件）"""
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        """关闭文件（可重复调用）"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+            self._index.close()
+
+
+class EventLogReader:
+    """
+    事件日志读取器：事件与索引均以内存映射方式打开，按K线序号或时间定位，
+    任意时刻的结构直接由事件还原（不重新处理K线）
+
+    - seek：K线序号/时间 → 该K线处理完时对应的索引行
+    - events_between：取某段K线的事件；replay：逐组回放
+    - state_at/restore：某根K线处理完时的合并K线、确认分型与笔，restore进一步重建为可继续append的IncrementalChan
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header, self.offset = _read_header(f)
+        if self.header["dtype"] != [[name, EVENT_DTYPE.fields[name][0].str] for name in EVENT_DTYPE.names]:
+            raise ValueError("事件日志的记录格式与当前版本不一致")
+        self.symbol = self.header["symbol"]
+        count = (os.path.getsize(path) - self.offset) // EVENT_DTYPE.itemsize
+        self.events = (np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=self.offset, shape=(count,))
+                       if count else np.empty(0, dtype=EVENT_DTYPE))
+        index_path = path + ".idx"
+        size = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+        index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(size,)) if size else np.empty(0, dtype=INDEX_DTYPE)
+        # 事件被截断时去掉指向其后的索引；索引落后于事件（写入中断或索引文件缺失）时由BAR记录补齐
+        index = index[:np.searchsorted(index['end'], count, side='right')]
+        done = int(index['end'][-1]) if len(index) else 0
+        if done < count:
+            index = np.concatenate([index, self._scan_groups(done, count)])
+        self.index = index
+
+    def __len__(self):
+        """已记录的K线数"""
+        return int(self.index['bar'][-1]) + 1 if len(self.index) else 0
+
+    def close(self):
+        self.events = self.index = None
+
+    def _scan_groups(self, begin, end):
+        """内部函数：由第begin ~ end条事件中的BAR记录生成索引（最后一组可能未写完，不计入）"""
+        begins = np.flatnonzero(self.events['kind'][begin:end] == BAR) + begin
+        ends = begins[1:]
+        begins = begins[:-1]
+        index = np.empty(len(begins), dtype=INDEX_DTYPE)
+        index['bar'] = self.events['bar'][begins]
+        index['time'] = self.events['time'][begins]
+        index['begin'] = begins
+        index['end'] = ends
+        return index
+
+    def seek(self, bar=None, time=None):
+        """
+        定位到某根K线处理完时（该K线有替换时取最后一次）
+
+        参数:
+            bar: K线序号；time: K线时间（取时间不晚于time的最后一根），均为None时为日志末尾
+        返回:
+            int: 索引行号，-1表示在第一根K线之前
+        """
+        if bar is not None:
+            return int(np.searchsorted(self.index['bar'], bar, side='right')) - 1
+        if time is not None:
+            return int(np.searchsorted(self.index['time'], time, side='right')) - 1
+        return len(self.index) - 1
+
+    def events_between(self, start_bar=0, end_bar=None):
+        """第start_bar ~ end_bar根K线（含两端）的全部事件（结构化数组）"""
+        begin = self.seek(start_bar - 1) + 1
+        end = self.seek(end_bar)
+        if end < begin:
+            return self.events[:0]
+        return self.events[int(self.index['begin'][begin]):int(self.index['end'][end])]
+
+    def replay(self, start_bar=0, end_bar=None):
+        """
+        逐组回放事件
+
+        返回:
+            生成器，每项为(K线序号, 是否替换, 该组事件数组)
+        """
+        begin = self.seek(start_bar - 1) + 1
+        end = self.seek(end_bar)
+        for row in self.index[begin:end + 1]:
+            group = self.events[int(row['begin']):int(row['end'])]
+            yield int(row['bar']), bool(group['flag'][0]), group
+
+    def state_at(self, bar=None, time=None):
+        """
+        某根K线处理完时的结构，格式同IncrementalChan.export_state（strokes_key为None，笔未记录时strokes为空）
+
+        每个序号取其最后一次记录，再按该组BAR记录中的数量截断（回滚删除的部分随之去掉）
+        """
+        row = self.seek(bar, time)
+        if row < 0:
+            raise ValueError(f"事件日志中没有该时刻的记录：bar={bar}, time={time}")
+        group = self.index[row]
+        events = self.events[:int(group['end'])]
+        head = self.events[int(group['begin'])]
+        n_bars, n_combined, n_fractals, n_strokes = int(head['bar']) + 1, int(head['i0']), int(head['i1']), int(head['i2'])
+
+        def latest(kinds, count):
+            positions = np.flatnonzero(np.isin(events['kind'], kinds))
+            slots = events['slot'][positions]
+            unique, first = np.unique(slots[::-1], return_index=True)
+            chosen = positions[len(positions) - 1 - first]
+            return events[chosen[unique < count]]
+
+        bars = latest([BAR], n_bars)
+        klines = np.empty(len(bars), dtype=BAR_DTYPE)
+        klines['time'] = bars['time']
+        for name, column in zip(('open', 'high', 'low', 'close', 'volume', 'amount'), ('f0', 'f1', 'f2', 'f3', 'f4', 'f5')):
+            klines[name] = bars[column]
+
+        rows = latest([COMBINED_NEW, COMBINED_UPDATE], n_combined)
+        combined = np.empty(len(rows), dtype=STATE_COMBINED_DTYPE)
+        for name, column in (('time', 'f0'), ('high', 'f1'), ('low', 'f2'),
+                             ('pos_begin', 'i0'), ('pos_end', 'i1'), ('pos_extreme', 'i2')):
+            combined[name] = rows[column]
+        combined['is_up'] = rows['flag'] != 0
+
+        rows = latest([FRACTAL], n_fractals)
+        fractals = np.empty(len(rows), dtype=STATE_FRACTAL_DTYPE)
+        fractals['kind'] = rows['flag']
+        fractals['mid'] = rows['i0']
+
+        rows = latest([STROKE_NEW, STROKE_EXTEND, STROKE_CONFIRM], max(n_strokes, 0))
+        strokes = np.empty(len(rows), dtype=STATE_STROKE_DTYPE)
+        strokes['start_mid'] = rows['i0']
+        strokes['end_mid'] = rows['i1']
+        strokes['is_confirmed'] = rows['i2'] != 0
+        return {"klines": klines, "combined": combined, "fractals": fractals, "strokes": strokes,
+                "strokes_key": None, "tracked_strokes": n_strokes >= 0}
+
+    def restore(self, bar=None, time=None):
+        """
+        由日志重建某根K线处理完时的IncrementalChan（不重新处理K线），之后继续append与从未中断一致
+
+        记录了笔时一并恢复笔缓存（与当时的chan.strokes一致；日志中的“确认”指其后出现了下一笔，
+        不写回Stroke.is_confirmed，该属性保持笔识别的结果）
+        """
+        state = self.state_at(bar, time)
+        chan = IncrementalChan.restore_state(state, self.symbol, self.header["stroke_method"])
+        if state["tracked_strokes"]:
+            fractals = {f.combined_klines[1].index: f for f in chan.top_fractals + chan.bottom_fractals}
+            tentative = chan.tentative_fractal
+            if tentative is not None:
+                fractals.setdefault(tentative.combined_klines[1].index, tentative)
+            strokes = [Stroke(fractals[start_mid], fractals[end_mid])
+                       for start_mid, end_mid in zip(state["strokes"]['start_mid'].tolist(),
+                                                     state["strokes"]['end_mid'].tolist())]
+            chan._stroke_cache = (chan._fractal_key(), strokes)
+        return chan
+
+    def to_frame(self, events=None):
+        """
+        事件数组 → DataFrame（kind列为事件名），events为None时为全部事件
+
+        各类事件的字段含义见本模块开头的事件类型说明
+        """
+        events = self.events if events is None else events
+        df = pd.DataFrame({name: np.asarray(events[name]) for name in EVENT_DTYPE.names})
+        df["kind"] = pd.Categorical.from_codes(np.asarray(events['kind'], dtype='i8') - 1,
+                                               categories=[EVENT_NAMES[k] for k in sorted(EVENT_NAMES)])
+        return df
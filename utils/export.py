@@ -0,0 +1,223 @@
+# utils/export.py
+import os
+import numpy as np
+import pandas as pd
+from utils.fractal_table import FractalTable, TOP
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖（Arrow/Parquet/Feather导出）
+    pa = pq = None
+
+
+# 导出格式：时间列一律为int64的Unix时间戳（秒，与KLine.time一致），不做逐对象的日期格式化；
+# 方向/分型类型用int8编码：1=向上笔/顶分型，-1=向下笔/底分型
+FORMATS = ("csv", "parquet", "feather", "arrow")
+
+
+def _epoch(values):
+    """内部函数：时间戳（float秒）→ int64秒"""
+    return np.rint(np.asarray(values, dtype='f8')).astype('i8')
+
+
+def combined_frame(combined_klines):
+    """合并K线 → DataFrame（time, high, low, pos_begin, pos_end, pos_extreme, is_up）"""
+    columns = [(k.data.time, k.data.high, k.data.low, k.pos_begin, k.pos_end, k.pos_extreme, k.isUp)
+               for k in combined_klines]
+    df = pd.DataFrame(columns, columns=["time", "high", "low", "pos_begin", "pos_end", "pos_extreme", "is_up"])
+    df["time"] = _epoch(df["time"])
+    return df.astype({"high": 'f8', "low": 'f8', "pos_begin": 'i8', "pos_end": 'i8', "pos_extreme": 'i8', "is_up": bool})
+
+
+def fractals_frame(fractals):
+    """
+    分型 → DataFrame（kind, mid, time, price），按中间K线顺序
+
+    参数:
+        fractals: FractalTable（直接取其数组），或分型对象列表（如tops + bottoms）
+    """
+    if isinstance(fractals, FractalTable):
+        kind, mid, times, price = fractals.kind, fractals.mid, fractals.time, fractals.price
+    else:
+        rows = sorted((f.combined_klines[1].index, 1 if f.fractal_type == 'top' else -1, f.time, f.price)
+                      for f in fractals)
+        mid, kind, times, price = (np.array(c) for c in zip(*rows)) if rows else ([], [], [], [])
+    return pd.DataFrame({
+        "kind": np.asarray(kind, dtype='i1'),
+        "mid": np.asarray(mid, dtype='i8'),
+        "time": _epoch(times),
+        "price": np.asarray(price, dtype='f8'),
+    })
+
+
+def necessary_points_frame(necessary_points):
+    """必经点（find_all_necessary_points的字典列表）→ DataFrame（kind, mid, time, price, type, segment_type），按时间排序"""
+    rows = [(1 if p["top_or_bottom"] == 'top' else -1, p["fractal"].combined_klines[1].index, p["fractal"].time,
+             p["fractal"].price, p["type"], p.get("segment_type")) for p in necessary_points]
+    df = pd.DataFrame(rows, columns=["kind", "mid", "time", "price", "type", "segment_type"])
+    df["time"] = _epoch(df["time"])
+    df = df.astype({"kind": 'i1', "mid": 'i8', "price": 'f8'})
+    return df.sort_values("time", kind="stable").reset_index(drop=True)
+
+
+def strokes_frame(strokes):
+    """
+    笔 → DataFrame
+
+    列: direction, start_time, end_time, start_price, end_price, start_mid, end_mid（起止分型中间合并K线序号）,
+        raw_begin, raw_end（原始K线序号范围）, bar_count, amplitude
+    """
+    rows = [(s.start_fractal.time, s.end_fractal.time, s.start_fractal.price, s.end_fractal.price,
+             s.start_fractal.combined_klines[1].index, s.end_fractal.combined_klines[1].index,
+             s.start_fractal.combined_klines[1].pos_begin, s.end_fractal.combined_klines[1].pos_end,
+             s.direction == 'up') for s in strokes]
+    columns = list(zip(*rows)) if rows else [[]] * 9
+    start_price = np.asarray(columns[2], dtype='f8')
+    end_price = np.asarray(columns[3], dtype='f8')
+    raw_begin = np.asarray(columns[6], dtype='i8')
+    raw_end = np.asarray(columns[7], dtype='i8')
+    return pd.DataFrame({
+        "direction": np.where(np.asarray(columns[8], dtype=bool), 1, -1).astype('i1'),
+        "start_time": _epoch(columns[0]),
+        "end_time": _epoch(columns[1]),
+        "start_price": start_price,
+        "end_price": end_price,
+        "start_mid": np.asarray(columns[4], dtype='i8'),
+        "end_mid": np.asarray(columns[5], dtype='i8'),
+        "raw_begin": raw_begin,
+        "raw_end": raw_end,
+        "bar_count": raw_end - raw_begin + 1,
+        "amplitude": np.abs(end_price - start_price),
+    })
+
+
+def stroke_rows_frame(table, rows):
+    """
+    由分型表和笔端点行号（identify_stroke_rows的返回值）直接生成与strokes_frame相同列的DataFrame，不经过笔对象
+
+    参数:
+        table: FractalTable
+        rows: 笔的端点在分型表中的行号序列
+    """
+    rows = np.asarray(rows, dtype='i8')
+    start, end = rows[:-1], rows[1:]
+    combined = table.combined_klines
+    mids = table.mid
+    pos_begin = np.array([combined[m].pos_begin for m in mids[start].tolist()], dtype='i8')
+    pos_end = np.array([combined[m].pos_end for m in mids[end].tolist()], dtype='i8')
+    return pd.DataFrame({
+        "direction": np.where(table.kind[start] == TOP, -1, 1).astype('i1'),
+        "start_time": _epoch(table.time[start]),
+        "end_time": _epoch(table.time[end]),
+        "start_price": table.price[start],
+        "end_price": table.price[end],
+        "start_mid": mids[start],
+        "end_mid": mids[end],
+        "raw_begin": pos_begin,
+        "raw_end": pos_end,
+        "bar_count": pos_end - pos_begin + 1,
+        "amplitude": np.abs(table.price[end] - table.price[start]),
+    })
+
+
+def signals_frame(buy_points=(), sell_points=()):
+    """
+    买卖点（twobuytwosale_v2.py风格，含time/price/index的字典列表）→ DataFrame（signal, time, price, index），按时间排序
+
+    signal: 1=买点，-1=卖点
+    """
+    rows = [(1, p["time"], p["price"], p.get("index", -1)) for p in buy_points]
+    rows += [(-1, p["time"], p["price"], p.get("index", -1)) for p in sell_points]
+    df = pd.DataFrame(rows, columns=["signal", "time", "price", "index"])
+    df["time"] = _epoch(df["time"])
+    df = df.astype({"signal": 'i1', "price": 'f8', "index": 'i8'})
+    return df.sort_values("time", kind="stable").reset_index(drop=True)
+
+
+def analysis_frames(combined=None, fractals=None, necessary_points=None, strokes=None, buy_points=None, sell_points=None):
+    """
+    把一个标的的分析结果一次性转换为DataFrame字典（只转换给出的部分）
+
+    返回:
+        dict: combined/fractals/necessary_points/strokes/signals → DataFrame
+    """
+    frames = {}
+    if combined is not None:
+        frames["combined"] = combined_frame(combined)
+    if fractals is not None:
+        frames["fractals"] = fractals_frame(fractals)
+    if necessary_points is not None:
+        frames["necessary_points"] = necessary_points_frame(necessary_points)
+    if strokes is not None:
+        frames["strokes"] = strokes_frame(strokes)
+    if buy_points is not None or sell_points is not None:
+        frames["signals"] = signals_frame(buy_points or (), sell_points or ())
+    return frames
+
+
+def concat_symbols(frames_by_symbol):
+    """
+    多标的结果合并：{标的: analysis_frames返回值} → {名称: 带symbol列的DataFrame}
+
+    symbol列为category类型，数千个标的合并后仍紧凑
+    """
+    names = []
+    for frames in frames_by_symbol.values():
+        names += [name for name in frames if name not in names]
+    symbols = list(frames_by_symbol)
+    result = {}
+    for name in names:
+        parts = [(symbol, frames_by_symbol[symbol][name]) for symbol in symbols if name in frames_by_symbol[symbol]]
+        df = pd.concat([frame for _, frame in parts], ignore_index=True)
+        codes = np.repeat(np.arange(len(parts)), [len(frame) for _, frame in parts])
+        df.insert(0, "symbol", pd.Categorical.from_codes(codes, categories=[symbol for symbol, _ in parts]))
+        result[name] = df
+    return result
+
+
+def to_arrow(df):
+    """DataFrame → pyarrow.Table（需要pyarrow）"""
+    if pa is None:
+        raise ImportError("Arrow导出需要安装pyarrow：pip install pyarrow")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_frame(df, path, fmt=None):
+    """
+    写出DataFrame
+
+    参数:
+        fmt: "csv" / "parquet" / "feather" / "arrow"（Arrow IPC文件），None时按扩展名判断；
+             除csv外均需要pyarrow
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"未知的导出格式：{fmt}")
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    table = to_arrow(df)
+    if fmt == "parquet":
+        pq.write_table(table, path)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+
+
+def export_frames(frames, out_dir, fmt=None):
+    """
+    把analysis_frames/concat_symbols的结果逐个写入out_dir（文件名为名称.扩展名）
+
+    参数:
+        fmt: 导出格式（见write_frame），None时安装了pyarrow为"parquet"，否则为"csv"
+    返回:
+        dict: 名称 → 文件路径
+    """
+    fmt = fmt or ("parquet" if pq is not None else "csv")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name, df in frames.items():
+        paths[name] = os.path.join(out_dir, f"{name}.{fmt}")
+        write_frame(df, paths[name], fmt)
+    return paths
@@ -1,5 +1,6 @@
 # utils/fractal_detector.py
 from core.Chan_base import TopFractal, BottomFractal
+from utils.stage_log import stage_print
 
 
 # 复用K线合并中的辅助函数（避免重复定义，直接导入或重新定义）
@@ -43,7 +44,7 @@ def detect_fractals(combined_klines):
             except ValueError:
                 continue  # 过滤不符合严格条件的分型
 
-    print(f"[分型检测] 共识别到 {len(top_fractals)} 个顶分型，{len(bottom_fractals)} 个底分型")
+    stage_print(f"[分型检测] 共识别到 {len(top_fractals)} 个顶分型，{len(bottom_fractals)} 个底分型")
     return top_fractals, bottom_fractals
 
 # 输入三根合并K线，判断是否为顶分型
@@ -0,0 +1,162 @@
+# utils/fractal_table.py
+import numpy as np
+from core.Chan_base import TopFractal, BottomFractal
+from utils.backend import get_kernel, register_kernel
+from utils.price_ticks import to_ticks
+from utils.stage_log import stage_print
+
+
+TOP = 1
+BOTTOM = -1
+
+
+class FractalTable:
+    """
+    分型表：按中间K线位置排序的数组，替代热点循环中的TopFractal/BottomFractal对象
+
+    列（numpy数组，行号即分型序号）:
+        kind: 1=顶分型，-1=底分型
+        mid: 中间合并K线序号（start=mid-1，end=mid+1）
+        time: 分型时间（中间合并K线时间）
+        price: 分型价格（顶取中间K线最高价，底取最低价）
+    需要对象的调用方可用fractal(row)取得惰性创建、缓存的Fractal视图；
+    backend为基于本表的计算（reach、笔的动态规划、必经点搜索）所用的后端（见utils.backend）；
+    tick_size不为None时reach按最小变动价位换算后的整数价格比较
+    """
+    def __init__(self, combined_klines, kind, mid, backend=None, tick_size=None):
+        self.combined_klines = combined_klines
+        self.backend = backend
+        self.tick_size = tick_size
+        self.highs = np.array([k.high for k in combined_klines], dtype='f8')
+        self.lows = np.array([k.low for k in combined_klines], dtype='f8')
+        self.kind = np.asarray(kind, dtype='i1')
+        self.mid = np.asarray(mid, dtype='i8')
+        self.time = np.array([combined_klines[m].data.time for m in self.mid.tolist()], dtype='f8')
+        self.price = np.where(self.kind == TOP, self.highs[self.mid], self.lows[self.mid]) if len(self.mid) else np.empty(0)
+        self._views = {}
+        self._reach = None
+
+    @classmethod
+    def from_fractals(cls, combined_klines, top_fractals, bottom_fractals, backend=None):
+        """由已有的分型对象列表构建（对象本身作为视图复用）"""
+        pairs = [(f.combined_klines[1].index, TOP, f) for f in top_fractals]
+        pairs += [(f.combined_klines[1].index, BOTTOM, f) for f in bottom_fractals]
+        pairs.sort(key=lambda x: x[0])
+        table = cls(combined_klines, [p[1] for p in pairs], [p[0] for p in pairs], backend)
+        table._views = {row: p[2] for row, p in enumerate(pairs)}
+        return table
+
+    def __len__(self):
+        return len(self.mid)
+
+    @property
+    def start(self):
+        return self.mid - 1
+
+    @property
+    def end(self):
+        return self.mid + 1
+
+    def fractal(self, row):
+        """第row行分型的对象视图（首次访问时创建并缓存）"""
+        view = self._views.get(row)
+        if view is None:
+            m = int(self.mid[row])
+            klines = self.combined_klines[m - 1:m + 2]
+            view = TopFractal(klines) if self.kind[row] == TOP else BottomFractal(klines)
+            self._views[row] = view
+        return view
+
+    def row_of(self, fractal):
+        """分型对象 → 行号"""
+        m = fractal.combined_klines[1].index
+        row = int(np.searchsorted(self.mid, m))
+        if row >= len(self.mid) or self.mid[row] != m:
+            raise ValueError("分型不在分型表中")
+        return row
+
+    def top_fractals(self):
+        """顶分型对象列表（与detect_fractals返回值一致）"""
+        return [self.fractal(row) for row in np.flatnonzero(self.kind == TOP).tolist()]
+
+    def bottom_fractals(self):
+        """底分型对象列表（与detect_fractals返回值一致）"""
+        return [self.fractal(row) for row in np.flatnonzero(self.kind == BOTTOM).tolist()]
+
+    @property
+    def reach(self):
+        """
+        每个分型在价格上"管得到"的最远合并K线序号：顶分型之后第一根最高价高于分型价的K线，
+        底分型之后第一根最低价低于分型价的K线（不存在则为合并K线总数）。
+        以该分型为起点的笔，终点中间K线序号不超过reach时中间K线价格不越界
+        """
+        if self._reach is None:
+            next_break = get_kernel("next_break", self.backend)
+            highs, lows = self.highs, self.lows
+            if self.tick_size is not None:
+                highs, lows = to_ticks(highs, self.tick_size), to_ticks(lows, self.tick_size)
+            next_higher = next_break(highs, 1.0)
+            next_lower = next_break(lows, -1.0)
+            self._reach = np.where(self.kind == TOP, next_higher[self.mid], next_lower[self.mid]) if len(self.mid) else np.empty(0, dtype='i8')
+        return self._reach
+
+
+@register_kernel("next_break")
+def _next_break(values, sign):
+    """内部函数：单调栈求每个位置之后第一个sign*(values[j]-values[i])>0的位置（不存在为len(values)）"""
+    values = values.tolist()
+    result = [len(values)] * len(values)
+    stack = []
+    for j, v in enumerate(values):
+        while stack and sign * (v - values[stack[-1]]) > 0:
+            result[stack.pop()] = j
+        stack.append(j)
+    return np.array(result, dtype='i8')
+
+
+@register_kernel("fractal_marks")
+def _fractal_marks(highs, lows, eps=1e-5, strict=True):
+    """
+    内部函数：向量化分型标记，marks[i]=1/-1表示以第i根合并K线为中间K线的顶/底分型
+
+    strict为False时顶分型只比较高点、底分型只比较低点；highs/lows可为二维数组（每行一个标的，见utils.panel）
+    """
+    marks = np.zeros(np.shape(highs), dtype='i1')
+    if np.shape(highs)[-1] < 3:
+        return marks
+    h0, h1, h2 = highs[..., :-2], highs[..., 1:-1], highs[..., 2:]
+    l0, l1, l2 = lows[..., :-2], lows[..., 1:-1], lows[..., 2:]
+    is_top = (h1 - h0 > eps) & (h1 - h2 > eps)
+    is_bottom = (l1 - l0 < -eps) & (l1 - l2 < -eps)
+    if strict:
+        is_top &= (l1 - l0 > eps) & (l1 - l2 > eps)
+        is_bottom &= (h1 - h0 < -eps) & (h1 - h2 < -eps)
+    marks[..., 1:-1][is_bottom] = BOTTOM
+    marks[..., 1:-1][is_top] = TOP
+    return marks
+
+
+def detect_fractal_table(combined_klines, backend=None, eps=1e-5, strict=True, tick_size=None):
+    """
+    向量化分型检测：默认参数下规则与detect_fractals相同（严格顶底分型，阈值1e-5）
+
+    参数:
+        combined_klines: 合并后的stCombineK对象列表
+        backend: 计算后端（None为全局默认，见utils.backend），同时记录在返回的分型表上
+        eps: 价格比较阈值
+        strict: 是否使用严格分型（高低点均需高于/低于两侧）；False时顶分型只比较高点，底分型只比较低点
+        tick_size: 最小变动价位；给出时价格换算为int64整数精确比较（忽略eps），分型表的reach同样按整数计算
+    返回:
+        FractalTable: 分型表
+    """
+    highs = np.array([k.high for k in combined_klines], dtype='f8')
+    lows = np.array([k.low for k in combined_klines], dtype='f8')
+    if tick_size is not None:
+        highs, lows, eps = to_ticks(highs, tick_size), to_ticks(lows, tick_size), 0
+    marks = get_kernel("fractal_marks", backend)(highs, lows, eps, strict)
+    mid = np.flatnonzero(marks)
+    table = FractalTable(combined_klines, marks[mid], mid, backend, tick_size)
+
+    top_count = int(np.count_nonzero(table.kind == TOP))
+    stage_print(f"[分型检测] 共识别到 {top_count} 个顶分型，{len(table) - top_count} 个底分型")
+    return table
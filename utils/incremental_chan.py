@@ -0,0 +1,408 @@
+# utils/incremental_chan.py
+import copy
+import numpy as np
+from core.Chan_base import KLine, stCombineK, TopFractal, BottomFractal, Stroke
+from utils.bar_array import klines_to_array, array_to_klines
+from utils.kline_combiner import greater_than_0, less_than_0, equ_than_0
+from utils.fractal_table import FractalTable
+from utils.necessary_point_finder import find_all_necessary_points_from_table
+from utils.stroke_identifier import identify_strokes, identify_strokes_greedy, STROKE_METHODS
+
+
+# 状态导出格式（见IncrementalChan.export_state）
+STATE_COMBINED_DTYPE = np.dtype([
+    ('time', 'f8'), ('high', 'f8'), ('low', 'f8'),
+    ('pos_begin', 'i8'), ('pos_end', 'i8'), ('pos_extreme', 'i8'), ('is_up', '?'),
+])
+STATE_FRACTAL_DTYPE = np.dtype([
+    ('kind', 'i1'),         # 1=顶分型，-1=底分型
+    ('mid', 'i8'),          # 中间合并K线序号
+])
+STATE_STROKE_DTYPE = np.dtype([
+    ('start_mid', 'i8'), ('end_mid', 'i8'),          # 起止分型的中间合并K线序号
+    ('is_confirmed', '?'),
+])
+
+
+class IncrementalChan:
+    """
+    增量缠论分析器：逐根接收已完成的K线，增量维护合并K线、分型和笔
+
+    合并规则与combine_kline逐步等价，分型规则与detect_fractals一致：
+    - 只有最后一根合并K线会被后续K线修改，其余合并K线一经产生即固定
+    - 中间K线两侧均已固定的分型为确认分型（top_fractals/bottom_fractals）
+    - 以最后一根（未固定）合并K线为右侧的分型为临时分型（tentative_fractal）
+    - 笔在分型集合变化后首次访问时重新识别（结果与对全部K线调用identify_strokes_from_klines一致）
+    - 盘中未完成K线可先append，之后每次更新用replace_last替换：只回滚该K线影响的最后一根合并K线与
+      其确认的分型，再重新并入，状态与直接append最终K线一致
+    - event_log设为EventLogWriter时，每根K线的结构变化写入事件日志（见utils.event_log）
+    """
+    def __init__(self, symbol="", stroke_method="dp"):
+        """
+        参数:
+            symbol: 标的代码
+            stroke_method: 笔识别方式，"dp"（必经点 + 动态规划）或"greedy"（单遍贪心，见identify_strokes_greedy）
+        """
+        if stroke_method not in STROKE_METHODS:
+            raise ValueError(f"未知的笔识别方式：{stroke_method}")
+        self.symbol = symbol
+        self.stroke_method = stroke_method
+        self.klines = []            # 已接收的原始K线（副本，index为序号）
+        self.combined = []          # 合并后的stCombineK列表
+        self.top_fractals = []      # 已确认顶分型
+        self.bottom_fractals = []   # 已确认底分型
+        self._stroke_cache = (None, [])     # (分型集合标识, 笔列表)，整体替换，其他线程读取时不会错配
+        self._prev_stroke_cache = (None, [])    # 上一个分型集合的笔（盘中K线反复替换时常在两种状态间切换）
+        self._undo = None           # 最后一根K线的回滚记录：(并入前合并K线数量, 最后一根合并K线被修改前的字段, 确认的分型)
+        self._stable = None         # 上次导出后因回滚而缩短到的最小长度（klines, combined, fractals），见export_state
+        self.event_log = None       # 结构事件日志（utils.event_log.EventLogWriter），None为不记录
+
+    # ------------------------------------------------------------------
+    # K线合并
+    # ------------------------------------------------------------------
+    def _raw(self, i, pending=None):
+        """取第i根原始K线；第0根与combine_kline一致，取第一根合并K线的数据"""
+        if i == 0:
+            return self.combined[0].data
+        if i == len(self.klines):
+            return pending
+        return self.klines[i]
+
+    def _merge_into_last(self, low, high, index, pos_end, pending):
+        """内部函数：把当前K线并入最后一根合并K线（对应_handle_contained_k）"""
+        last = self.combined[-1]
+        extreme_kline = self._raw(index, pending)
+        new_kline = self._raw(pos_end, pending)
+
+        # 按趋势更新合并K线时间
+        if last.isUp:
+            if greater_than_0(new_kline.high - extreme_kline.high) or (equ_than_0(new_kline.high - extreme_kline.high) and new_kline.time > extreme_kline.time):
+                last.data.time = new_kline.time
+            else:
+                last.data.time = extreme_kline.time
+        else:
+            if less_than_0(new_kline.low - extreme_kline.low) or (equ_than_0(new_kline.low - extreme_kline.low) and new_kline.time > extreme_kline.time):
+                last.data.time = new_kline.time
+            else:
+                last.data.time = extreme_kline.time
+
+        last.data.low = low
+        last.data.high = high
+        last.pos_end = pos_end
+        last.pos_extreme = index
+
+    def _combine_step(self, kline, i):
+        """
+        内部函数：把第i根原始K线并入合并K线序列
+
+        返回:
+            bool: 是否新增了一根合并K线（False表示并入了最后一根）
+        """
+        combs = self.combined
+        if not combs:
+            combs.append(stCombineK(copy.copy(kline), i, i, i, False, 0))
+            return True
+
+        prev = combs[-1]
+        if greater_than_0(kline.high - prev.high) and greater_than_0(kline.low - prev.low):
+            combs.append(stCombineK(copy.copy(kline), i, i, i, True, len(combs)))
+            return True
+        if less_than_0(kline.high - prev.high) and less_than_0(kline.low - prev.low):
+            combs.append(stCombineK(copy.copy(kline), i, i, i, False, len(combs)))
+            return True
+
+        cur_contains_prev = greater_than_0(kline.high - prev.high) or less_than_0(kline.low - prev.low)
+        if i == 1:
+            # 前两根K线的包含处理
+            if cur_contains_prev:
+                self._merge_into_last(prev.low, kline.high, i, i, kline)
+            else:
+                self._merge_into_last(kline.low, prev.high, prev.pos_begin, i, kline)
+        elif cur_contains_prev:
+            if prev.isUp:
+                pos_index = prev.pos_extreme if equ_than_0(kline.high - prev.high) else i
+                self._merge_into_last(prev.low, kline.high, pos_index, i, kline)
+            else:
+                pos_index = prev.pos_extreme if equ_than_0(kline.low - prev.low) else i
+                self._merge_into_last(kline.low, prev.high, pos_index, i, kline)
+        else:
+            pos_index = prev.pos_begin if prev.pos_begin == prev.pos_end else prev.pos_extreme
+            if prev.isUp:
+                self._merge_into_last(kline.low, prev.high, pos_index, i, kline)
+            else:
+                self._merge_into_last(prev.low, kline.high, pos_index, i, kline)
+        return False
+
+    # ------------------------------------------------------------------
+    # 分型
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _fractal_at(k0, k1, k2):
+        """内部函数：按detect_fractals的严格条件判断三根合并K线是否构成分型"""
+        if (greater_than_0(k1.high - k0.high) and greater_than_0(k1.high - k2.high) and
+                greater_than_0(k1.low - k0.low) and greater_than_0(k1.low - k2.low)):
+            return TopFractal([k0, k1, k2])
+        if (less_than_0(k1.low - k0.low) and less_than_0(k1.low - k2.low) and
+                less_than_0(k1.high - k0.high) and less_than_0(k1.high - k2.high)):
+            return BottomFractal([k0, k1, k2])
+        return None
+
+    def _confirm_fractal(self):
+        """内部函数：新合并K线产生后，倒数第三根合并K线为中间K线的分型随之确认"""
+        if len(self.combined) < 4:
+            return None
+        fractal = self._fractal_at(*self.combined[-4:-1])
+        if fractal is None:
+            return None
+        fractal.is_confirmed = True
+        if fractal.fractal_type == 'top':
+            self.top_fractals.append(fractal)
+        else:
+            self.bottom_fractals.append(fractal)
+        return fractal
+
+    @property
+    def tentative_fractal(self):
+        """以最后一根（尚可变化的）合并K线为右侧K线的临时分型，不存在则为None"""
+        if len(self.combined) < 3:
+            return None
+        return self._fractal_at(*self.combined[-3:])
+
+    def fractals(self):
+        """返回(顶分型列表, 底分型列表)，包含临时分型，与detect_fractals的结果一致"""
+        tops = list(self.top_fractals)
+        bottoms = list(self.bottom_fractals)
+        tentative = self.tentative_fractal
+        if tentative is not None:
+            (tops if tentative.fractal_type == 'top' else bottoms).append(tentative)
+        return tops, bottoms
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    def append(self, kline):
+        """
+        接收一根已完成的K线，增量更新合并K线与分型
+
+        参数:
+            kline: KLine对象（内部保存副本，不修改调用方对象）
+        返回:
+            Fractal或None: 本次新确认的分型
+        """
+        fractal = self._append(kline)
+        if self.event_log is not None:
+            self.event_log.record(self, fractal)
+        return fractal
+
+    def _append(self, kline):
+        """内部函数：append的实际处理（不记录事件）"""
+        i = len(self.klines)
+        kline = copy.copy(kline)
+        kline.index = i
+        size = len(self.combined)
+        saved = self._save_last() if size else None
+        is_new = self._combine_step(kline, i)
+        self.klines.append(kline)
+        fractal = self._confirm_fractal() if is_new else None
+        self._undo = (size, saved, fractal)
+        return fractal
+
+    def replace_last(self, kline):
+        """
+        用新版本替换最后一根K线（盘中K线更新）：回滚旧版本对最后一根合并K线和确认分型的影响后重新并入，
+        结果与直接append新版本一致；笔在下次访问时按新的分型集合更新
+
+        参数:
+            kline: 最后一根K线的新版本（KLine对象，内部保存副本）
+        返回:
+            Fractal或None: 新版本确认的分型（与append相同）
+        """
+        if not self.klines:
+            return self.append(kline)
+        self._rollback_last()
+        fractal = self._append(kline)
+        if self.event_log is not None:
+            self.event_log.record(self, fractal, replaced=True)
+        return fractal
+
+    def _save_last(self):
+        """内部函数：最后一根合并K线可被后续K线修改的字段"""
+        last = self.combined[-1]
+        return last.data.time, last.data.low, last.data.high, last.pos_end, last.pos_extreme
+
+    def _rollback_last(self):
+        """内部函数：撤销最后一根原始K线对合并K线和确认分型的影响，并移除该K线"""
+        n = len(self.klines) - 1
+        if self._undo is not None:
+            size, saved, fractal = self._undo
+            if fractal is not None:
+                (self.top_fractals if fractal.fractal_type == 'top' else self.bottom_fractals).pop()
+            del self.combined[size:]
+            if saved is not None:
+                last = self.combined[-1]
+                last.data.time, last.data.low, last.data.high, last.pos_end, last.pos_extreme = saved
+        else:
+            # 无回滚记录（如由快照恢复后）：由原始K线重放最后一根合并K线，代价为其包含的K线数
+            last = self.combined[-1]
+            if last.pos_begin == n:
+                mid = len(self.combined) - 3
+                for fractals in (self.top_fractals, self.bottom_fractals):
+                    if fractals and fractals[-1].combined_klines[1].index == mid:
+                        fractals.pop()
+                self.combined.pop()
+            else:
+                begin = last.pos_begin
+                last.data = copy.copy(self.klines[begin])
+                last.pos_end = last.pos_extreme = begin
+                for j in range(begin + 1, n):
+                    self._combine_step(self.klines[j], j)
+        self.klines.pop()
+        self._undo = None
+
+        lengths = (len(self.klines), len(self.combined), len(self.top_fractals) + len(self.bottom_fractals))
+        self._stable = lengths if self._stable is None else tuple(map(min, self._stable, lengths))
+
+    def extend(self, kline_list):
+        """批量接收K线"""
+        for kline in kline_list:
+            self.append(kline)
+
+    def preview(self, kline):
+        """
+        预览未完成K线：计算假设该K线此刻收盘时的最后一根合并K线与临时分型，不改变分析器状态
+
+        参数:
+            kline: 正在形成中的KLine对象
+        返回:
+            dict: {"combined": 最后一根合并K线副本, "fractal": 临时分型（基于副本）或None}
+        """
+        if not self.combined:
+            return {"combined": stCombineK(copy.copy(kline), 0, 0, 0, False, 0), "fractal": None}
+
+        i = len(self.klines)
+        last = self.combined[-1]
+        saved = (last.data.time, last.data.low, last.data.high, last.pos_end, last.pos_extreme)
+        size = len(self.combined)
+
+        self._combine_step(kline, i)
+        tail = [copy.deepcopy(k) for k in self.combined[-3:]]
+
+        # 回滚
+        del self.combined[size:]
+        last.data.time, last.data.low, last.data.high, last.pos_end, last.pos_extreme = saved
+
+        fractal = self._fractal_at(*tail) if len(tail) == 3 else None
+        return {"combined": tail[-1], "fractal": fractal}
+
+    def _fractal_key(self):
+        """内部函数：分型集合的标识（确认分型数量 + 临时分型 + 笔识别方式），用于判断笔缓存是否有效"""
+        tentative = self.tentative_fractal
+        return (len(self.top_fractals), len(self.bottom_fractals),
+                tentative.fractal_type if tentative else None,
+                tentative.combined_klines[1].index if tentative else None,
+                self.stroke_method)
+
+    @property
+    def strokes(self):
+        """当前的笔列表（分型集合变化后首次访问时重新识别）"""
+        key = self._fractal_key()
+        if key == self._prev_stroke_cache[0]:
+            self._stroke_cache, self._prev_stroke_cache = self._prev_stroke_cache, self._stroke_cache
+        elif key != self._stroke_cache[0]:
+            self._prev_stroke_cache = self._stroke_cache
+            table = FractalTable.from_fractals(self.combined, *self.fractals())
+            if self.stroke_method == "greedy":
+                strokes = identify_strokes_greedy(self.combined, table)
+            else:
+                necessary_points = find_all_necessary_points_from_table(table)
+                strokes = identify_strokes(self.combined, necessary_points, None, None, fractal_table=table)
+            self._stroke_cache = (key, strokes)
+        return self._stroke_cache[1]
+
+    # ------------------------------------------------------------------
+    # 状态导出/恢复（见utils.snapshot）
+    # ------------------------------------------------------------------
+    def export_state(self, previous=None):
+        """
+        把分析状态导出为结构化数组（不含对象引用，可直接写入文件）
+
+        参数:
+            previous: 上一次export_state的返回值。除最后一条外，原始K线、合并K线、确认分型一经产生即不变，
+                      这部分直接复用，只编码新增部分（期间replace_last回滚过的部分除外）
+        返回:
+            dict: klines（BAR_DTYPE）, combined, fractals（确认分型，按中间K线顺序）, strokes（笔缓存，未缓存为空），
+                  strokes_key（笔缓存对应的分型集合标识）
+        """
+        fractals = sorted(self.top_fractals + self.bottom_fractals, key=lambda f: f.combined_klines[1].index)
+        sources = {"klines": self.klines, "combined": self.combined, "fractals": fractals}
+        stable = dict(zip(sources, self._stable)) if self._stable is not None else {}
+        self._stable = None
+        state = {}
+        for name, items in sources.items():
+            reuse = max(min(len(previous[name]), len(items), stable.get(name, len(items))) - 1, 0) if previous is not None else 0
+            encoded = self._encode(name, items[reuse:])
+            state[name] = np.concatenate([previous[name][:reuse], encoded]) if reuse else encoded
+
+        # 笔缓存只在与当前分型集合一致时导出，否则恢复后首次访问时重新识别
+        key, strokes = self._stroke_cache
+        if key is not None and key == self._fractal_key():
+            state["strokes"] = np.array(
+                [(s.start_fractal.combined_klines[1].index, s.end_fractal.combined_klines[1].index, s.is_confirmed)
+                 for s in strokes], dtype=STATE_STROKE_DTYPE)
+            state["strokes_key"] = key
+        else:
+            state["strokes"] = np.empty(0, dtype=STATE_STROKE_DTYPE)
+            state["strokes_key"] = None
+        return state
+
+    @staticmethod
+    def _encode(name, items):
+        """内部函数：对象列表 → 对应格式的结构化数组"""
+        if name == "klines":
+            return klines_to_array(items)
+        if name == "combined":
+            return np.array([(k.data.time, k.data.high, k.data.low, k.pos_begin, k.pos_end, k.pos_extreme, k.isUp)
+                             for k in items], dtype=STATE_COMBINED_DTYPE)
+        return np.array([(1 if f.fractal_type == 'top' else -1, f.combined_klines[1].index) for f in items],
+                        dtype=STATE_FRACTAL_DTYPE)
+
+    @classmethod
+    def restore_state(cls, state, symbol="", stroke_method="dp"):
+        """
+        由export_state的结果重建分析器，重建后继续append的结果与从未中断一致
+
+        参数:
+            state: dict，键同export_state的返回值
+            symbol: 标的代码
+            stroke_method: 笔识别方式（与导出时不同则不恢复笔缓存）
+        """
+        chan = cls(symbol, stroke_method)
+        chan.klines = array_to_klines(state["klines"], symbol)
+        # 合并K线的数据为其首根原始K线的副本（time/high/low为合并后的值），直接构造以免逐个copy
+        combined = state["combined"]
+        begins = combined['pos_begin']
+        columns = [state["klines"][name][begins].tolist() for name in ('open', 'close', 'volume', 'amount')]
+        for i, (t, high, low, begin, end, extreme, is_up), o, c, v, a in zip(
+                range(len(combined)), combined.tolist(), *columns):
+            data = KLine(time=t, open=o, high=high, low=low, close=c, volume=v, symbol=symbol, index=begin, amount=a)
+            chan.combined.append(stCombineK(data, begin, end, extreme, is_up, i))
+
+        confirmed = {}
+        for kind, mid in state["fractals"].tolist():
+            fractal_class = TopFractal if kind == 1 else BottomFractal
+            fractal = fractal_class(chan.combined[mid - 1:mid + 2])
+            fractal.is_confirmed = True
+            confirmed[mid] = fractal
+            (chan.top_fractals if kind == 1 else chan.bottom_fractals).append(fractal)
+
+        if state.get("strokes_key") is not None:
+            tentative = chan.tentative_fractal
+            if tentative is not None:
+                confirmed.setdefault(tentative.combined_klines[1].index, tentative)
+            strokes = []
+            for start_mid, end_mid, is_confirmed in state["strokes"].tolist():
+                stroke = Stroke(confirmed[start_mid], confirmed[end_mid])
+                stroke.is_confirmed = is_confirmed
+                strokes.append(stroke)
+            chan._stroke_cache = (tuple(state["strokes_key"]), strokes)
+        return chan
@@ -0,0 +1,210 @@
+# utils/indicators.py
+import numpy as np
+import pandas as pd
+
+
+def ema(values, period):
+    """指数移动平均（向量化，首值为初始值，与pandas ewm(adjust=False)一致）"""
+    return pd.Series(np.asarray(values, dtype='f8')).ewm(span=period, adjust=False).mean().to_numpy()
+
+
+def compute_macd(close, fast=12, slow=26, signal=9):
+    """
+    向量化计算MACD
+
+    参数:
+        close: 收盘价数组（如bars['close']）
+    返回:
+        tuple: (dif, dea, hist)，hist = 2 * (dif - dea)（国内行情软件的MACD柱）
+    """
+    close = np.asarray(close, dtype='f8')
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, 2 * (dif - dea)
+
+
+class IncrementalMACD:
+    """逐根K线O(1)更新的MACD，结果与compute_macd逐点一致"""
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.alpha_fast = 2.0 / (fast + 1)
+        self.alpha_slow = 2.0 / (slow + 1)
+        self.alpha_signal = 2.0 / (signal + 1)
+        self.ema_fast = None
+        self.ema_slow = None
+        self.dea = None
+
+    def update(self, close):
+        """接收一个收盘价，返回(dif, dea, hist)"""
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = close
+            dif = 0.0
+            self.dea = dif
+        else:
+            self.ema_fast += self.alpha_fast * (close - self.ema_fast)
+            self.ema_slow += self.alpha_slow * (close - self.ema_slow)
+            dif = self.ema_fast - self.ema_slow
+            self.dea += self.alpha_signal * (dif - self.dea)
+        return dif, self.dea, 2 * (dif - self.dea)
+
+
+def _check_span(begin, end):
+    """内部函数：检查闭区间[begin, end]（负序号会被列表当作倒数第几项，一并拒绝）"""
+    if begin < 0 or begin > end:
+        raise ValueError(f"无效的K线区间：[{begin}, {end}]")
+
+
+class _SparseTable:
+    """
+    内部类：区间最大值/最小值的稀疏表
+
+    查询O(1)（两次列表取值）；追加O(log n)（每层补一项）；内存O(n log n)——
+    第k层有n - 2^k + 1项，存于Python列表（每项一个float对象），n为十万量级时约为原序列的17倍
+    """
+    def __init__(self, values, func):
+        self.func = func
+        values = np.asarray(values, dtype='f8')
+        reduce = np.maximum if func is max else np.minimum
+        levels = [values]
+        width = 1
+        while 2 * width <= len(values):
+            prev = levels[-1]
+            levels.append(reduce(prev[:-width], prev[width:]))
+            width *= 2
+        self.levels = [level.tolist() for level in levels]
+
+    def append(self, value):
+        levels = self.levels
+        levels[0].append(value)
+        n = len(levels[0])
+        k, width = 1, 1
+        while 2 * width <= n:
+            if k == len(levels):
+                levels.append([])
+            prev = levels[k - 1]
+            i = n - 2 * width
+            levels[k].append(self.func(prev[i], prev[i + width]))
+            k += 1
+            width *= 2
+
+    def query(self, begin, end):
+        """闭区间[begin, end]的最大（小）值"""
+        _check_span(begin, end)
+        k = (end - begin + 1).bit_length() - 1
+        level = self.levels[k]
+        return self.func(level[begin], level[end - (1 << k) + 1])
+
+
+class MACDIndex:
+    """
+    MACD区间统计索引：一次构建后，任意原始K线区间的MACD面积、DIF峰值、柱高均为O(1)查询
+
+    面积用前缀和（每根K线O(1)追加、O(n)内存）；DIF峰值、柱高用稀疏表（见_SparseTable），
+    追加O(log n)，四张表合计O(n log n)内存。只需要面积时，前缀和部分的开销与K线数成线性
+
+    区间用原始K线序号表示（闭区间），笔的区间由合并K线的pos_begin/pos_end给出（见stroke_span）
+    """
+    def __init__(self, close, fast=12, slow=26, signal=9):
+        close = np.asarray(close, dtype='f8')
+        self.dif, self.dea, self.hist = compute_macd(close, fast, slow, signal)
+        self._macd = IncrementalMACD(fast, slow, signal)
+        if len(close):
+            # 同步增量计算器的内部状态，便于后续append
+            self._macd.ema_fast = float(ema(close, fast)[-1])
+            self._macd.ema_slow = float(ema(close, slow)[-1])
+            self._macd.dea = float(self.dea[-1])
+
+        zero = np.zeros(1)
+        self._cum_hist = np.concatenate([zero, np.cumsum(self.hist)]).tolist()
+        self._cum_pos = np.concatenate([zero, np.cumsum(np.maximum(self.hist, 0))]).tolist()
+        self._cum_neg = np.concatenate([zero, np.cumsum(np.minimum(self.hist, 0))]).tolist()
+        self._dif_max = _SparseTable(self.dif, max)
+        self._dif_min = _SparseTable(self.dif, min)
+        self._hist_max = _SparseTable(self.hist, max)
+        self._hist_min = _SparseTable(self.hist, min)
+        self.dif, self.dea, self.hist = self.dif.tolist(), self.dea.tolist(), self.hist.tolist()
+
+    def __len__(self):
+        return len(self.hist)
+
+    def append(self, close):
+        """追加一根K线的收盘价（MACD O(1)，区间索引O(log n)）"""
+        dif, dea, hist = self._macd.update(float(close))
+        self.dif.append(dif)
+        self.dea.append(dea)
+        self.hist.append(hist)
+        self._cum_hist.append(self._cum_hist[-1] + hist)
+        self._cum_pos.append(self._cum_pos[-1] + max(hist, 0.0))
+        self._cum_neg.append(self._cum_neg[-1] + min(hist, 0.0))
+        self._dif_max.append(dif)
+        self._dif_min.append(dif)
+        self._hist_max.append(hist)
+        self._hist_min.append(hist)
+
+    def area(self, begin, end):
+        """区间MACD柱面积（代数和）"""
+        _check_span(begin, end)
+        return self._cum_hist[end + 1] - self._cum_hist[begin]
+
+    def up_area(self, begin, end):
+        """区间红柱面积"""
+        _check_span(begin, end)
+        return self._cum_pos[end + 1] - self._cum_pos[begin]
+
+    def down_area(self, begin, end):
+        """区间绿柱面积（取绝对值）"""
+        _check_span(begin, end)
+        return self._cum_neg[begin] - self._cum_neg[end + 1]
+
+    def peak_dif(self, begin, end, direction='up'):
+        """区间DIF峰值：向上取最大值，向下取最小值"""
+        table = self._dif_max if direction == 'up' else self._dif_min
+        return table.query(begin, end)
+
+    def peak_hist(self, begin, end, direction='up'):
+        """区间MACD柱最高（向上）或最低（向下）值"""
+        table = self._hist_max if direction == 'up' else self._hist_min
+        return table.query(begin, end)
+
+    def stroke_strength(self, stroke):
+        """
+        笔的MACD力度
+
+        返回:
+            dict: area（与笔同向的柱面积，取绝对值）, peak_dif, peak_hist
+        """
+        begin, end = stroke_span(stroke)
+        direction = stroke.direction
+        return {
+            "area": self.up_area(begin, end) if direction == 'up' else self.down_area(begin, end),
+            "peak_dif": self.peak_dif(begin, end, direction),
+            "peak_hist": self.peak_hist(begin, end, direction),
+        }
+
+
+def stroke_span(item):
+    """笔（或线段）对应的原始K线区间：起点分型中间K线的pos_begin ~ 终点分型中间K线的pos_end"""
+    return item.raw_begin, item.raw_end
+
+
+def find_divergences(strokes, macd_index):
+    """
+    逐笔比较与前一同向笔的MACD力度，找出背驰
+
+    - 向下笔创新低但绿柱面积小于前一向下笔：底背驰（'buy'）
+    - 向上笔创新高但红柱面积小于前一向上笔：顶背驰（'sell'）
+
+    参数:
+        strokes: 笔列表
+        macd_index: MACDIndex对象（以同一原始K线序列构建）
+    返回:
+        list: [(笔序号, 'buy'/'sell', 当前笔面积, 前一同向笔面积)]
+    """
+    result = []
+    areas = [macd_index.stroke_strength(stroke)["area"] for stroke in strokes]
+    for i in range(2, len(strokes)):
+        cur, prev = strokes[i], strokes[i - 2]
+        if cur.direction == 'down' and cur.low < prev.low and areas[i] < areas[i - 2]:
+            result.append((i, 'buy', areas[i], areas[i - 2]))
+        elif cur.direction == 'up' and cur.high > prev.high and areas[i] < areas[i - 2]:
+            result.append((i, 'sell', areas[i], areas[i - 2]))
+    return result
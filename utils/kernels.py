@@ -0,0 +1,258 @@
+# utils/kernels.py
+"""
+循环形式的计算内核（numba可编译的子集：只用numpy数组和标量）
+
+安装了numba时以njit编译注册为"numba"后端；combine_block、stroke_greedy同时作为python参考实现。
+其余内核的python参考实现在各自模块中（numpy向量化版本），两者结果逐项一致
+"""
+import numpy as np
+from utils.backend import register_kernel
+
+
+EPS = 1e-5
+
+
+@register_kernel("combine", jit=True)
+def combine_block(times, highs, lows, first, state_f, state_i, eps=EPS):
+    """
+    K线包含合并（数组版combine_kline），可分块续算
+
+    与combine_kline逐步等价：第0根原始K线的数据取第一根合并K线的当前值
+    （combine_kline中二者是同一对象），前两根K线单独处理
+
+    参数:
+        times/highs/lows: 本块原始K线
+        first: 本块第一根K线的全局序号
+        state_f: float64[6]，未完成合并K线的time/high/low及其极值K线的原始time/high/low（原地更新）
+        state_i: int64[5]，已有合并K线数（含未完成的一根）、未完成合并K线的pos_begin/pos_end/pos_extreme/isUp（原地更新）
+        eps: 价格比较阈值
+    返回:
+        tuple: (time, high, low, pos_begin, pos_end, pos_extreme, is_up, count)，
+               本块内已固定的合并K线（前count项有效；最后一根未完成的合并K线留在state中）
+    """
+    n = len(highs)
+    c_time = np.empty(n, dtype=np.float64)
+    c_high = np.empty(n, dtype=np.float64)
+    c_low = np.empty(n, dtype=np.float64)
+    c_begin = np.empty(n, dtype=np.int64)
+    c_end = np.empty(n, dtype=np.int64)
+    c_ext = np.empty(n, dtype=np.int64)
+    c_up = np.zeros(n, dtype=np.bool_)
+    closed = 0
+    for k in range(n):
+        i = first + k
+        t, h, l = times[k], highs[k], lows[k]
+        if state_i[0] == 0:
+            state_f[0], state_f[1], state_f[2] = t, h, l
+            state_f[3], state_f[4], state_f[5] = t, h, l
+            state_i[0], state_i[1], state_i[2], state_i[3], state_i[4] = 1, i, i, i, 0
+            continue
+
+        ph, pl = state_f[1], state_f[2]
+        if (h - ph > eps and l - pl > eps) or (h - ph < -eps and l - pl < -eps):
+            # 独立K线：固定上一根合并K线，开始新的一根
+            c_time[closed], c_high[closed], c_low[closed] = state_f[0], ph, pl
+            c_begin[closed], c_end[closed], c_ext[closed] = state_i[1], state_i[2], state_i[3]
+            c_up[closed] = state_i[4] == 1
+            closed += 1
+            state_f[0], state_f[1], state_f[2] = t, h, l
+            state_f[3], state_f[4], state_f[5] = t, h, l
+            state_i[0] += 1
+            state_i[1], state_i[2], state_i[3] = i, i, i
+            state_i[4] = 1 if h - ph > eps else 0
+            continue
+
+        cur_contains_prev = h - ph > eps or l - pl < -eps
+        is_up = state_i[4] == 1
+        begin, end, ext = state_i[1], state_i[2], state_i[3]
+        if i == 1:
+            if cur_contains_prev:
+                low, high, index = pl, h, i
+            else:
+                low, high, index = l, ph, begin
+        elif cur_contains_prev:
+            if is_up:
+                index = ext if abs(h - ph) <= eps else i
+                low, high = pl, h
+            else:
+                index = ext if abs(l - pl) <= eps else i
+                low, high = l, ph
+        else:
+            index = begin if begin == end else ext
+            if is_up:
+                low, high = l, ph
+            else:
+                low, high = pl, h
+
+        # 按趋势更新合并K线时间（极值K线为第0根时取第一根合并K线的当前值）
+        if index == i:
+            et, eh, el = t, h, l
+        elif index == 0:
+            et, eh, el = state_f[0], state_f[1], state_f[2]
+        else:
+            et, eh, el = state_f[3], state_f[4], state_f[5]
+        if is_up:
+            if h - eh > eps or (abs(h - eh) <= eps and t > et):
+                state_f[0] = t
+            else:
+                state_f[0] = et
+        else:
+            if l - el < -eps or (abs(l - el) <= eps and t > et):
+                state_f[0] = t
+            else:
+                state_f[0] = et
+        state_f[1], state_f[2] = high, low
+        state_f[3], state_f[4], state_f[5] = et, eh, el
+        state_i[2], state_i[3] = i, index
+    return c_time, c_high, c_low, c_begin, c_end, c_ext, c_up, closed
+
+
+@register_kernel("fractal_marks", backend="numba")
+def fractal_marks_loop(highs, lows, eps=EPS, strict=True):
+    """
+    分型标记：marks[i]=1/-1表示以第i根合并K线为中间K线的顶/底分型，0表示无
+
+    strict为True时顶分型要求中间K线高点、低点均高于两侧（底分型反之），为False时只比较高点（底分型只比较低点）
+    """
+    n = len(highs)
+    marks = np.zeros(n, dtype=np.int8)
+    for i in range(1, n - 1):
+        h0, h1, h2 = highs[i - 1], highs[i], highs[i + 1]
+        l0, l1, l2 = lows[i - 1], lows[i], lows[i + 1]
+        if h1 - h0 > eps and h1 - h2 > eps and (not strict or (l1 - l0 > eps and l1 - l2 > eps)):
+            marks[i] = 1
+        elif l1 - l0 < -eps and l1 - l2 < -eps and (not strict or (h1 - h0 < -eps and h1 - h2 < -eps)):
+            marks[i] = -1
+    return marks
+
+
+@register_kernel("next_break", backend="numba")
+def next_break_loop(values, sign):
+    """单调栈：每个位置之后第一个sign*(values[j]-values[i])>0的位置，不存在为len(values)"""
+    n = len(values)
+    result = np.full(n, n, dtype=np.int64)
+    stack = np.empty(n, dtype=np.int64)
+    top = 0
+    for j in range(n):
+        v = values[j]
+        while top > 0 and sign * (v - values[stack[top - 1]]) > 0:
+            top -= 1
+            result[stack[top]] = j
+        stack[top] = j
+        top += 1
+    return result
+
+
+@register_kernel("stroke_dp", backend="numba")
+def stroke_dp_loop(kind, mid, reach, min_gap=3):
+    """窗口内最长笔序列的动态规划：返回(dp_len, dp_prev)，同长度取最早的前驱"""
+    n = len(mid)
+    dp_len = np.full(n, -1, dtype=np.int64)
+    dp_prev = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return dp_len, dp_prev
+    dp_len[0] = 1
+    for i in range(1, n):
+        best, best_j = -1, -1
+        for j in range(i):
+            if dp_len[j] > best and kind[j] != kind[i] and mid[i] - mid[j] > min_gap and reach[j] >= mid[i]:
+                best, best_j = dp_len[j], j
+        if best_j != -1:
+            dp_len[i] = best + 1
+            dp_prev[i] = best_j
+    return dp_len, dp_prev
+
+
+@register_kernel("stroke_greedy", jit=True)
+def stroke_greedy(kind, mid, price, reach, min_gap=3):
+    """
+    单遍贪心笔构建（不经过必经点与动态规划）：按分型顺序顶底交替，返回笔端点的分型表行号
+
+    - 与最后一个端点同类型且更极端（顶更高/底更低）的分型替换该端点
+    - 反向分型与最后一个端点的中间K线序号差大于min_gap、且不超过端点的reach时成为新端点
+    - 反向分型间距不足但比倒数第二个端点更极端时，撤销最后一笔，上一笔延伸到该分型
+    """
+    n = len(mid)
+    rows = np.empty(n, dtype=np.int64)
+    size = 0
+    for i in range(n):
+        if size == 0:
+            rows[0] = i
+            size = 1
+            continue
+        last = rows[size - 1]
+        if kind[i] == kind[last]:
+            if kind[i] * (price[i] - price[last]) > 0:
+                rows[size - 1] = i
+        elif mid[i] - mid[last] > min_gap and reach[last] >= mid[i]:
+            rows[size] = i
+            size += 1
+        elif size >= 2 and kind[i] * (price[i] - price[rows[size - 2]]) > 0:
+            size -= 1
+            rows[size - 1] = i
+    return rows[:size]
+
+
+@register_kernel("necessary_rows", backend="numba")
+def necessary_rows_loop(kind, mid, price, n, min_gap=3):
+    """
+    必经点搜索（分型表行号形式）
+
+    返回:
+        tuple: (rows, segments, status)；segments: 0=初始，1=前段，2=后段；
+               status: 0=正常，1=缺少顶或底分型，2=初始顶底间距不足（rows为[顶, 底]）
+    """
+    count = len(mid)
+    rows = np.empty(count + 2, dtype=np.int64)
+    segments = np.empty(count + 2, dtype=np.int64)
+    top_row, bottom_row = -1, -1
+    for r in range(count):
+        if kind[r] == 1:
+            if top_row == -1 or price[r] > price[top_row]:
+                top_row = r
+        elif bottom_row == -1 or price[r] < price[bottom_row]:
+            bottom_row = r
+    if top_row == -1 or bottom_row == -1:
+        return rows[:0], segments[:0], 1
+    rows[0], rows[1] = top_row, bottom_row
+    segments[0] = segments[1] = 0
+    top_idx, bottom_idx = mid[top_row], mid[bottom_row]
+    if abs(top_idx - bottom_idx) <= min_gap:
+        return rows[:2], segments[:2], 2
+    size = 2
+
+    # 前段：[0, length)内交替取最低底/最高顶（同价取最早）
+    length = min(top_idx, bottom_idx)
+    want = -1 if top_idx < bottom_idx else 1
+    while length >= 3:
+        best = -1
+        for r in range(count):
+            if mid[r] >= length:
+                break
+            if kind[r] == want:
+                if best == -1 or (want == 1 and price[r] > price[best]) or (want == -1 and price[r] < price[best]):
+                    best = r
+        if best == -1 or mid[best] >= length - 1:
+            break
+        rows[size], segments[size] = best, 1
+        size += 1
+        length = mid[best]
+        want = -want
+
+    # 后段：[start, n)内交替取最低底（同价取最晚）/最高顶（同价取最早）
+    start = max(top_idx, bottom_idx)
+    want = -1 if top_idx > bottom_idx else 1
+    while n - start >= 3:
+        best = -1
+        for r in range(count):
+            if mid[r] < start or kind[r] != want:
+                continue
+            if best == -1 or (want == 1 and price[r] > price[best]) or (want == -1 and price[r] <= price[best]):
+                best = r
+        if best == -1 or mid[best] - start <= 0:
+            break
+        rows[size], segments[size] = best, 2
+        size += 1
+        start = mid[best] + 1
+        want = -want
+    return rows[:size], segments[:size], 0
@@ -1,6 +1,9 @@
 # utils/kline_combiner.py
 import copy
+import numpy as np
 from core.Chan_base import stCombineK
+from utils.backend import get_kernel
+from utils.price_ticks import to_ticks, from_ticks, resolve_tick_size
 
 
 # 基础辅助函数（仅K线合并使用）
@@ -47,20 +50,72 @@ def _handle_contained_k(combs, pLast, low, high, index, pos_end, pPrev, kline_li
     pPrev = pLast
     return combs, pPrev
 
-def combine_kline(kline_list):
+def _combine_with_kernel(kline_list, backend, eps=1e-5, tick_size=None):
+    """内部函数：用数组内核完成合并，再组装stCombineK（不修改输入K线）"""
+    times = np.array([k.time for k in kline_list], dtype='f8')
+    highs = np.array([k.high for k in kline_list], dtype='f8')
+    lows = np.array([k.low for k in kline_list], dtype='f8')
+    if tick_size is not None:
+        # 定点整数价格：阈值取0即为精确的整数比较
+        highs, lows, eps = to_ticks(highs, tick_size), to_ticks(lows, tick_size), 0
+    state_f, state_i = new_combine_state()
+    columns = get_kernel("combine", backend)(times, highs, lows, 0, state_f, state_i, eps)
+    bars = list(zip(*[column[:columns[-1]].tolist() for column in columns[:-1]]))
+    if state_i[0]:
+        bars.append(open_combined_bar(state_f, state_i))
+    if tick_size is not None and bars:
+        # 合并K线的高低点换回价格（落在价格网格上）
+        t, h, l, b, e, x, up = zip(*bars)
+        bars = list(zip(t, from_ticks(h, tick_size).tolist(), from_ticks(l, tick_size).tolist(), b, e, x, up))
+
+    # index为按时间排序后的序号（与combine_kline一致）
+    order = sorted(range(len(bars)), key=lambda i: bars[i][0])
+    ranks = [0] * len(bars)
+    for rank, i in enumerate(order):
+        ranks[i] = rank
+
+    combs = []
+    for (t, h, l, b, e, x, up), rank in zip(bars, ranks):
+        data = copy.copy(kline_list[b])
+        data.time, data.high, data.low = t, h, l
+        combs.append(stCombineK(data, b, e, x, up, rank))
+    return combs
+
+def new_combine_state():
+    """数组合并内核（utils.kernels.combine_block）的初始续算状态：(state_f, state_i)"""
+    return np.zeros(6, dtype='f8'), np.zeros(5, dtype='i8')
+
+def open_combined_bar(state_f, state_i):
+    """续算状态中未完成的合并K线：(time, high, low, pos_begin, pos_end, pos_extreme, is_up)"""
+    return (float(state_f[0]), float(state_f[1]), float(state_f[2]),
+            int(state_i[1]), int(state_i[2]), int(state_i[3]), bool(state_i[4]))
+
+def combine_kline(kline_list, backend=None, eps=1e-5, tick_size=None):
     """
     对外暴露的K线合并主函数：处理包含关系，输出合并后的stCombineK列表
     
     参数:
         kline_list: 原始KLine对象列表
+        backend: 为None时使用下方的对象实现；指定"python"/"numba"/"auto"时改用数组内核（utils.kernels.combine_block），
+                 结果相同
+        eps: 价格比较阈值；不为1e-5时使用数组内核（backend为None时取全局默认后端）
+        tick_size: 最小变动价位（或"auto"，见utils.price_ticks.resolve_tick_size）；给出时价格换算为int64整数后
+                   用数组内核精确比较（忽略eps），合并K线的高低点为网格上的价格
     返回:
-        list: 合并后的stCombineK对象列表
+        list: 合并后的stCombineK对象列表（合并K线的data均为副本，不修改kline_list中的K线）
     """
+    if tick_size is not None:
+        return _combine_with_kernel(kline_list, backend, eps, resolve_tick_size(tick_size, kline_list))
+    if backend is not None or eps != 1e-5:
+        return _combine_with_kernel(kline_list, backend, eps)
     if len(kline_list) < 2:
         return [stCombineK(k, i, i, i, False, i) for i, k in enumerate(kline_list)]
 
-    # 初始化合并容器
+    # 初始化合并容器；第一根合并K线的data会被后续包含处理修改，先复制，
+    # 包含处理中取第0根K线时与原实现一致，取合并后的数据
     combs = [stCombineK(k, i, i, i, False, i) for i, k in enumerate(kline_list)]
+    combs[0].data = copy.copy(kline_list[0])
+    kline_list = [combs[0].data] + kline_list[1:]
     size = len(combs)
     pBegin = 0
     pLast = pBegin
@@ -1,11 +1,15 @@
 # utils/necessary_point_finder.py
 from datetime import datetime
+import numpy as np
+from utils.backend import get_kernel, register_kernel
+from utils.fractal_table import TOP, BOTTOM
+from utils.stage_log import stage_print
 
 
 def _find_initial_points(combined_klines, top_fractals, bottom_fractals):
     """内部函数：寻找全局初始必经点（最高顶+最低底）"""
     if not top_fractals or not bottom_fractals:
-        print("[必经点查找] 警告：顶分型或底分型列表为空")
+        stage_print("[必经点查找] 警告：顶分型或底分型列表为空")
         return None
 
     # 筛选全局极值
@@ -18,14 +22,14 @@ def _find_initial_points(combined_klines, top_fractals, bottom_fractals):
         top_idx = combined_times.index(potential_top.time)
         bottom_idx = combined_times.index(potential_bottom.time)
     except ValueError:
-        print("[必经点查找] 警告：分型未在合并K线中找到对应记录")
+        stage_print("[必经点查找] 警告：分型未在合并K线中找到对应记录")
         return None
 
     # 验证分型间非共用K线
     if abs(potential_top.combined_klines[1].index - potential_bottom.combined_klines[1].index) > 3:
         return {"top_necessary": potential_top, "bottom_necessary": potential_bottom}
     else:
-        print(f"[必经点查找] 警告：顶底分型间距不足（索引差={abs(top_idx - bottom_idx)}）")
+        stage_print(f"[必经点查找] 警告：顶底分型间距不足（索引差={abs(top_idx - bottom_idx)}）")
         return None
 
 def _recursive_front(segment, top_fractals, bottom_fractals, result_list, is_split_by_top):
@@ -173,7 +177,7 @@ def find_all_necessary_points(combined_klines, top_fractals, bottom_fractals):
         top_idx = combined_times.index(initial_points["top_necessary"].time)
         bottom_idx = combined_times.index(initial_points["bottom_necessary"].time)
     except ValueError:
-        print("[必经点查找] 警告：初始必经点在合并K线中未找到对应索引")
+        stage_print("[必经点查找] 警告：初始必经点在合并K线中未找到对应索引")
         return all_points
 
     # 3. 分割前段和后段，执行递归查找
@@ -195,7 +199,7 @@ def find_all_necessary_points(combined_klines, top_fractals, bottom_fractals):
     # 打印必经点统计信息
     initial_count = len([p for p in all_points if p["type"] == "initial"])
     recursive_count = len([p for p in all_points if p["type"] == "recursive"])
-    print(f"[必经点查找] 共找到 {len(all_points)} 个必经点（初始：{initial_count} 个，递归：{recursive_count} 个）")
+    stage_print(f"[必经点查找] 共找到 {len(all_points)} 个必经点（初始：{initial_count} 个，递归：{recursive_count} 个）")
     return all_points
 
 
@@ -221,3 +225,128 @@ def print_necessary_points(points):
         print(f"  - 分段：{point['segment_type']}")
     print("="*68)
 
+
+
+@register_kernel("necessary_rows")
+def _necessary_rows(kind, mid, price, n, min_gap=3):
+    """
+    内部函数：必经点搜索（分型表行号形式），分段筛选为对有序数组二分切片
+
+    返回:
+        tuple: (rows, segments, status)；segments: 0=初始，1=前段，2=后段；
+               status: 0=正常，1=缺少顶或底分型，2=初始顶底间距不足（rows为[顶, 底]）
+    """
+    top_rows = np.flatnonzero(kind == TOP)
+    bottom_rows = np.flatnonzero(kind == BOTTOM)
+    if len(top_rows) == 0 or len(bottom_rows) == 0:
+        return np.empty(0, dtype='i8'), np.empty(0, dtype='i8'), 1
+    top_mid, top_price = mid[top_rows], price[top_rows]
+    bottom_mid, bottom_price = mid[bottom_rows], price[bottom_rows]
+
+    # 1. 初始必经点：最高顶 + 最低底
+    top_row = int(top_rows[np.argmax(top_price)])
+    bottom_row = int(bottom_rows[np.argmin(bottom_price)])
+    rows, segments = [top_row, bottom_row], [0, 0]
+    top_idx, bottom_idx = int(mid[top_row]), int(mid[bottom_row])
+    if abs(top_idx - bottom_idx) <= min_gap:
+        return np.array(rows, dtype='i8'), np.array(segments, dtype='i8'), 2
+
+    # 2. 前段：合并K线[0, length)，交替寻找段内最低底/最高顶
+    length = min(top_idx, bottom_idx)
+    split_by_top = top_idx < bottom_idx
+    while length >= 3:
+        if split_by_top:
+            k = int(np.searchsorted(bottom_mid, length))
+            if k == 0:
+                break
+            r = int(np.argmin(bottom_price[:k]))
+            row, m = int(bottom_rows[r]), int(bottom_mid[r])
+        else:
+            k = int(np.searchsorted(top_mid, length))
+            if k == 0:
+                break
+            r = int(np.argmax(top_price[:k]))
+            row, m = int(top_rows[r]), int(top_mid[r])
+        if m >= length - 1:
+            break
+        rows.append(row)
+        segments.append(1)
+        length = m
+        split_by_top = not split_by_top
+
+    # 3. 后段：合并K线[start, n)，交替寻找段内最低底（同价取最晚）/最高顶
+    start = max(top_idx, bottom_idx)
+    start_with_top = top_idx > bottom_idx
+    while n - start >= 3:
+        if start_with_top:
+            k = int(np.searchsorted(bottom_mid, start))
+            prices = bottom_price[k:]
+            if len(prices) == 0:
+                break
+            r = k + len(prices) - 1 - int(np.argmin(prices[::-1]))
+            row, m = int(bottom_rows[r]), int(bottom_mid[r])
+        else:
+            k = int(np.searchsorted(top_mid, start))
+            prices = top_price[k:]
+            if len(prices) == 0:
+                break
+            r = k + int(np.argmax(prices))
+            row, m = int(top_rows[r]), int(top_mid[r])
+        if m - start <= 0:
+            break
+        rows.append(row)
+        segments.append(2)
+        start = m + 1
+        start_with_top = not start_with_top
+    return np.array(rows, dtype='i8'), np.array(segments, dtype='i8'), 0
+
+
+def find_necessary_rows(kind, mid, price, n, backend=None, min_gap=3):
+    """
+    数组形式的必经点查找（分型表各列可为内存映射数组）
+
+    参数:
+        kind/mid/price: 分型表的kind/mid/price列
+        n: 合并K线总数
+        backend: 计算后端（见utils.backend）
+        min_gap: 初始最高顶与最低底的中间K线序号之差须大于min_gap
+    返回:
+        tuple: (rows, segments)，必经点的分型表行号列表及所属分段（0=初始，1=前段，2=后段），条件不满足时均为空列表
+    """
+    rows, segments, status = get_kernel("necessary_rows", backend)(kind, mid, price, n, min_gap)
+    if status == 1:
+        stage_print("[必经点查找] 警告：顶分型或底分型列表为空")
+        return [], []
+    if status == 2:
+        stage_print(f"[必经点查找] 警告：顶底分型间距不足（索引差={abs(int(mid[rows[0]]) - int(mid[rows[1]]))}）")
+        return [], []
+    return rows.tolist(), segments.tolist()
+
+
+def find_all_necessary_points_from_table(table, min_gap=3):
+    """
+    基于分型表（FractalTable）的必经点查找：结果与find_all_necessary_points一致，
+    但不再逐个比较分型时间，搜索由table.backend对应的内核完成
+
+    参数:
+        table: FractalTable对象（detect_fractal_table返回值）
+        min_gap: 见find_necessary_rows
+    返回:
+        list: 必经点字典列表，比find_all_necessary_points多一个row字段（分型表行号）
+    """
+    all_points = []
+    rows, segments = find_necessary_rows(table.kind, table.mid, table.price, len(table.combined_klines), table.backend, min_gap)
+    segment_names = ("full", "front", "back")
+    for row, segment in zip(rows, segments):
+        all_points.append({
+            "type": "initial" if segment == 0 else "recursive",
+            "top_or_bottom": "top" if table.kind[row] == TOP else "bottom",
+            "fractal": table.fractal(row),
+            "segment_type": segment_names[segment],
+            "row": row,
+        })
+
+    initial_count = len([p for p in all_points if p["type"] == "initial"])
+    recursive_count = len([p for p in all_points if p["type"] == "recursive"])
+    stage_print(f"[必经点查找] 共找到 {len(all_points)} 个必经点（初始：{initial_count} 个，递归：{recursive_count} 个）")
+    return all_points
@@ -0,0 +1,384 @@
+# utils/panel.py
+from functools import reduce
+import numpy as np
+import pandas as pd
+from utils.backend import get_kernel
+from utils.bar_array import BAR_DTYPE, klines_to_array, frame_to_array
+from utils.data_loader import load_kline_frame, symbol_from_path
+from utils.kline_combiner import new_combine_state, open_combined_bar
+from utils.necessary_point_finder import find_necessary_rows
+from utils.stroke_identifier import identify_stroke_rows, STROKE_METHODS
+from utils.stage_log import quiet
+
+
+# 面板字段：每个字段为(标的数, 时间数)的float64矩阵，标的在该时刻无K线时为NaN
+PANEL_FIELDS = ("open", "high", "low", "close", "volume", "amount")
+ALIGN_MODES = ("outer", "inner")
+
+
+def _as_bars(source):
+    """内部函数：BAR_DTYPE数组 / KLine列表 / CSV路径 → BAR_DTYPE数组"""
+    if isinstance(source, np.ndarray):
+        return source.astype(BAR_DTYPE, copy=False)
+    if isinstance(source, str):
+        return frame_to_array(load_kline_frame(source))
+    return klines_to_array(source)
+
+
+class Panel:
+    """
+    多标的面板：把多个标的的K线对齐到同一时间轴上（标的 × 时间的矩阵），
+    可向量化的阶段（分型标记、MACD及其前缀和、信号条件）一次性对整个面板计算，用于宽度指标等截面统计
+
+    - 各标的的合并K线、必经点与笔仍按标的逐个计算（由数组内核完成，不创建对象），
+      分型标记对补齐后的合并K线矩阵一次性计算
+    - 截面结果只用面板内的数据；需要某个历史时刻的无未来函数结果时，先用asof截取面板
+
+    用法:
+        panel = Panel.from_files(paths)
+        panel.up_stroke_fraction()              # 当前处于向上笔的成分股比例
+        panel.breadth(panel.macd_cross() == 1)  # 每个时刻出现MACD金叉的比例
+    """
+    def __init__(self, symbols, times, fields, backend=None):
+        """
+        参数:
+            symbols: 标的代码列表
+            times: 共同时间轴（float64秒，升序）
+            fields: {字段名: (标的数, 时间数)矩阵}，至少含high/low/close
+            backend: 数组内核的计算后端（见utils.backend）
+        """
+        self.symbols = list(symbols)
+        self.times = np.asarray(times, dtype='f8')
+        self.fields = fields
+        self.backend = backend
+        self.valid = ~np.isnan(fields["close"])
+        self._cache = {}
+
+    @classmethod
+    def from_bars(cls, data, times=None, how="outer", backend=None):
+        """
+        由多个标的的K线构建面板
+
+        参数:
+            data: {标的: BAR_DTYPE数组、KLine列表或CSV路径}
+            times: 共同时间轴；None时按how由各标的的时间生成
+            how: "outer"（全部标的时间的并集）或"inner"（交集，其余K线丢弃）
+        """
+        if how not in ALIGN_MODES:
+            raise ValueError(f"未知的对齐方式：{how}")
+        bars = {symbol: _as_bars(source) for symbol, source in data.items()}
+        if times is None:
+            columns = [b['time'] for b in bars.values()] or [np.empty(0)]
+            times = reduce(np.union1d if how == "outer" else np.intersect1d, columns)
+        times = np.asarray(times, dtype='f8')
+
+        fields = {name: np.full((len(bars), len(times)), np.nan) for name in PANEL_FIELDS}
+        for i, b in enumerate(bars.values()):
+            pos = np.searchsorted(times, b['time'])
+            keep = pos < len(times)
+            keep[keep] = times[pos[keep]] == b['time'][keep]
+            for name in PANEL_FIELDS:
+                fields[name][i, pos[keep]] = b[name][keep]
+        return cls(list(bars), times, fields, backend)
+
+    @classmethod
+    def from_files(cls, paths, how="outer", backend=None):
+        """由CSV文件列表构建面板（标的取文件名）"""
+        return cls.from_bars({symbol_from_path(path): path for path in paths}, how=how, backend=backend)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def shape(self):
+        """(标的数, 时间数)"""
+        return self.valid.shape
+
+    def asof(self, time):
+        """截取时间不晚于time的部分（视图，不复制），用于计算历史时刻的截面"""
+        end = int(np.searchsorted(self.times, time, side='right'))
+        return Panel(self.symbols, self.times[:end], {name: m[:, :end] for name, m in self.fields.items()},
+                     self.backend)
+
+    def bars(self, symbol):
+        """单个标的的K线（BAR_DTYPE数组，只含该标的实际有K线的时刻）"""
+        i = self.symbols.index(symbol)
+        cols = np.flatnonzero(self.valid[i])
+        bars = np.zeros(len(cols), dtype=BAR_DTYPE)
+        bars['time'] = self.times[cols]
+        for name in PANEL_FIELDS:
+            if name in self.fields:
+                bars[name] = self.fields[name][i, cols]
+        return bars
+
+    def to_frame(self, matrix):
+        """(标的数, 时间数)矩阵 → DataFrame（行为时间，列为标的）"""
+        return pd.DataFrame(np.asarray(matrix).T, index=pd.to_datetime(self.times, unit='s'), columns=self.symbols)
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+    def macd(self, fast=12, slow=26, signal=9):
+        """
+        整个面板的MACD（各标的只按自己的K线计算，与逐个调用compute_macd一致），无K线的时刻为NaN
+
+        返回:
+            tuple: (dif, dea, hist)，均为(标的数, 时间数)矩阵
+        """
+        key = ("macd", fast, slow, signal)
+        if key not in self._cache:
+            # 列为标的的DataFrame上按列做EMA，ignore_na使缺失时刻不参与递推
+            close = pd.DataFrame(self.fields["close"].T)
+            dif = (close.ewm(span=fast, adjust=False, ignore_na=True).mean()
+                   - close.ewm(span=slow, adjust=False, ignore_na=True).mean())
+            dif = dif.where(close.notna())
+            dea = dif.ewm(span=signal, adjust=False, ignore_na=True).mean().where(close.notna())
+            dif, dea = dif.to_numpy().T, dea.to_numpy().T
+            self._cache[key] = (dif, dea, 2 * (dif - dea))
+        return self._cache[key]
+
+    def hist_prefix(self, fast=12, slow=26, signal=9):
+        """MACD柱的前缀和矩阵（标的数, 时间数 + 1），第j列为前j个时刻之和（缺失时刻计0）"""
+        key = ("hist_prefix", fast, slow, signal)
+        if key not in self._cache:
+            hist = self.macd(fast, slow, signal)[2]
+            prefix = np.zeros((hist.shape[0], hist.shape[1] + 1))
+            np.nancumsum(hist, axis=1, out=prefix[:, 1:])
+            self._cache[key] = prefix
+        return self._cache[key]
+
+    def macd_area(self, begin, end, fast=12, slow=26, signal=9):
+        """
+        各标的在时间列[begin, end]（闭区间）内的MACD柱面积
+
+        参数:
+            begin/end: 时间列序号，整数或长度为标的数的数组（如各标的最后一笔的起止列，见last_stroke_span）
+        返回:
+            ndarray: 长度为标的数
+        """
+        prefix = self.hist_prefix(fast, slow, signal)
+        rows = np.arange(len(self.symbols))
+        begin = np.broadcast_to(np.asarray(begin, dtype='i8'), rows.shape)
+        end = np.broadcast_to(np.asarray(end, dtype='i8'), rows.shape)
+        area = prefix[rows, np.clip(end, -1, len(self.times) - 1) + 1] - prefix[rows, np.clip(begin, 0, None)]
+        return np.where((begin >= 0) & (end >= begin), area, np.nan)
+
+    def _previous(self, matrix):
+        """内部函数：每个时刻该标的上一根K线处的值（没有上一根K线时为NaN）"""
+        cols = np.where(self.valid, np.arange(len(self.times)), -1)
+        last = np.maximum.accumulate(cols, axis=1)
+        prev = np.full_like(last, -1)
+        prev[:, 1:] = last[:, :-1]
+        values = np.take_along_axis(matrix, np.maximum(prev, 0), axis=1)
+        return np.where(prev >= 0, values, np.nan)
+
+    def macd_cross(self, fast=12, slow=26, signal=9):
+        """MACD金叉/死叉矩阵（int8）：1=本根K线DIF上穿DEA，-1=下穿，其余为0"""
+        dif, dea, _ = self.macd(fast, slow, signal)
+        diff = dif - dea
+        prev = self._previous(diff)
+        with np.errstate(invalid='ignore'):
+            golden = (diff > 0) & (prev <= 0)
+            death = (diff < 0) & (prev >= 0)
+        return (golden.astype('i1') - death.astype('i1')) * self.valid
+
+    # ------------------------------------------------------------------
+    # 结构
+    # ------------------------------------------------------------------
+    def structure(self, stroke_method="dp", min_gap=3):
+        """
+        各标的的合并K线、分型与笔端点（数组形式，结果与identify_strokes_from_klines一致）
+
+        返回:
+            list: 每个标的一个dict：cols（该标的各K线所在的时间列）, high/low/pos_begin/pos_end/pos_extreme（合并K线）,
+                  kind/mid/price（分型表）, rows（笔端点的分型表行号）
+        """
+        if stroke_method not in STROKE_METHODS:
+            raise ValueError(f"未知的笔识别方式：{stroke_method}")
+        key = ("structure", stroke_method, min_gap)
+        if key in self._cache:
+            return self._cache[key]
+
+        combine = get_kernel("combine", self.backend)
+        items = []
+        for i in range(len(self.symbols)):
+            cols = np.flatnonzero(self.valid[i])
+            state_f, state_i = new_combine_state()
+            columns = combine(self.times[cols], self.fields["high"][i, cols], self.fields["low"][i, cols], 0,
+                              state_f, state_i)
+            count = columns[-1]
+            combined = [column[:count] for column in columns[1:6]]
+            if state_i[0]:
+                tail = open_combined_bar(state_f, state_i)
+                combined = [np.append(column, value) for column, value in zip(combined, tail[1:6])]
+            high, low, pos_begin, pos_end, pos_extreme = combined
+            items.append({"cols": cols, "high": high, "low": low,
+                          "pos_begin": pos_begin, "pos_end": pos_end, "pos_extreme": pos_extreme})
+
+        # 分型标记：各标的的合并K线补齐为矩阵（NaN比较结果为False，不会在补齐处产生分型）后一次性计算
+        width = max((len(item["high"]) for item in items), default=0)
+        highs = np.full((len(items), width), np.nan)
+        lows = np.full((len(items), width), np.nan)
+        for i, item in enumerate(items):
+            highs[i, :len(item["high"])] = item["high"]
+            lows[i, :len(item["low"])] = item["low"]
+        marks = get_kernel("fractal_marks", "python")(highs, lows)
+
+        next_break = get_kernel("next_break", self.backend)
+        for i, item in enumerate(items):
+            mid = np.flatnonzero(marks[i])
+            kind = marks[i, mid]
+            price = np.where(kind == 1, item["high"][mid], item["low"][mid]) if len(mid) else np.empty(0)
+            reach = np.where(kind == 1, next_break(item["high"], 1.0)[mid], next_break(item["low"], -1.0)[mid])
+            with quiet(True):
+                if stroke_method == "greedy":
+                    rows = get_kernel("stroke_greedy", self.backend)(kind, mid, price, reach, min_gap)
+                else:
+                    point_rows, _ = find_necessary_rows(kind, mid, price, len(item["high"]), self.backend, min_gap)
+                    rows = identify_stroke_rows(kind, mid, reach, point_rows, self.backend, min_gap)
+            rows = np.asarray(rows, dtype='i8')
+            item.update(kind=kind, mid=mid, price=price, rows=rows if len(rows) >= 2 else rows[:0])
+        self._cache[key] = items
+        return items
+
+    def fractal_marks(self):
+        """
+        分型标记矩阵（int8）：1/-1标在顶/底分型中间合并K线的极值K线（pos_extreme）所在的时间列，其余为0
+
+        分型以合并K线为准，右侧合并K线完成前的分型（最后一个）也会标出
+        """
+        marks = np.zeros(self.shape, dtype='i1')
+        for i, item in enumerate(self.structure()):
+            marks[i, item["cols"][item["pos_extreme"][item["mid"]]]] = item["kind"]
+        return marks
+
+    def _endpoint_cols(self, item):
+        """内部函数：笔端点分型的极值K线所在的时间列"""
+        return item["cols"][item["pos_extreme"][item["mid"][item["rows"]]]]
+
+    def stroke_direction(self, stroke_method="dp"):
+        """各标的最后一笔的方向（int8数组）：1=向上，-1=向下，没有笔为0"""
+        direction = np.zeros(len(self.symbols), dtype='i1')
+        for i, item in enumerate(self.structure(stroke_method)):
+            if len(item["rows"]) >= 2:
+                direction[i] = 1 if item["kind"][item["rows"][-2]] == -1 else -1
+        return direction
+
+    def last_stroke_span(self, stroke_method="dp"):
+        """各标的最后一笔起止端点所在的时间列（两个int64数组，没有笔为-1）"""
+        begin = np.full(len(self.symbols), -1, dtype='i8')
+        end = np.full(len(self.symbols), -1, dtype='i8')
+        for i, item in enumerate(self.structure(stroke_method)):
+            if len(item["rows"]) >= 2:
+                begin[i], end[i] = self._endpoint_cols(item)[-2:]
+        return begin, end
+
+    def stroke_matrix(self, stroke_method="dp"):
+        """
+        笔方向矩阵（int8）：各时刻所在笔的方向（1/-1），第一笔之前、最后一笔之后为0
+
+        注意：按面板内全部数据识别的笔划分，含未来信息，只用于事后统计；实时截面用stroke_direction
+        """
+        matrix = np.zeros(self.shape, dtype='i1')
+        for i, item in enumerate(self.structure(stroke_method)):
+            if len(item["rows"]) < 2:
+                continue
+            cols = self._endpoint_cols(item)
+            directions = np.where(item["kind"][item["rows"][:-1]] == -1, 1, -1)
+            matrix[i, cols[0]:cols[-1]] = np.repeat(directions, np.diff(cols))
+        return matrix
+
+    def second_buy_sell(self, pattern_strokes=4, stroke_method="dp"):
+        """
+        各标的最后一根合并K线处是否出现二买/二卖（规则同detect_second_buy_sell），对全部标的向量化判断
+
+        返回:
+            tuple: (is_second_buy, is_second_sell)，均为长度为标的数的bool数组
+        """
+        if pattern_strokes < 4 or pattern_strokes % 2:
+            raise ValueError(f"pattern_strokes须为不小于4的偶数：{pattern_strokes}")
+        n = len(self.symbols)
+        prices = np.full((n, pattern_strokes + 1), np.nan)
+        kinds = np.zeros((n, pattern_strokes + 1), dtype='i1')
+        at_end = np.zeros(n, dtype=bool)
+        for i, item in enumerate(self.structure(stroke_method)):
+            rows = item["rows"]
+            if len(rows) < pattern_strokes + 1 or len(item["high"]) < 3:
+                continue
+            rows = rows[-(pattern_strokes + 1):]
+            prices[i] = item["price"][rows]
+            kinds[i] = item["kind"][rows]
+            # 最后一笔的终点分型须以最后一根合并K线为右侧K线
+            at_end[i] = item["mid"][rows[-1]] == len(item["high"]) - 2
+
+        # 笔的方向由起点分型决定（底为向上笔）："上-下-...-上-下"即各笔起点依次为底、顶，且终点为底分型；
+        # pivot为倒数第二笔的起点
+        up_down = np.tile([-1, 1], pattern_strokes // 2)
+        pivot = prices[:, pattern_strokes - 2]
+        others = prices[:, 0:pattern_strokes - 3:2]
+        last = prices[:, pattern_strokes]
+        with np.errstate(invalid='ignore'):
+            is_buy = (at_end & np.all(kinds[:, :-1] == up_down, axis=1) & (kinds[:, -1] == -1) &
+                      np.all(others >= pivot[:, None], axis=1) & (last >= pivot))
+            is_sell = (at_end & np.all(kinds[:, :-1] == -up_down, axis=1) & (kinds[:, -1] == 1) &
+                       np.all(others <= pivot[:, None], axis=1) & (last <= pivot))
+        return is_buy, is_sell
+
+    # ------------------------------------------------------------------
+    # 截面统计
+    # ------------------------------------------------------------------
+    def breadth(self, mask, eligible=None):
+        """
+        满足条件的标的比例
+
+        参数:
+            mask: (标的数, 时间数)的bool矩阵 → 每个时刻的比例（分母为该时刻有K线的标的）；
+                  长度为标的数的bool数组 → 一个比例（分母为eligible中的标的）
+            eligible: 参与统计的标的（bool数组），None时矩阵取valid、数组取有K线的标的
+        返回:
+            ndarray或float（没有可统计的标的时为NaN）
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if eligible is None:
+            eligible = self.valid if mask.ndim == 2 else self.valid.any(axis=1)
+        count = np.count_nonzero(eligible, axis=0)
+        hits = np.count_nonzero(mask & eligible, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, hits / np.maximum(count, 1), np.nan) if mask.ndim == 2 else (
+                hits / count if count else float('nan'))
+
+    def up_stroke_fraction(self, stroke_method="dp"):
+        """当前处于向上笔（最后一笔向上）的标的比例，分母为已有笔的标的"""
+        direction = self.stroke_direction(stroke_method)
+        return self.breadth(direction == 1, direction != 0)
+
+    def cross_section(self, pattern_strokes=4, stroke_method="dp"):
+        """
+        各标的当前状态汇总
+
+        返回:
+            DataFrame: 每个标的一行（symbol, last_time, close, strokes, direction, second_buy, second_sell, dif, hist）
+        """
+        dif, _, hist = self.macd()
+        is_buy, is_sell = self.second_buy_sell(pattern_strokes, stroke_method)
+        times = np.broadcast_to(self.times, self.shape)
+        return pd.DataFrame({
+            "symbol": self.symbols,
+            "last_time": self._last_value(times),
+            "close": self._last_value(self.fields["close"]),
+            "strokes": [max(len(item["rows"]) - 1, 0) for item in self.structure(stroke_method)],
+            "direction": self.stroke_direction(stroke_method),
+            "second_buy": is_buy,
+            "second_sell": is_sell,
+            "dif": self._last_value(dif),
+            "hist": self._last_value(hist),
+        })
+
+    def _last_value(self, matrix):
+        """内部函数：各标的最后一根K线处的值（没有K线为NaN）"""
+        values = np.full(len(self.symbols), np.nan)
+        has_bar = self.valid.any(axis=1)
+        if has_bar.any():
+            cols = self.valid.shape[1] - 1 - np.argmax(self.valid[:, ::-1], axis=1)
+            values[has_bar] = matrix[np.flatnonzero(has_bar), cols[has_bar]]
+        return values
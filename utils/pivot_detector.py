@@ -0,0 +1,221 @@
+# utils/pivot_detector.py
+from array import array
+from utils.stage_log import stage_print
+
+
+class Pivot:
+    """中枢视图：按行引用PivotTable中的数据，不复制"""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def zg(self):
+        return self.table.zg[self.row]      # 中枢上沿：前三笔高点的最小值
+    @property
+    def zd(self):
+        return self.table.zd[self.row]      # 中枢下沿：前三笔低点的最大值
+    @property
+    def gg(self):
+        return self.table.gg[self.row]      # 中枢区间内的最高点
+    @property
+    def dd(self):
+        return self.table.dd[self.row]      # 中枢区间内的最低点
+    @property
+    def begin(self):
+        return self.table.begin[self.row]   # 第一笔（段）序号
+    @property
+    def end(self):
+        return self.table.end[self.row]     # 最后一笔（段）序号
+    @property
+    def begin_time(self):
+        return self.table.begin_time[self.row]
+    @property
+    def end_time(self):
+        return self.table.end_time[self.row]
+    @property
+    def count(self):
+        return self.end - self.begin + 1
+    @property
+    def is_confirmed(self):
+        return bool(self.table.confirmed[self.row])
+
+    def __repr__(self):
+        status = "Confirmed" if self.is_confirmed else "Unconfirmed"
+        return f"<{status} Pivot | items {self.begin}~{self.end} | ZG={self.zg:.2f} ZD={self.zd:.2f} GG={self.gg:.2f} DD={self.dd:.2f}>"
+
+
+class PivotTable:
+    """中枢记录表：按列存储（array），行号即中枢序号，最后一行可能是未完成中枢"""
+    def __init__(self):
+        self.zg = array('d')
+        self.zd = array('d')
+        self.gg = array('d')
+        self.dd = array('d')
+        self.begin = array('q')
+        self.end = array('q')
+        self.begin_time = array('d')
+        self.end_time = array('d')
+        self.confirmed = array('b')
+
+    def __len__(self):
+        return len(self.zg)
+
+    def _pop(self):
+        for name in ("zg", "zd", "gg", "dd", "begin", "end", "begin_time", "end_time", "confirmed"):
+            getattr(self, name).pop()
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("中枢序号越界")
+        return Pivot(self, row)
+
+    def __iter__(self):
+        return (Pivot(self, row) for row in range(len(self)))
+
+    def _append(self, zg, zd, gg, dd, begin, end, begin_time, end_time):
+        self.zg.append(zg)
+        self.zd.append(zd)
+        self.gg.append(gg)
+        self.dd.append(dd)
+        self.begin.append(begin)
+        self.end.append(end)
+        self.begin_time.append(begin_time)
+        self.end_time.append(end_time)
+        self.confirmed.append(0)
+
+    def to_numpy(self):
+        """转换为numpy数组字典（需要安装numpy）"""
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                for name in ("zg", "zd", "gg", "dd", "begin", "end", "begin_time", "end_time", "confirmed")}
+
+
+class PivotTracker:
+    """
+    增量中枢识别：逐笔（或逐段）接收，每次O(1)更新ZG/ZD/GG/DD
+
+    - 连续三笔价格区间有重叠即形成中枢：ZG=三笔高点最小值，ZD=三笔低点最大值
+    - 后续笔与[ZD, ZG]有重叠则中枢延伸，GG/DD随之更新
+    - 某笔与中枢无重叠时中枢结束：前一笔为离开笔（不计入中枢），该笔为回抽笔，
+      回抽不回中枢即第三类买卖点；新中枢从回抽笔开始重新寻找
+    - 只有三笔的中枢，离开笔就是其第三笔：去掉后不足三笔，中枢不成立（撤销该行，不产生第三类买卖点），
+      按滑动窗口从第二笔起继续寻找
+    """
+    def __init__(self):
+        self.items = []
+        self.pivots = PivotTable()
+        self.third_points = []     # 第三类买卖点：(笔序号, 'buy'/'sell', 中枢序号)
+        self._window = []          # 形成中枢的候选笔序号（最多3个）
+        self._active = False       # 最后一行中枢是否仍在延伸
+        self._prev_extreme = None  # 加入最后一笔之前的(GG, DD)
+
+    @staticmethod
+    def _time(item, end=False):
+        fractal = item.end_fractal if end else item.start_fractal
+        return fractal.time
+
+    def push(self, item):
+        """
+        接收一笔（或一段），需有high/low和start_fractal/end_fractal属性
+
+        返回:
+            str或None: 'new'（形成新中枢）/'extend'（中枢延伸）/'leave'（中枢结束）/
+                       'cancel'（三笔中枢的第三笔即离开笔，中枢撤销）/None
+        """
+        i = len(self.items)
+        self.items.append(item)
+        table = self.pivots
+
+        if self._active:
+            row = len(table) - 1
+            if item.low < table.zg[row] and item.high > table.zd[row]:
+                self._prev_extreme = (table.gg[row], table.dd[row])
+                table.gg[row] = max(table.gg[row], item.high)
+                table.dd[row] = min(table.dd[row], item.low)
+                table.end[row] = i
+                table.end_time[row] = self._time(item, end=True)
+                return 'extend'
+
+            # 中枢结束：上一笔是离开笔，从中枢中剔除
+            if table.end[row] - table.begin[row] < 3:
+                # 三笔中枢剔除离开笔后不足三笔：中枢不成立，从第二笔起按滑动窗口继续寻找
+                table._pop()
+                self._active = False
+                self._window = [i - 2, i - 1]
+                return self._extend_window(i) or 'cancel'
+            table.gg[row], table.dd[row] = self._prev_extreme
+            table.end[row] = i - 2
+            table.end_time[row] = self._time(self.items[i - 2], end=True)
+            table.confirmed[row] = 1
+            self._active = False
+            if item.low > table.zg[row]:
+                self.third_points.append((i, 'buy', row))
+            elif item.high < table.zd[row]:
+                self.third_points.append((i, 'sell', row))
+            self._window = [i]
+            return 'leave'
+
+        return self._extend_window(i)
+
+    def _extend_window(self, i):
+        """内部函数：第i笔加入候选窗口，最近三笔有重叠时形成新中枢"""
+        table = self.pivots
+        item = self.items[i]
+        self._window.append(i)
+        if len(self._window) > 3:
+            self._window.pop(0)
+        if len(self._window) < 3:
+            return None
+        window_items = [self.items[j] for j in self._window]
+        zg = min(x.high for x in window_items)
+        zd = max(x.low for x in window_items)
+        if zg <= zd:
+            return None
+        table._append(zg, zd,
+                      max(x.high for x in window_items), min(x.low for x in window_items),
+                      self._window[0], i,
+                      self._time(window_items[0]), self._time(item, end=True))
+        self._prev_extreme = None
+        self._active = True
+        self._window = []
+        return 'new'
+
+    def trend(self):
+        """
+        根据最后两个中枢判断走势类型
+
+        返回:
+            str: 'up'（上涨趋势）/'down'（下跌趋势）/'consolidation'（盘整）/None（尚无中枢）
+        """
+        table = self.pivots
+        if len(table) == 0:
+            return None
+        if len(table) == 1:
+            return 'consolidation'
+        prev, last = table[-2], table[-1]
+        if last.dd > prev.gg:
+            return 'up'
+        if last.gg < prev.dd:
+            return 'down'
+        return 'consolidation'
+
+
+def detect_pivots(items):
+    """
+    对外暴露的中枢识别函数
+
+    参数:
+        items: 笔列表（Stroke对象）或线段列表（Segment对象）
+    返回:
+        PivotTracker: 含pivots（PivotTable）与third_points
+    """
+    tracker = PivotTracker()
+    for item in items:
+        tracker.push(item)
+    stage_print(f"[中枢识别] 共识别 {len(tracker.pivots)} 个中枢，第三类买卖点 {len(tracker.third_points)} 个")
+    return tracker
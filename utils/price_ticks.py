@@ -0,0 +1,80 @@
+# utils/price_ticks.py
+from decimal import Decimal
+import numpy as np
+
+
+# 价格的定点整数表示：price = ticks * tick_size，ticks为int64。
+# 以最小变动价位为单位后，K线合并、分型中的大小比较都是精确的整数比较，不再依赖1e-5阈值
+# （价格很大或最小变动价位小于1e-5的品种按阈值比较会误判）
+
+# 常见品种的最小变动价位（按品种代码字母部分查找，如rb2601 → rb；可自行补充）
+TICK_SIZES = {
+    "rb": 1.0, "hc": 1.0, "i": 0.5, "j": 0.5, "jm": 0.5,
+    "au": 0.02, "ag": 1.0, "cu": 10.0, "al": 5.0, "zn": 5.0,
+    "ec": 0.1, "sc": 0.1, "m": 1.0, "y": 2.0, "p": 2.0,
+    "IF": 0.2, "IH": 0.2, "IC": 0.2, "IM": 0.2,
+}
+
+
+def decimals_of(tick_size):
+    """最小变动价位的小数位数（如0.02 → 2，5 → 0）"""
+    return max(0, -Decimal(str(tick_size)).normalize().as_tuple().exponent)
+
+
+def tick_size_of(symbol, default=None):
+    """
+    由标的代码查找最小变动价位（如"113.rb2601"、"rb2601" → 1.0），查不到返回default
+    """
+    code = symbol.rsplit(".", 1)[-1]
+    letters = code.rstrip("0123456789")
+    return TICK_SIZES.get(letters, TICK_SIZES.get(letters.lower(), default))
+
+
+def infer_tick_size(prices, max_decimals=6, tol=0.01):
+    """
+    由价格序列推断最小变动价位：先确定价格的小数位数d，再取按d位小数取整后全部价格的最大公约数
+
+    d为使全部价格与10^-d网格的偏差都不超过网格间距tol倍的最小位数（不超过max_decimals），
+    浮点误差（如4012.3999999或经过计算的价格）不会让推断值退化为10^-max_decimals。
+    只适合数据本身落在价格网格上的情形（如交易所行情），复权价等连续价格应显式给出tick_size
+    """
+    prices = np.asarray(prices, dtype='f8')
+    if not len(prices):
+        return 1.0
+    for decimals in range(max_decimals + 1):
+        scaled = prices * 10 ** decimals
+        units = np.rint(scaled)
+        if np.abs(scaled - units).max() <= tol:
+            break
+    step = int(np.gcd.reduce(np.abs(units.astype('i8'))))
+    if step == 0:
+        return 1.0
+    return round(step / 10 ** decimals, decimals)
+
+
+def to_ticks(prices, tick_size):
+    """价格 → int64最小变动价位数（四舍五入到最近的网格点）"""
+    return np.rint(np.asarray(prices, dtype='f8') / tick_size).astype('i8')
+
+
+def from_ticks(ticks, tick_size):
+    """int64最小变动价位数 → 价格（按tick_size的小数位数取整，同一网格点总是得到同一个浮点数）"""
+    return np.round(np.asarray(ticks, dtype='i8') * tick_size, decimals_of(tick_size))
+
+
+def resolve_tick_size(tick_size, kline_list=None):
+    """
+    tick_size参数的统一解析：数值原样返回；"auto"时由最高/最低价推断，
+    若按标的代码查到的最小变动价位（TICK_SIZES）与数据一致（推断值为其整数倍）则取查表值
+    """
+    if tick_size != "auto":
+        return float(tick_size)
+    if not kline_list:
+        return 1.0
+    inferred = infer_tick_size([k.high for k in kline_list] + [k.low for k in kline_list])
+    found = tick_size_of(getattr(kline_list[0], "symbol", "") or "")
+    if found is not None:
+        ratio = inferred / found
+        if ratio >= 1 and abs(ratio - round(ratio)) < 1e-6:
+            return found
+    return inferred
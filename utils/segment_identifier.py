@@ -0,0 +1,238 @@
+# utils/segment_identifier.py
+from core.Chan_base import Segment
+from utils.stage_log import stage_print
+
+
+class _FeatureSequence:
+    """
+    内部类：线段的特征序列（向上线段取向下笔，向下线段取向上笔）
+
+    每个元素为[high, low, stroke_index, raw_high, raw_low]，入列时即按线段方向处理包含关系：
+    向上线段取高高，向下线段取低低；stroke_index记录极值所在的笔（即线段可能的终点）。
+    分型的第一、二元素之间不做包含处理：创出新极值的元素总是新起一个元素（它可能是分型顶点），
+    包含处理只把之后被包含的元素并入；缺口按顶点元素合并前的价格（raw_high/raw_low）判断
+    """
+    __slots__ = ("direction", "elements")
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.elements = []
+
+    def push(self, stroke_index, high, low):
+        elements = self.elements
+        if elements:
+            last = elements[-1]
+            if (high <= last[0] and low >= last[1]) or (high >= last[0] and low <= last[1]):
+                if self.direction == 'up' and high <= last[0]:
+                    last[1] = max(last[1], low)
+                    return
+                if self.direction == 'down' and low >= last[1]:
+                    last[0] = min(last[0], high)
+                    return
+        elements.append([high, low, stroke_index, high, low])
+
+    def fractal(self):
+        """
+        检查最后三个元素是否构成分型（向上线段找顶分型，向下线段找底分型）
+
+        返回:
+            tuple或None: (分型顶点所在笔的序号, 第一二元素间是否有缺口)
+        """
+        if len(self.elements) < 3:
+            return None
+        e1, e2, e3 = self.elements[-3:]
+        if self.direction == 'up':
+            if e2[0] > e1[0] and e2[0] > e3[0]:
+                return e2[2], e2[4] > e1[0]
+        else:
+            if e2[1] < e1[1] and e2[1] < e3[1]:
+                return e2[2], e2[3] < e1[1]
+        return None
+
+
+class SegmentBuilder:
+    """
+    增量线段识别器：逐笔接收Stroke，用特征序列分型划分线段，总耗时与笔数成线性
+
+    - 第一种情况（特征序列分型第一、二元素间无缺口）：分型出现即确认线段在顶点结束
+    - 第二种情况（有缺口）：需从顶点开始的反向特征序列出现反向分型才确认；
+      在此之前若价格突破顶点，则原线段延续
+    - 线段结束后，新线段从顶点所在笔开始，只需重新处理顶点之后的少量笔
+    - 最后一笔被修正时（如IncrementalChan中未确认的最后一笔延伸）用replace_last或pop后重新push；
+      sync按新的笔列表只重做有变化的尾部。撤销一笔需从当前线段首笔重新处理，耗时与当前线段的笔数成正比
+    """
+    def __init__(self):
+        self.strokes = []
+        self.segments = []      # 已确认线段
+        self._bounds = []       # 各已确认线段的(终点笔序号, 确认时处理到的笔序号)，pop时据此撤销
+        self._start = None      # 当前线段首笔序号
+        self._seq = None        # 当前线段的特征序列
+        self._pending = None    # 第二种情况待确认：(顶点笔序号, 顶点价格, 反向特征序列)
+
+    def _begin(self, index):
+        """内部函数：从第index笔开始新线段"""
+        self._start = index
+        self._seq = _FeatureSequence(self.strokes[index].direction)
+        self._pending = None
+
+    def _finish(self, end_index):
+        """内部函数：当前线段在第end_index笔起点处结束，新线段从该笔开始"""
+        segment = Segment(self.strokes[self._start:end_index])
+        segment.is_confirmed = True
+        self._begin(end_index)
+        return segment
+
+    def _process(self, i):
+        """内部函数：从第i笔起依次处理到最后一笔，返回期间确认的线段"""
+        confirmed = []
+        while i < len(self.strokes):
+            end_index = self._feed(i)
+            if end_index is None:
+                i += 1
+            else:
+                # 线段结束后，从新线段首笔之后重新处理
+                self._bounds.append((end_index, i))
+                confirmed.append(self._finish(end_index))
+                i = end_index + 1
+        self.segments.extend(confirmed)
+        return confirmed
+
+    def _feed(self, i):
+        """
+        内部函数：处理第i笔
+
+        返回:
+            int或None: 当前线段被确认结束时，返回终点（顶点）所在笔的序号
+        """
+        stroke = self.strokes[i]
+        if self._seq is None:
+            self._begin(i)
+            return None
+        direction = self._seq.direction
+
+        if stroke.direction == direction:
+            # 与线段同向的笔：检查第二种情况是否被突破
+            if self._pending is not None:
+                peak_index, peak_price, reverse_seq = self._pending
+                broken = stroke.high > peak_price if direction == 'up' else stroke.low < peak_price
+                if broken:
+                    self._pending = None
+                else:
+                    reverse_seq.push(i, stroke.high, stroke.low)
+                    if reverse_seq.fractal() is not None:
+                        return peak_index
+            return None
+
+        # 特征序列元素
+        self._seq.push(i, stroke.high, stroke.low)
+        if self._pending is not None:
+            return None
+        result = self._seq.fractal()
+        if result is None:
+            return None
+        peak_index, has_gap = result
+        if not has_gap:
+            return peak_index
+
+        peak_stroke = self.strokes[peak_index]
+        peak_price = peak_stroke.high if direction == 'up' else peak_stroke.low
+        reverse_seq = _FeatureSequence('down' if direction == 'up' else 'up')
+        self._pending = (peak_index, peak_price, reverse_seq)
+        for j in range(peak_index + 1, i + 1):
+            if self.strokes[j].direction == direction:
+                reverse_seq.push(j, self.strokes[j].high, self.strokes[j].low)
+        if reverse_seq.fractal() is not None:
+            return peak_index
+        return None
+
+    def push(self, stroke):
+        """
+        接收一笔
+
+        参数:
+            stroke: Stroke对象（需与上一笔首尾相接、方向交替）
+        返回:
+            list: 本次新确认的线段
+        """
+        self.strokes.append(stroke)
+        return self._process(len(self.strokes) - 1)
+
+    def pop(self):
+        """
+        撤销最后一笔：由该笔确认的线段一并撤销，当前线段从首笔起重新处理
+
+        返回:
+            Stroke: 被撤销的笔
+        """
+        if not self.strokes:
+            raise IndexError("没有可撤销的笔")
+        stroke = self.strokes.pop()
+        n = len(self.strokes)
+        while self._bounds and self._bounds[-1][1] >= n:
+            self._bounds.pop()
+            self.segments.pop()
+        start = self._bounds[-1][0] if self._bounds else 0
+        self._start = self._seq = self._pending = None
+        # 剩余各笔的处理结果与撤销前相同，重新处理不会确认新的线段
+        self._process(start)
+        return stroke
+
+    def replace_last(self, stroke):
+        """
+        用新版本替换最后一笔（如最后一笔延伸到新的分型）
+
+        返回:
+            list: 替换后新确认的线段
+        """
+        if self.strokes:
+            self.pop()
+        return self.push(stroke)
+
+    def sync(self, strokes):
+        """
+        与新的笔列表同步：撤销与strokes不一致的尾部各笔，再接收其余部分
+        （按起止分型时间比较，适合每根K线后传入IncrementalChan.strokes）
+
+        返回:
+            list: 本次新确认的线段
+        """
+        def same(a, b):
+            return a is b or (a.start_fractal.time == b.start_fractal.time and a.end_fractal.time == b.end_fractal.time)
+
+        keep = 0
+        limit = min(len(self.strokes), len(strokes))
+        while keep < limit and same(self.strokes[keep], strokes[keep]):
+            keep += 1
+        while len(self.strokes) > keep:
+            self.pop()
+        confirmed = []
+        for stroke in strokes[keep:]:
+            confirmed.extend(self.push(stroke))
+        return confirmed
+
+    @property
+    def current_segment(self):
+        """尚未确认的最后一段（未确认线段），不足3笔时为None"""
+        if self._start is None or len(self.strokes) - self._start < 3:
+            return None
+        return Segment(self.strokes[self._start:])
+
+
+def identify_segments(strokes):
+    """
+    对外暴露的线段识别函数：基于笔序列划分线段
+
+    参数:
+        strokes: 笔列表（Stroke对象，identify_strokes返回值）
+    返回:
+        list: 线段列表（Segment对象），最后一段可能未确认
+    """
+    builder = SegmentBuilder()
+    for stroke in strokes:
+        builder.push(stroke)
+    segments = list(builder.segments)
+    current = builder.current_segment
+    if current is not None:
+        segments.append(current)
+    stage_print(f"[线段识别] 共识别 {len(segments)} 段（已确认 {len(builder.segments)} 段）")
+    return segments
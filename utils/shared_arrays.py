@@ -0,0 +1,182 @@
+# utils/shared_arrays.py
+import os
+import shutil
+import tempfile
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+from utils.bar_array import BAR_DTYPE, klines_to_array, array_to_klines
+
+
+class SharedArrayHandle:
+    """
+    共享数组的句柄：只含名称、数据类型和形状，传给工作进程的开销与数组大小无关
+
+    kind: "shm"（multiprocessing.shared_memory）或"mmap"（内存映射文件，name为文件路径）
+    """
+    __slots__ = ("kind", "name", "dtype", "shape")
+
+    def __init__(self, kind, name, dtype, shape):
+        self.kind = kind
+        self.name = name
+        self.dtype = dtype          # np.dtype的描述（dtype.descr或字符串），可直接传给np.dtype
+        self.shape = tuple(shape)
+
+    def __getstate__(self):
+        return (self.kind, self.name, self.dtype, self.shape)
+
+    def __setstate__(self, state):
+        self.kind, self.name, self.dtype, self.shape = state
+
+    def __repr__(self):
+        return f"SharedArrayHandle({self.kind}, {self.name}, shape={self.shape})"
+
+    def open(self):
+        """在当前进程打开数组（只读视图，同一进程内重复打开复用同一映射）"""
+        return open_shared(self)
+
+
+# 当前进程已打开的共享数组：名称 → (SharedMemory或None, 数组)
+_attached = {}
+
+
+def _dtype_of(descr):
+    return np.dtype(descr if isinstance(descr, str) else [tuple(field) for field in descr])
+
+
+def open_shared(handle):
+    """由句柄打开共享数组（工作进程中调用；返回只读视图）"""
+    entry = _attached.get(handle.name)
+    if entry is not None:
+        return entry[1]
+    dtype = _dtype_of(handle.dtype)
+    count = int(np.prod(handle.shape))
+    if handle.kind == "shm":
+        shm = shared_memory.SharedMemory(name=handle.name)
+        array = np.ndarray(handle.shape, dtype=dtype, buffer=shm.buf) if count else np.empty(handle.shape, dtype=dtype)
+    elif handle.kind == "mmap":
+        shm = None
+        array = np.memmap(handle.name, dtype=dtype, mode="r", shape=handle.shape) if count else np.empty(handle.shape, dtype=dtype)
+    else:
+        raise ValueError(f"未知的共享方式：{handle.kind}")
+    array.flags.writeable = False
+    _attached[handle.name] = (shm, array)
+    return array
+
+
+def release_shared(handle=None):
+    """
+    关闭当前进程中已打开的共享数组（handle为None时关闭全部），不删除共享内存本身；
+    调用前须已不再引用open_shared返回的数组
+    """
+    names = [handle.name] if handle is not None else list(_attached)
+    for name in names:
+        entry = _attached.pop(name, None)
+        if entry is not None and entry[0] is not None:
+            shm = entry[0]
+            del entry       # 先释放数组视图，否则close会因缓冲区仍被引用而失败
+            shm.close()
+
+
+def _cleanup(segments, directory):
+    """内部函数：删除共享内存段和内存映射目录（weakref.finalize回调，对象回收或解释器退出时执行）"""
+    for shm in segments:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    segments.clear()
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class SharedArrays:
+    """
+    共享数组的持有者：把数组复制到共享内存（或内存映射文件），工作进程只接收句柄
+
+    - mode="shm"：multiprocessing.shared_memory；mode="mmap"：directory（默认临时目录）下的定长文件
+    - close()（或with语句结束、对象被回收、解释器退出）时删除全部共享段；
+      进程被强制结束时，shared_memory段由multiprocessing的resource_tracker兜底清理
+    - 只有创建者负责删除，工作进程用open_shared/handle.open()打开，无需清理
+
+    用法:
+        with SharedArrays() as shared:
+            handles = {s: shared.put_bars(s, klines) for s, klines in data.items()}
+            executor.map(worker, handles.values())   # worker中: bars = handle.open()
+    """
+    def __init__(self, mode="shm", directory=None):
+        if mode not in ("shm", "mmap"):
+            raise ValueError(f"未知的共享方式：{mode}")
+        self.mode = mode
+        self.handles = {}
+        self._segments = []
+        self._directory = None
+        if mode == "mmap":
+            self._directory = tempfile.mkdtemp(prefix="easychan_", dir=directory)
+        self._finalizer = weakref.finalize(self, _cleanup, self._segments, self._directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.handles)
+
+    def put(self, key, array):
+        """
+        复制数组到共享区
+
+        返回:
+            SharedArrayHandle
+        """
+        if not self._finalizer.alive:
+            raise RuntimeError("SharedArrays已关闭")
+        array = np.ascontiguousarray(array)
+        dtype = array.dtype.descr if array.dtype.names else array.dtype.str
+        if self.mode == "shm":
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._segments.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            handle = SharedArrayHandle("shm", shm.name, dtype, array.shape)
+        else:
+            path = os.path.join(self._directory, f"{len(self.handles)}.bin")
+            with open(path, "wb") as f:
+                f.write(array.tobytes())
+            handle = SharedArrayHandle("mmap", path, dtype, array.shape)
+        self.handles[key] = handle
+        return handle
+
+    def put_bars(self, key, bars):
+        """共享一个标的的K线（KLine列表或BAR_DTYPE数组）"""
+        if not isinstance(bars, np.ndarray):
+            bars = klines_to_array(bars)
+        return self.put(key, bars.astype(BAR_DTYPE, copy=False))
+
+    def put_fractal_table(self, key, table):
+        """
+        共享分型表的数组（kind/mid/price/reach及合并K线highs/lows）
+
+        返回:
+            dict: 列名 → SharedArrayHandle（可整体传给工作进程，用open_columns打开）
+        """
+        columns = {"kind": table.kind, "mid": table.mid, "price": table.price, "reach": table.reach,
+                   "highs": table.highs, "lows": table.lows}
+        return {name: self.put((key, name), column) for name, column in columns.items()}
+
+    def close(self):
+        """删除全部共享段（可重复调用）"""
+        self._finalizer()
+        self.handles.clear()
+
+
+def open_columns(handles):
+    """{列名: 句柄} → {列名: 数组}"""
+    return {name: open_shared(handle) for name, handle in handles.items()}
+
+
+def open_bars(handle, symbol=""):
+    """在工作进程中由K线句柄重建KLine列表"""
+    return array_to_klines(open_shared(handle), symbol)
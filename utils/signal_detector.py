@@ -0,0 +1,50 @@
+# utils/signal_detector.py
+
+
+def detect_second_buy_sell(combined_klines, top_fractals, bottom_fractals, strokes, pattern_strokes=4):
+    """
+    判断当前（最后一根合并K线处）是否出现二买/二卖点，默认规则与twobuytwosale_v2.py一致：
+    最后一笔的终点分型以最后一根合并K线为右侧K线，且最后4笔满足二买/二卖的形态
+
+    参数:
+        combined_klines: 合并后的stCombineK对象列表
+        top_fractals: 顶分型列表
+        bottom_fractals: 底分型列表
+        strokes: 笔列表（Stroke对象）
+        pattern_strokes: 形态的笔数（不小于4的偶数）。二买：最后pattern_strokes笔上下交替、以向下笔结束，
+                         且倒数第二笔的起点（一买低点）不高于形态内其余各笔的底；二卖反之
+    返回:
+        tuple: (is_second_buy, is_second_sell)
+    """
+    if pattern_strokes < 4 or pattern_strokes % 2:
+        raise ValueError(f"pattern_strokes须为不小于4的偶数：{pattern_strokes}")
+    if len(combined_klines) < 3 or len(strokes) < pattern_strokes:
+        return False, False
+
+    last_index = combined_klines[-1].index
+    # 最后一笔的终点必须是最后一个分型
+    if strokes[-1].end_point.index != last_index:
+        return False, False
+
+    last_top_fractal = top_fractals[-1] if top_fractals else None
+    last_bottom_fractal = bottom_fractals[-1] if bottom_fractals else None
+    is_bottom_fractal = bool(last_bottom_fractal) and last_index == last_bottom_fractal.end_index
+    is_top_fractal = bool(last_top_fractal) and last_index == last_top_fractal.end_index
+
+    pattern = strokes[-pattern_strokes:]
+    directions = [stroke.direction for stroke in pattern]
+    pivot = pattern[-2].start_fractal
+
+    # 二买点：上-下-...-上-下，且各次回落的低点均不破一买低点
+    is_second_buy = (is_bottom_fractal and
+                     directions == ['up', 'down'] * (pattern_strokes // 2) and
+                     all(stroke.start_fractal.low >= pivot.low for stroke in pattern[0:-2:2]) and
+                     pattern[-1].end_fractal.low >= pivot.low)
+
+    # 二卖点：下-上-...-下-上，且各次反弹的高点均不破一卖高点
+    is_second_sell = (is_top_fractal and
+                      directions == ['down', 'up'] * (pattern_strokes // 2) and
+                      all(stroke.start_fractal.high <= pivot.high for stroke in pattern[0:-2:2]) and
+                      pattern[-1].end_fractal.high <= pivot.high)
+
+    return is_second_buy, is_second_sell
@@ -0,0 +1,142 @@
+# utils/snapshot.py
+import json
+import os
+import struct
+import time
+import numpy as np
+from utils.bar_array import BAR_DTYPE
+from utils.incremental_chan import IncrementalChan, STATE_COMBINED_DTYPE, STATE_FRACTAL_DTYPE, STATE_STROKE_DTYPE
+
+
+# 快照文件格式：
+#   MAGIC(8字节) | 版本号(uint32) | 头部长度(uint32) | 头部JSON(utf-8) | 各数据段
+# 头部记录各标的的记录数与笔缓存标识；数据段依次为klines/combined/fractals/strokes，
+# 每段为全部标的该类记录（定长结构化数组）按标的顺序首尾相接
+MAGIC = b"ECSNAP\x00\x00"
+VERSION = 1
+_SECTIONS = {
+    "klines": BAR_DTYPE,
+    "combined": STATE_COMBINED_DTYPE,
+    "fractals": STATE_FRACTAL_DTYPE,
+    "strokes": STATE_STROKE_DTYPE,
+}
+_PREFIX = struct.Struct("<8sII")
+
+
+def _dtype_descr(dtype):
+    return [[name, dtype.fields[name][0].str] for name in dtype.names]
+
+
+class SnapshotWriter:
+    """
+    快照写入器：保存多个增量分析器的状态，适合定时调用
+
+    两次写入之间，已固定的原始K线、合并K线和确认分型直接复用上次的编码结果，
+    每次写入只编码新增部分（见IncrementalChan.export_state）；文件先写临时文件再替换，写入中断不会损坏旧快照
+    """
+    def __init__(self, path):
+        self.path = path
+        self._states = {}       # 标的 → 上次导出的状态
+
+    def write(self, analyzers, meta=None):
+        """
+        写入快照
+
+        参数:
+            analyzers: {标的: IncrementalChan}
+            meta: 附加信息（可JSON序列化），随快照保存
+        返回:
+            int: 写入的字节数
+        """
+        states = {symbol: chan.export_state(self._states.get(symbol)) for symbol, chan in analyzers.items()}
+        self._states = states
+
+        header = {
+            "created": time.time(),
+            "meta": meta,
+            "dtypes": {name: _dtype_descr(dtype) for name, dtype in _SECTIONS.items()},
+            "symbols": [
+                dict({"symbol": symbol, "strokes_key": state["strokes_key"]},
+                     **{name: len(state[name]) for name in _SECTIONS})
+                for symbol, state in states.items()
+            ],
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+        tmp_path = self.path + ".tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            size += f.write(_PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            size += f.write(header_bytes)
+            for name in _SECTIONS:
+                for state in states.values():
+                    size += f.write(state[name].tobytes())
+        os.replace(tmp_path, self.path)
+        return size
+
+
+def save_snapshot(analyzers, path, meta=None):
+    """保存{标的: IncrementalChan}的快照（一次性写入，定时写入请用SnapshotWriter）"""
+    return SnapshotWriter(path).write(analyzers, meta)
+
+
+def read_snapshot_header(path):
+    """读取快照头部（不读取数据段）"""
+    with open(path, "rb") as f:
+        header, _ = _read_header(f)
+    return header
+
+
+def _read_header(f):
+    """内部函数：校验文件标识与版本并读取头部，返回(头部, 数据段起始位置)"""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise ValueError("快照文件不完整")
+    magic, version, header_len = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("不是easyChan快照文件")
+    if version != VERSION:
+        raise ValueError(f"不支持的快照版本：{version}（当前版本 {VERSION}）")
+    header = json.loads(f.read(header_len).decode("utf-8"))
+    for name, dtype in _SECTIONS.items():
+        if header["dtypes"].get(name) != _dtype_descr(dtype):
+            raise ValueError(f"快照中{name}的记录格式与当前版本不一致")
+    return header, _PREFIX.size + header_len
+
+
+def load_snapshot(path, symbols=None):
+    """
+    读取快照，重建增量分析器
+
+    参数:
+        path: 快照文件路径
+        symbols: 只恢复其中部分标的（None为全部）
+    返回:
+        tuple: ({标的: IncrementalChan}, meta)
+    """
+    with open(path, "rb") as f:
+        header, _ = _read_header(f)
+        data = f.read()
+
+    # 各数据段内按标的顺序切片
+    sections = {}
+    pos = 0
+    for name, dtype in _SECTIONS.items():
+        total = sum(entry[name] for entry in header["symbols"])
+        sections[name] = np.frombuffer(data, dtype=dtype, count=total, offset=pos)
+        pos += total * dtype.itemsize
+
+    wanted = set(symbols) if symbols is not None else None
+    starts = dict.fromkeys(_SECTIONS, 0)
+    analyzers = {}
+    for entry in header["symbols"]:
+        symbol = entry["symbol"]
+        state = {}
+        for name in _SECTIONS:
+            state[name] = sections[name][starts[name]:starts[name] + entry[name]]
+            starts[name] += entry[name]
+        if wanted is not None and symbol not in wanted:
+            continue
+        state["strokes_key"] = entry["strokes_key"]
+        analyzers[symbol] = IncrementalChan.restore_state(state, symbol)
+    return analyzers, header["meta"]
@@ -0,0 +1,38 @@
+# utils/stage_log.py
+import contextlib
+import contextvars
+
+
+# 各阶段（分型、必经点、笔等）进度与警告输出的开关。
+# quiet()只作用于当前线程/协程的上下文（不替换sys.stdout），多线程服务中互不影响；
+# 新线程不继承上下文，线程池中需要沿用时用contextvars.copy_context().run提交任务
+_verbose = contextvars.ContextVar("easychan_verbose", default=None)
+_default_verbose = True
+
+
+def set_verbose(enabled):
+    """设置全局默认（未处于quiet/verbose上下文时生效）"""
+    global _default_verbose
+    _default_verbose = bool(enabled)
+
+
+def is_verbose():
+    """当前上下文是否输出各阶段信息"""
+    value = _verbose.get()
+    return _default_verbose if value is None else value
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """在当前上下文中屏蔽（enabled为False时恢复）各阶段的输出"""
+    token = _verbose.set(not enabled)
+    try:
+        yield
+    finally:
+        _verbose.reset(token)
+
+
+def stage_print(*args, **kwargs):
+    """各阶段的输出：参数同print，当前上下文屏蔽输出时不打印"""
+    if is_verbose():
+        print(*args, **kwargs)
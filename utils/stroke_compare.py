@@ -0,0 +1,178 @@
+# utils/stroke_compare.py
+import time
+import pandas as pd
+from utils.kline_combiner import combine_kline
+from utils.fractal_table import detect_fractal_table
+from utils.necessary_point_finder import find_all_necessary_points_from_table
+from utils.stroke_identifier import identify_strokes, identify_strokes_greedy
+from utils.data_loader import load_klines, symbol_from_path
+from utils.stage_log import quiet
+
+
+def _endpoints(strokes):
+    """内部函数：笔序列 → 端点列表[(中间合并K线序号, 分型类型, 时间, 价格)]"""
+    fractals = [strokes[0].start_fractal] + [s.end_fractal for s in strokes] if strokes else []
+    return [(f.combined_klines[1].index, f.fractal_type, f.time, f.price) for f in fractals]
+
+
+def diff_strokes(strokes_a, strokes_b):
+    """
+    比较两组笔（如identify_strokes与identify_strokes_greedy的结果）
+
+    以两边共有的端点为锚，相邻锚点之间两边端点不一致的区间记为一个分歧区间
+
+    返回:
+        dict:
+            strokes_a/strokes_b: 笔数
+            common_strokes: 起止端点均相同的笔数
+            common_endpoints: 共有端点数
+            endpoint_jaccard: 端点集合的Jaccard相似度（两边都为空时为1.0）
+            regions: 分歧区间列表，每项含begin_mid/end_mid（锚点的中间K线序号，-1/None表示序列首尾）、
+                     begin_time/end_time、a/b（区间内各自的端点[(mid, type, time, price)]）
+    """
+    ends_a, ends_b = _endpoints(strokes_a), _endpoints(strokes_b)
+    mids_a = {e[0] for e in ends_a}
+    mids_b = {e[0] for e in ends_b}
+    common = mids_a & mids_b
+    pairs_a = {(s.start_fractal.combined_klines[1].index, s.end_fractal.combined_klines[1].index) for s in strokes_a}
+    pairs_b = {(s.start_fractal.combined_klines[1].index, s.end_fractal.combined_klines[1].index) for s in strokes_b}
+    union = mids_a | mids_b
+
+    # 按锚点切分两边端点，逐段比较
+    regions = []
+    anchors = [None] + sorted(common) + [None]
+    times = {e[0]: e[2] for e in ends_a + ends_b}
+    pos_a = pos_b = 0
+    for begin, end in zip(anchors, anchors[1:]):
+        part_a, part_b = [], []
+        while pos_a < len(ends_a) and (end is None or ends_a[pos_a][0] < end):
+            if ends_a[pos_a][0] != begin:
+                part_a.append(ends_a[pos_a])
+            pos_a += 1
+        while pos_b < len(ends_b) and (end is None or ends_b[pos_b][0] < end):
+            if ends_b[pos_b][0] != begin:
+                part_b.append(ends_b[pos_b])
+            pos_b += 1
+        if part_a or part_b:
+            regions.append({
+                "begin_mid": -1 if begin is None else begin,
+                "end_mid": end,
+                "begin_time": times.get(begin),
+                "end_time": times.get(end),
+                "a": part_a,
+                "b": part_b,
+            })
+
+    return {
+        "strokes_a": len(strokes_a),
+        "strokes_b": len(strokes_b),
+        "common_strokes": len(pairs_a & pairs_b),
+        "common_endpoints": len(common),
+        "endpoint_jaccard": len(common) / len(union) if union else 1.0,
+        "regions": regions,
+    }
+
+
+def compare_stroke_methods(kline_list, backend=None, min_gap=3):
+    """
+    对同一组K线分别用必经点 + 动态规划（identify_strokes）和单遍贪心（identify_strokes_greedy）识别笔，
+    合并K线与分型表两种方式共用
+
+    返回:
+        dict: diff_strokes的结果（a为dp，b为greedy），另含dp_seconds/greedy_seconds（笔识别耗时，dp含必经点查找）、
+              dp/greedy（笔列表）
+    """
+    combined = combine_kline(kline_list, backend=backend or "auto")
+    table = detect_fractal_table(combined, backend=backend)
+    table.reach    # 两种方式共用，不计入耗时
+
+    with quiet(True):
+        start = time.perf_counter()
+        necessary_points = find_all_necessary_points_from_table(table, min_gap)
+        dp = identify_strokes(combined, necessary_points, None, None, fractal_table=table, min_gap=min_gap)
+        dp_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        greedy = identify_strokes_greedy(combined, table, min_gap)
+        greedy_seconds = time.perf_counter() - start
+
+    result = diff_strokes(dp, greedy)
+    result.update(dp_seconds=dp_seconds, greedy_seconds=greedy_seconds, dp=dp, greedy=greedy)
+    return result
+
+
+def compare_universe(sources, backend=None, min_gap=3, verbose=False):
+    """
+    多标的的两种笔识别方式对比汇总
+
+    参数:
+        sources: {标的: KLine列表}，或CSV文件路径列表（标的取文件名）
+    返回:
+        DataFrame: 每个标的一行（symbol, dp_strokes, greedy_strokes, common_strokes, endpoint_jaccard,
+                   regions, dp_seconds, greedy_seconds）
+    """
+    if not isinstance(sources, dict):
+        sources = {symbol_from_path(path): path for path in sources}
+    rows = []
+    for symbol, source in sources.items():
+        kline_list = load_klines(source, symbol) if isinstance(source, str) else source
+        result = compare_stroke_methods(kline_list, backend, min_gap)
+        rows.append({
+            "symbol": symbol,
+            "dp_strokes": result["strokes_a"],
+            "greedy_strokes": result["strokes_b"],
+            "common_strokes": result["common_strokes"],
+            "endpoint_jaccard": result["endpoint_jaccard"],
+            "regions": len(result["regions"]),
+            "dp_seconds": result["dp_seconds"],
+            "greedy_seconds": result["greedy_seconds"],
+        })
+        if verbose:
+            print(f"[笔对比] {symbol}：dp {result['strokes_a']} 笔，贪心 {result['strokes_b']} 笔，"
+                  f"端点一致率 {result['endpoint_jaccard']:.1%}，分歧区间 {len(result['regions'])} 个")
+    return pd.DataFrame(rows, columns=["symbol", "dp_strokes", "greedy_strokes", "common_strokes", "endpoint_jaccard",
+                                       "regions", "dp_seconds", "greedy_seconds"])
+
+
+def stroke_diff_report(result, max_regions=20):
+    """
+    把compare_stroke_methods的结果整理为可读文本
+
+    参数:
+        max_regions: 最多列出的分歧区间数
+    返回:
+        str
+    """
+    lines = [
+        f"[笔对比] 必经点+动态规划：{result['strokes_a']} 笔，耗时 {result.get('dp_seconds', 0.0):.3f}s",
+        f"[笔对比] 单遍贪心：{result['strokes_b']} 笔，耗时 {result.get('greedy_seconds', 0.0):.3f}s",
+        f"[笔对比] 相同的笔 {result['common_strokes']} 笔，共有端点 {result['common_endpoints']} 个，"
+        f"端点一致率 {result['endpoint_jaccard']:.1%}，分歧区间 {len(result['regions'])} 个",
+    ]
+
+    def fmt(ends):
+        return "、".join(f"{'顶' if kind == 'top' else '底'}{price:.10g}@{pd.to_datetime(t, unit='s'):%Y-%m-%d %H:%M}"
+                        for _, kind, t, price in ends) or "无"
+
+    for region in result["regions"][:max_regions]:
+        begin = "开头" if region["begin_time"] is None else f"{pd.to_datetime(region['begin_time'], unit='s'):%Y-%m-%d %H:%M}"
+        end = "结尾" if region["end_time"] is None else f"{pd.to_datetime(region['end_time'], unit='s'):%Y-%m-%d %H:%M}"
+        lines.append(f"  {begin} ~ {end}：dp端点 {fmt(region['a'])}；贪心端点 {fmt(region['b'])}")
+    if len(result["regions"]) > max_regions:
+        lines.append(f"  ……另有 {len(result['regions']) - max_regions} 个分歧区间")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="比较必经点+动态规划与单遍贪心两种笔识别方式")
+    parser.add_argument("paths", nargs="+", help="K线CSV文件")
+    parser.add_argument("--min-gap", type=int, default=3)
+    parser.add_argument("--regions", type=int, default=20, help="单个文件时最多列出的分歧区间数")
+    args = parser.parse_args()
+
+    if len(args.paths) == 1:
+        print(stroke_diff_report(compare_stroke_methods(load_klines(args.paths[0]), min_gap=args.min_gap), args.regions))
+    else:
+        print(compare_universe(args.paths, min_gap=args.min_gap, verbose=True).to_string(index=False))
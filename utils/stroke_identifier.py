@@ -1,12 +1,15 @@
 # utils/stroke_identifier.py
-from datetime import datetime
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 from core.Chan_base import Stroke
-from utils import (
-    combine_kline,
-    detect_fractals,
-    find_all_necessary_points,
-    print_necessary_points
-)
+from utils import combine_kline
+from utils.backend import get_kernel, register_kernel
+from utils.fractal_table import FractalTable, detect_fractal_table
+from utils.necessary_point_finder import find_all_necessary_points_from_table
+from utils.shared_arrays import SharedArrays, open_columns
+from utils.price_ticks import resolve_tick_size
+from utils.stage_log import stage_print
 
 from core.Chan_base import KLine
 
@@ -200,7 +203,156 @@ def identify_strokes_from_necessary_points(combined_klines, top_fractals, bottom
     return stroke_sequence
 
 
-def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fractals):
+@register_kernel("stroke_dp")
+def _stroke_dp(kind, mid, reach, min_gap=3):
+    """
+    内部函数：窗口内最长笔序列的动态规划（内层循环向量化）
+
+    返回:
+        tuple: (dp_len, dp_prev)，dp_len[i]为到第i个分型的最长序列长度（-1表示不可达），dp_prev[i]为前驱
+    """
+    n = len(mid)
+    dp_len = np.full(n, -1, dtype='i8')
+    dp_prev = np.full(n, -1, dtype='i8')
+    if n == 0:
+        return dp_len, dp_prev
+    dp_len[0] = 1
+    for i in range(1, n):
+        valid = (kind[:i] != kind[i]) & (mid[i] - mid[:i] > min_gap) & (reach[:i] >= mid[i]) & (dp_len[:i] != -1)
+        if not valid.any():
+            continue
+        candidates = np.where(valid, dp_len[:i], -1)
+        j = int(np.argmax(candidates))      # 同长度取最早的前驱，与逐个比较的结果一致
+        dp_len[i] = candidates[j] + 1
+        dp_prev[i] = j
+    return dp_len, dp_prev
+
+
+def identify_strokes_from_table(table, necessary_point_begin, necessary_point_end, min_gap=3):
+    """
+    基于分型表的笔序列识别：结果与identify_strokes_from_necessary_points一致
+
+    笔的有效性改为数组判断：类型相反、中间K线序号差大于3、且终点不超过起点分型的reach
+    （起点分型之后第一根价格越界的合并K线），动态规划由table.backend对应的内核完成
+
+    参数:
+        table: FractalTable对象
+        necessary_point_begin: 起始必要分型
+        necessary_point_end: 结束必要分型
+        min_gap: 笔的起止分型中间K线序号之差须大于min_gap
+    返回:
+        符合条件的笔序列（分型列表）
+    """
+    row_begin = table.row_of(necessary_point_begin)
+    row_end = table.row_of(necessary_point_end)
+    if row_begin > row_end:
+        row_begin, row_end = row_end, row_begin
+    rows = _window_rows(table.kind, table.mid, table.reach, row_begin, row_end, table.backend, min_gap)
+    return [table.fractal(row) for row in rows]
+
+
+def _window_rows(kind, mid, reach, row_begin, row_end, backend=None, min_gap=3):
+    """内部函数：分型表第row_begin~row_end行之间的最长笔序列，返回行号列表（无有效序列为空列表）"""
+    kind = kind[row_begin:row_end + 1]
+    mid = mid[row_begin:row_end + 1]
+    reach = reach[row_begin:row_end + 1]
+    n = len(mid)
+    if n < 2:
+        return []
+
+    dp_len, dp_prev = get_kernel("stroke_dp", backend)(kind, mid, reach, min_gap)
+    if dp_len[n - 1] == -1:
+        return []
+
+    rows = []
+    current_idx = n - 1
+    while current_idx != -1:
+        rows.append(row_begin + current_idx)
+        current_idx = int(dp_prev[current_idx])
+    rows.reverse()
+    return rows
+
+
+def identify_stroke_rows(kind, mid, reach, point_rows, backend=None, min_gap=3):
+    """
+    行号形式的identify_strokes（分型表各列可为内存映射数组）：结果与identify_strokes一致
+
+    参数:
+        kind/mid/reach: 分型表的kind/mid/reach列
+        point_rows: 必经点的分型表行号
+        backend: 计算后端（见utils.backend）
+    返回:
+        list: 笔端点的分型表行号（相邻两项构成一笔）
+    """
+    points = sorted(point_rows, key=lambda row: mid[row])
+    result = []
+    for begin, end in zip(points, points[1:]):
+        if kind[begin] == kind[end]:
+            continue
+        rows = _window_rows(kind, mid, reach, begin, end, backend, min_gap)
+        if len(rows) < 2:
+            continue
+        # 当前窗口的起点即上一个窗口的终点
+        result.extend(rows[1:] if result and result[-1] == rows[0] else rows)
+    return list(dict.fromkeys(result))
+
+
+# 进程池工作进程内的只读分型表数组（由_init_window_worker设置）
+_worker_arrays = None
+
+def _init_window_worker(handles, backend, min_gap):
+    """内部函数：进程池初始化，工作进程按句柄打开共享内存中的分型表数组（不复制）"""
+    global _worker_arrays
+    columns = open_columns(handles)
+    _worker_arrays = (columns["kind"], columns["mid"], columns["reach"], backend, min_gap)
+
+def _worker_window_rows(row_begin, row_end):
+    """内部函数：在工作进程中识别一个窗口"""
+    kind, mid, reach, backend, min_gap = _worker_arrays
+    return _window_rows(kind, mid, reach, row_begin, row_end, backend, min_gap)
+
+
+def _identify_windows_parallel(table, windows, max_workers, pool="thread", min_gap=3):
+    """
+    内部函数：并行识别各必经点窗口内的笔序列
+
+    参数:
+        table: FractalTable对象（各窗口共享的只读数组）
+        windows: [(窗口序号, 起始必要分型, 结束必要分型)]
+        max_workers: 并行数
+        pool: "thread"（线程池，numba后端的内核释放GIL）或"process"（进程池）
+    返回:
+        dict: {窗口序号: 分型列表}，与逐个调用identify_strokes_from_table的结果相同
+    """
+    tasks = []
+    for i, begin, end in windows:
+        row_begin, row_end = sorted((table.row_of(begin), table.row_of(end)))
+        tasks.append((i, row_begin, row_end))
+    # 大窗口先提交，缩短整体耗时；结果按窗口序号收集，与完成顺序无关
+    tasks.sort(key=lambda t: t[1] - t[2])
+    kind, mid, reach = table.kind, table.mid, table.reach
+
+    shared = SharedArrays() if pool == "process" else None
+    if pool == "process":
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_window_worker,
+                                       initargs=(shared.put_fractal_table("table", table), table.backend, min_gap))
+    elif pool == "thread":
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        raise ValueError(f"未知的并行方式：{pool}")
+
+    with executor, shared or contextlib.nullcontext():
+        futures = {}
+        for i, row_begin, row_end in tasks:
+            if pool == "process":
+                futures[i] = executor.submit(_worker_window_rows, row_begin, row_end)
+            else:
+                futures[i] = executor.submit(_window_rows, kind, mid, reach, row_begin, row_end, table.backend, min_gap)
+        return {i: [table.fractal(row) for row in future.result()] for i, future in futures.items()}
+
+
+def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fractals, fractal_table=None,
+                     max_workers=None, pool="thread", min_gap=3):
     """
     对外暴露的笔识别函数：基于必经点构建符合缠论规则的笔
     采用滑动窗口方式，对必经点两两一组处理
@@ -210,11 +362,17 @@ def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fra
         necessary_points: 必经点字典列表（find_all_necessary_points返回值）
         top_fractals: 顶分型列表
         bottom_fractals: 底分型列表
+        fractal_table: 分型表（FractalTable），给出时窗口内识别改用identify_strokes_from_table，
+                       top_fractals/bottom_fractals可传None
+        max_workers: 大于1时各必经点窗口并行识别（基于分型表；未给出fractal_table时由分型列表构建），
+                     结果与串行识别相同
+        pool: 并行方式，"thread"或"process"
+        min_gap: 笔的起止分型中间K线序号之差须大于min_gap（基于分型表时生效）
     返回:
         list: 识别到的笔列表（Stroke对象）
     """
     if len(necessary_points) < 2:
-        print("[笔识别] 警告：有效必经点不足2个，无法构建笔")
+        stage_print("[笔识别] 警告：有效必经点不足2个，无法构建笔")
         return []
 
     # 1. 预处理必经点：提取核心信息并按时间排序
@@ -231,9 +389,20 @@ def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fra
     
     # 按时间排序（确保笔的时间顺序正确）
     valid_points_sorted = sorted(valid_points, key=lambda x: x["time"])
-    print(f"[笔识别] 预处理后有效必经点数量：{len(valid_points_sorted)}（已按时间排序）")
+    stage_print(f"[笔识别] 预处理后有效必经点数量：{len(valid_points_sorted)}（已按时间排序）")
     
     # 2. 滑动窗口处理：两两一组处理必经点
+    window_results = {}
+    if max_workers is not None and max_workers > 1:
+        if fractal_table is None:
+            fractal_table = FractalTable.from_fractals(combined_klines, top_fractals, bottom_fractals)
+        windows = [
+            (i, valid_points_sorted[i]["fractal_obj"], valid_points_sorted[i + 1]["fractal_obj"])
+            for i in range(len(valid_points_sorted) - 1)
+            if valid_points_sorted[i]["type"] != valid_points_sorted[i + 1]["type"]
+        ]
+        window_results = _identify_windows_parallel(fractal_table, windows, max_workers, pool, min_gap)
+
     all_stroke_fractals = []
     # 从第0个点开始，每次取当前点和下一个点组成窗口
     for i in range(len(valid_points_sorted) - 1):
@@ -242,20 +411,30 @@ def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fra
         
         # 检查两个点类型是否相反
         if current_point["type"] == next_point["type"]:
-            print(f"[笔识别] 警告：第{i}组必经点类型相同（{current_point['type']}），跳过处理")
+            stage_print(f"[笔识别] 警告：第{i}组必经点类型相同（{current_point['type']}），跳过处理")
             continue
         
         # 3. 调用辅助函数识别当前窗口内的笔序列
-        window_fractals = identify_strokes_from_necessary_points(
-            combined_klines=combined_klines,
-            top_fractals=top_fractals,
-            bottom_fractals=bottom_fractals,
-            necessary_point_begin=current_point["fractal_obj"],
-            necessary_point_end=next_point["fractal_obj"]
-        )
+        if i in window_results:
+            window_fractals = window_results[i]
+        elif fractal_table is not None:
+            window_fractals = identify_strokes_from_table(
+                fractal_table,
+                necessary_point_begin=current_point["fractal_obj"],
+                necessary_point_end=next_point["fractal_obj"],
+                min_gap=min_gap
+            )
+        else:
+            window_fractals = identify_strokes_from_necessary_points(
+                combined_klines=combined_klines,
+                top_fractals=top_fractals,
+                bottom_fractals=bottom_fractals,
+                necessary_point_begin=current_point["fractal_obj"],
+                necessary_point_end=next_point["fractal_obj"]
+            )
         
         if not window_fractals or len(window_fractals) < 2:
-            print(f"[笔识别] 第{i}组必经点之间未识别到有效笔序列")
+            stage_print(f"[笔识别] 第{i}组必经点之间未识别到有效笔序列")
             continue
         
         # 避免重复添加（当前窗口的终点是下一个窗口的起点）
@@ -274,7 +453,7 @@ def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fra
     all_stroke_fractals = unique_fractals
     
     if not all_stroke_fractals or len(all_stroke_fractals) < 2:
-        print("[笔识别] 整体未识别到有效的笔序列")
+        stage_print("[笔识别] 整体未识别到有效的笔序列")
         return []
     
     # 4. 将分型序列转换为Stroke对象列表
@@ -296,7 +475,31 @@ def identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fra
         )
         stroke_list.append(stroke)
     
-    print(f"[笔识别] 成功识别 {len(stroke_list)} 笔")
+    stage_print(f"[笔识别] 成功识别 {len(stroke_list)} 笔")
+    return stroke_list
+
+def identify_strokes_greedy(combined_klines, fractal_table=None, min_gap=3, backend=None):
+    """
+    快速笔识别：对分型序列单遍贪心构建（顶底交替，同类型更极端的分型替换端点），复杂度O(n)
+
+    与identify_strokes（必经点 + 动态规划）的结果不保证一致，差异可用utils.stroke_compare统计；
+    适合对大量标的做初筛
+
+    参数:
+        combined_klines: 合并后的stCombineK对象列表
+        fractal_table: 分型表（FractalTable），None时由combined_klines检测
+        min_gap: 笔的起止分型中间K线序号之差须大于min_gap
+        backend: 计算后端（见utils.backend），给出fractal_table时取其backend
+    返回:
+        list: 识别到的笔列表（Stroke对象）
+    """
+    if fractal_table is None:
+        fractal_table = detect_fractal_table(combined_klines, backend=backend)
+    table = fractal_table
+    rows = get_kernel("stroke_greedy", table.backend)(table.kind, table.mid, table.price, table.reach, min_gap)
+    fractals = [table.fractal(row) for row in rows.tolist()]
+    stroke_list = [Stroke(start_fractal=a, end_fractal=b) for a, b in zip(fractals, fractals[1:])]
+    stage_print(f"[笔识别] 贪心模式识别 {len(stroke_list)} 笔")
     return stroke_list
 
 def identify_strokes_from_pandas(df):
@@ -320,7 +523,7 @@ def identify_strokes_from_pandas(df):
                 index=index
             )
             kline_list.append(kline)
-        print(f"✅ 转换为{len(kline_list)}个KLine对象")
+        stage_print(f"✅ 转换为{len(kline_list)}个KLine对象")
         return kline_list
     # 转换为KLine对象列表
     kline_list = df_to_kline_list(df)
@@ -328,31 +531,51 @@ def identify_strokes_from_pandas(df):
     # 合并K线（根据实际情况调整参数）
     combined_klines = combine_kline(kline_list)
     
-    # 检测分型
-    top_fractals, bottom_fractals = detect_fractals(combined_klines)
+    # 检测分型（分型表）
+    fractal_table = detect_fractal_table(combined_klines)
     
     # 查找必经点
-    necessary_points = find_all_necessary_points(combined_klines, top_fractals, bottom_fractals)
+    necessary_points = find_all_necessary_points_from_table(fractal_table)
     
     # 识别笔
-    stroke_list = identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fractals)
+    stroke_list = identify_strokes(combined_klines, necessary_points, None, None, fractal_table=fractal_table)
+    top_fractals, bottom_fractals = fractal_table.top_fractals(), fractal_table.bottom_fractals()
     
     return stroke_list, kline_list, combined_klines, top_fractals, bottom_fractals
 
-def identify_strokes_from_klines(kline_list):
+# 笔识别方式："dp"为必经点 + 动态规划（identify_strokes），"greedy"为单遍贪心（identify_strokes_greedy）
+STROKE_METHODS = ("dp", "greedy")
+
+
+def identify_strokes_from_klines(kline_list, backend=None, max_workers=None, pool="thread", method="dp", tick_size=None):
     """
     从KLine对象列表中识别笔
+
+    backend: 计算后端（"python"/"numba"/"auto"，见utils.backend）；None时合并K线用对象实现，其余步骤用全局默认后端
+    max_workers/pool: 必经点窗口并行识别（见identify_strokes）
+    method: 笔识别方式（见STROKE_METHODS）
+    tick_size: 最小变动价位（或"auto"）；给出时合并K线与分型按int64整数价格精确比较（见utils.price_ticks）
     """
+    if method not in STROKE_METHODS:
+        raise ValueError(f"未知的笔识别方式：{method}")
+    if tick_size is not None:
+        tick_size = resolve_tick_size(tick_size, kline_list)
+
     # 合并K线（根据实际情况调整参数）
-    combined_klines = combine_kline(kline_list)
+    combined_klines = combine_kline(kline_list, backend=backend, tick_size=tick_size)
     
-    # 检测分型
-    top_fractals, bottom_fractals = detect_fractals(combined_klines)
+    # 检测分型（分型表）
+    fractal_table = detect_fractal_table(combined_klines, backend=backend, tick_size=tick_size)
     
-    # 查找必经点
-    necessary_points = find_all_necessary_points(combined_klines, top_fractals, bottom_fractals)
-    
-    # 识别笔
-    stroke_list = identify_strokes(combined_klines, necessary_points, top_fractals, bottom_fractals)
+    if method == "greedy":
+        stroke_list = identify_strokes_greedy(combined_klines, fractal_table)
+    else:
+        # 查找必经点
+        necessary_points = find_all_necessary_points_from_table(fractal_table)
+
+        # 识别笔
+        stroke_list = identify_strokes(combined_klines, necessary_points, None, None, fractal_table=fractal_table,
+                                       max_workers=max_workers, pool=pool)
+    top_fractals, bottom_fractals = fractal_table.top_fractals(), fractal_table.bottom_fractals()
     
     return stroke_list, combined_klines, top_fractals, bottom_fractals
\ No newline at end of file
@@ -0,0 +1,59 @@
+# utils/stroke_stats.py
+from itertools import accumulate
+
+
+class StrokeStatsIndex:
+    """
+    原始K线前缀和索引：每个标的构建一次，任意原始K线区间的成交量、成交额、K线数均为O(1)查询
+
+    笔的区间由分型中间K线的pos_begin/pos_end映射到原始K线（Stroke.raw_begin/raw_end），
+    调用attach后，Stroke.volume/amount即可直接读取（未绑定的笔两者均为None）
+    """
+    def __init__(self, kline_list):
+        self._cum_volume = [0] + list(accumulate(k.volume for k in kline_list))
+        self._cum_amount = [0] + list(accumulate(getattr(k, 'amount', 0) for k in kline_list))
+
+    def __len__(self):
+        return len(self._cum_volume) - 1
+
+    def append(self, kline):
+        """追加一根原始K线（增量场景）"""
+        self._cum_volume.append(self._cum_volume[-1] + kline.volume)
+        self._cum_amount.append(self._cum_amount[-1] + getattr(kline, 'amount', 0))
+
+    def volume(self, begin, end):
+        """原始K线闭区间[begin, end]的成交量"""
+        return self._cum_volume[end + 1] - self._cum_volume[begin]
+
+    def amount(self, begin, end):
+        """原始K线闭区间[begin, end]的成交额"""
+        return self._cum_amount[end + 1] - self._cum_amount[begin]
+
+    @staticmethod
+    def bar_count(begin, end):
+        """原始K线闭区间[begin, end]的K线数"""
+        return end - begin + 1
+
+    def attach(self, strokes):
+        """把索引绑定到笔（或线段中的笔）上，返回strokes本身"""
+        for stroke in strokes:
+            stroke.stats_index = self
+        return strokes
+
+    def stroke_stats(self, stroke):
+        """
+        笔的统计指标
+
+        返回:
+            dict: volume, amount, bar_count, amplitude, speed
+        """
+        begin, end = stroke.raw_begin, stroke.raw_end
+        bar_count = end - begin + 1
+        amplitude = stroke.high - stroke.low
+        return {
+            "volume": self.volume(begin, end),
+            "amount": self.amount(begin, end),
+            "bar_count": bar_count,
+            "amplitude": amplitude,
+            "speed": amplitude / bar_count,
+        }
@@ -0,0 +1,175 @@
+# utils/structure_history.py
+import copy
+from bisect import bisect_right
+from core.Chan_base import stCombineK
+from utils.incremental_chan import IncrementalChan
+from utils.stage_log import quiet
+
+
+# 笔的变化类型（同utils.event_log的STROKE_NEW/STROKE_EXTEND/STROKE_CONFIRM）
+STROKE_NEW = "new"              # 笔产生（或起点改变）
+STROKE_EXTEND = "extend"        # 起点不变、终点改变
+STROKE_CONFIRM = "confirm"      # 其后出现了下一笔
+
+
+class StructureHistory:
+    """
+    带版本的结构存储：逐根K线单次处理，记录每个分型、每一笔出现、变化和确认的时刻，
+    之后可查询任意历史时刻的结构（与只用当时已有K线重新计算的结果一致，无未来函数）
+
+    bar_index表示"第bar_index根K线收盘后"，对应前缀kline_list[:bar_index + 1]
+    - 分型：已确认顶/底分型分别按确认顺序保存（确认K线序号单调），另按K线保存当时的临时分型
+    - 笔：只记录变化（产生/延伸/确认，见stroke_events），按位置保存各版本，
+      bar_index时刻第p笔为位置p上最后一个born_at <= bar_index的版本
+
+    构建代价：合并K线与分型逐根增量更新；笔只在分型集合变化时重新识别（与IncrementalChan.strokes相同，
+    约为K线数的一半），分型集合不变时笔列表为同一对象，不做比较
+    """
+    def __init__(self, symbol="", verbose=False):
+        """
+        参数:
+            symbol: 标的代码
+            verbose: 是否保留笔识别等阶段的打印输出
+        """
+        self.chan = IncrementalChan(symbol)
+        self.verbose = verbose
+        self.confirmed = []         # 已确认分型（按确认顺序）
+        self.confirmed_at = []      # 对应的确认K线序号
+        self._confirmed_by_type = {'top': ([], []), 'bottom': ([], [])}   # 类型 → ([确认K线序号], [分型])
+        self._tentative = []        # 每根K线收盘后的临时分型（右侧K线为当时状态的副本），无则None
+        self._positions = []        # 位置p上的笔版本：([born_at...], [(Stroke, 是否确认)...])
+        self._count_at = []         # 笔数量发生变化的K线序号
+        self._counts = []           # 变化后的笔数量
+        self._rows = []             # 当前笔列表的(起点时间, 终点时间, 是否确认)
+        self._stroke_list = None    # 上次比较过的chan.strokes（未重新识别时为同一列表）
+        self.stroke_events = []     # 笔的变化：(K线序号, STROKE_NEW/STROKE_EXTEND/STROKE_CONFIRM, 位置, Stroke)
+
+    def __len__(self):
+        return len(self.chan.klines)
+
+    @classmethod
+    def build(cls, kline_list, symbol="", verbose=False):
+        """对整段K线单次处理，返回可做历史查询的StructureHistory"""
+        history = cls(symbol, verbose)
+        history.extend(kline_list)
+        return history
+
+    def append(self, kline):
+        """接收一根已完成的K线并记录结构变化"""
+        chan = self.chan
+        fractal = chan.append(kline)
+        i = len(chan.klines) - 1
+        if fractal is not None:
+            self.confirmed.append(fractal)
+            self.confirmed_at.append(i)
+            at, fractals = self._confirmed_by_type[fractal.fractal_type]
+            at.append(i)
+            fractals.append(fractal)
+
+        tentative = chan.tentative_fractal
+        if tentative is not None:
+            # 右侧K线仍会被后续K线修改，保存当时状态的副本
+            right = tentative.combined_klines[2]
+            snapshot = stCombineK(copy.copy(right.data), right.pos_begin, right.pos_end, right.pos_extreme, right.isUp, right.index)
+            tentative = type(tentative)(tentative.combined_klines[:2] + [snapshot])
+        self._tentative.append(tentative)
+
+        with quiet(not self.verbose):
+            strokes = chan.strokes
+        if strokes is not self._stroke_list:
+            self._stroke_list = strokes
+            self._record_strokes(strokes, i)
+
+    def _record_strokes(self, strokes, i):
+        """内部函数：与已记录的笔逐个比较，记录有变化的位置（判断方式同EventLogWriter._stroke_rows）"""
+        count = len(strokes)
+        rows = [(s.start_fractal.time, s.end_fractal.time, p < count - 1) for p, s in enumerate(strokes)]
+        for p, row in enumerate(rows):
+            old = self._rows[p] if p < len(self._rows) else None
+            if old == row:
+                continue
+            if old is None or old[0] != row[0]:
+                kind = STROKE_NEW
+            elif old[1] != row[1]:
+                kind = STROKE_EXTEND
+            else:
+                kind = STROKE_CONFIRM
+            if p == len(self._positions):
+                self._positions.append(([], []))
+            born_at, versions = self._positions[p]
+            born_at.append(i)
+            versions.append((strokes[p], row[2]))
+            self.stroke_events.append((i, kind, p, strokes[p]))
+        if count != len(self._rows):
+            self._count_at.append(i)
+            self._counts.append(count)
+        self._rows = rows
+
+    def extend(self, kline_list):
+        """批量接收K线"""
+        for kline in kline_list:
+            self.append(kline)
+
+    def _check(self, bar_index):
+        if not 0 <= bar_index < len(self.chan.klines):
+            raise IndexError(f"bar_index超出范围：{bar_index}")
+
+    def fractals_as_of(self, bar_index):
+        """
+        第bar_index根K线收盘后的分型（二分定位O(log n)，另加复制结果的O(分型数)）
+
+        返回:
+            tuple: (顶分型列表, 底分型列表)，与detect_fractals(combine_kline(kline_list[:bar_index + 1]))一致
+        """
+        self._check(bar_index)
+        tops, bottoms = (fractals[:bisect_right(at, bar_index)]
+                         for at, fractals in (self._confirmed_by_type['top'], self._confirmed_by_type['bottom']))
+        tentative = self._tentative[bar_index]
+        if tentative is not None:
+            (tops if tentative.fractal_type == 'top' else bottoms).append(tentative)
+        return tops, bottoms
+
+    def stroke_count_as_of(self, bar_index):
+        """第bar_index根K线收盘后的笔数（O(log n)）"""
+        self._check(bar_index)
+        k = bisect_right(self._count_at, bar_index)
+        return self._counts[k - 1] if k else 0
+
+    def stroke_state_as_of(self, bar_index, position):
+        """第bar_index根K线收盘后的第position笔及其是否已确认（O(log n)），不存在则为None"""
+        count = self.stroke_count_as_of(bar_index)
+        if position < 0:
+            position += count
+        if not 0 <= position < count:
+            return None
+        born_at, versions = self._positions[position]
+        return versions[bisect_right(born_at, bar_index) - 1]
+
+    def stroke_as_of(self, bar_index, position):
+        """第bar_index根K线收盘后的第position笔（O(log n)），不存在则为None"""
+        state = self.stroke_state_as_of(bar_index, position)
+        return state[0] if state else None
+
+    def confirmed_at_of(self, position, bar_index=None):
+        """
+        第position笔（取bar_index时刻的版本，None为最新）被确认（其后出现下一笔）的K线序号，尚未确认为None（O(log n)）
+
+        起止不变时版本只在确认状态变化时新增，因此已确认版本的born_at即确认时刻
+        """
+        bar_index = len(self.chan.klines) - 1 if bar_index is None else bar_index
+        self._check(bar_index)
+        if not 0 <= position < self.stroke_count_as_of(bar_index):
+            return None
+        born_at, versions = self._positions[position]
+        k = bisect_right(born_at, bar_index) - 1
+        return born_at[k] if versions[k][1] else None
+
+    def strokes_as_of(self, bar_index):
+        """
+        第bar_index根K线收盘后的笔列表（O(笔数 × log n)）
+
+        与identify_strokes_from_klines(kline_list[:bar_index + 1])的笔一致；
+        笔的终点若为当时的临时分型，其右侧合并K线为最新状态（分型的时间、价格不受影响）
+        """
+        count = self.stroke_count_as_of(bar_index)
+        return [self.stroke_as_of(bar_index, p) for p in range(count)]
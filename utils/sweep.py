@@ -0,0 +1,167 @@
+# utils/sweep.py
+import contextvars
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.kline_combiner import combine_kline
+from utils.fractal_table import detect_fractal_table
+from utils.necessary_point_finder import find_all_necessary_points_from_table
+from utils.stroke_identifier import identify_strokes, identify_strokes_greedy, STROKE_METHODS
+from utils.signal_detector import detect_second_buy_sell
+from utils.data_loader import load_klines, symbol_from_path
+from utils.shared_arrays import SharedArrays, SharedArrayHandle, open_bars, release_shared
+from utils.bar_array import array_to_klines
+from utils.price_ticks import resolve_tick_size
+from utils.stage_log import quiet
+
+
+# 可扫描的规则参数及默认值（默认值即现有规则）
+DEFAULT_PARAMS = {
+    "eps": 1e-5,            # 价格比较阈值（K线合并、分型）
+    "tick_size": None,      # 最小变动价位：给出时按int64整数价格精确比较，eps不再起作用（见utils.price_ticks）
+    "strict": True,         # 严格分型：高低点均需高于/低于两侧
+    "min_gap": 3,           # 笔的起止分型中间K线序号差、初始必经点间距须大于该值
+    "pattern_strokes": 4,   # 二买/二卖形态的笔数
+    "stroke_method": "dp",  # 笔识别方式："dp"（必经点 + 动态规划）或"greedy"（单遍贪心）
+}
+
+# 各阶段依赖的参数：参数相同的阶段结果在同一标的的各组参数之间复用
+_STAGE_KEYS = {
+    "combined": ("eps", "tick_size"),
+    "table": ("eps", "tick_size", "strict"),
+    "necessary_points": ("eps", "tick_size", "strict", "min_gap"),
+    "strokes": ("eps", "tick_size", "strict", "min_gap", "stroke_method"),
+}
+
+
+def parameter_grid(**grid):
+    """
+    参数网格：parameter_grid(min_gap=[2, 3, 4], strict=[True, False]) → 各组合的完整参数字典列表
+    （未给出的参数取DEFAULT_PARAMS）
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"未知参数：{sorted(unknown)}")
+    names = list(grid)
+    return [dict(DEFAULT_PARAMS, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+
+
+def analyze_with_params(kline_list, params=None, backend=None, cache=None):
+    """
+    按给定规则参数完成合并K线 → 分型表 → 必经点 → 笔的计算
+
+    参数:
+        kline_list: 原始KLine对象列表
+        params: 规则参数（缺省项取DEFAULT_PARAMS）
+        backend: 计算后端（见utils.backend）
+        cache: 同一kline_list的阶段结果缓存（dict），多组参数共用时各阶段只按所依赖的参数计算一次
+    返回:
+        dict: combined/table/necessary_points/strokes（贪心笔识别时necessary_points为None）
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    if params["stroke_method"] not in STROKE_METHODS:
+        raise ValueError(f"未知的笔识别方式：{params['stroke_method']}")
+    cache = {} if cache is None else cache
+
+    def stage(name, compute):
+        key = (name,) + tuple(params[p] for p in _STAGE_KEYS[name])
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    # combine_kline的数组内核不修改输入K线，各组参数可共用同一kline_list
+    tick_size = resolve_tick_size(params["tick_size"], kline_list) if params["tick_size"] is not None else None
+    combined = stage("combined", lambda: combine_kline(kline_list, backend=backend or "auto", eps=params["eps"],
+                                                       tick_size=tick_size))
+    table = stage("table", lambda: detect_fractal_table(combined, backend, params["eps"], params["strict"], tick_size))
+    if params["stroke_method"] == "greedy":
+        necessary_points = None
+        strokes = stage("strokes", lambda: identify_strokes_greedy(combined, table, params["min_gap"]))
+    else:
+        necessary_points = stage("necessary_points", lambda: find_all_necessary_points_from_table(table, params["min_gap"]))
+        strokes = stage("strokes", lambda: identify_strokes(combined, necessary_points, None, None, fractal_table=table,
+                                                            min_gap=params["min_gap"]))
+    return {"combined": combined, "table": table, "necessary_points": necessary_points, "strokes": strokes}
+
+
+def summarize(result, params):
+    """默认评估函数：笔的数量与平均幅度/长度，以及最后一根K线处的二买/二卖"""
+    strokes = result["strokes"]
+    table = result["table"]
+    is_second_buy, is_second_sell = detect_second_buy_sell(
+        result["combined"], table.top_fractals(), table.bottom_fractals(), strokes, params["pattern_strokes"])
+    return {
+        "combined": len(result["combined"]),
+        "fractals": len(table),
+        "strokes": len(strokes),
+        "mean_amplitude": sum(s.amplitude for s in strokes) / len(strokes) if strokes else 0.0,
+        "mean_bars": sum(s.bar_count for s in strokes) / len(strokes) if strokes else 0.0,
+        "second_buy": is_second_buy,
+        "second_sell": is_second_sell,
+    }
+
+
+def _sweep_symbol(symbol, source, variants, evaluate, backend, verbose):
+    """内部函数：一个标的上依次评估全部参数组合（共享阶段结果）"""
+    if isinstance(source, str):
+        kline_list = load_klines(source, symbol)
+    elif isinstance(source, SharedArrayHandle):
+        kline_list = open_bars(source, symbol)
+        release_shared(source)      # KLine列表已是副本，映射不再需要
+    elif isinstance(source, np.ndarray):
+        kline_list = array_to_klines(source, symbol)
+    else:
+        kline_list = source
+    cache = {}
+    rows = []
+    # 按阶段参数排序，使相邻组合尽量共享缓存
+    ordered = sorted(variants, key=lambda p: tuple(str(p[k]) for k in DEFAULT_PARAMS))
+    with quiet(not verbose):
+        for params in ordered:
+            result = analyze_with_params(kline_list, params, backend, cache)
+            rows.append(dict({"symbol": symbol}, **params, **evaluate(result, params)))
+    return rows
+
+
+def run_sweep(sources, grid, evaluate=summarize, max_workers=None, pool="process", backend=None, verbose=False):
+    """
+    参数扫描：在多个标的上评估一组规则参数，标的之间并行，同一标的内复用共享阶段
+
+    参数:
+        sources: CSV路径列表，或{标的: KLine列表或BAR_DTYPE数组}字典
+                 （使用进程池时K线放入共享内存，只向工作进程传递句柄）
+        grid: 参数组合列表（parameter_grid返回值），或传给parameter_grid的字典
+        evaluate: 评估函数evaluate(result, params) → dict（使用进程池时须为模块级函数）
+        max_workers: 并行数（None或1为串行）
+        pool: "process"或"thread"
+        backend: 计算后端（见utils.backend）
+        verbose: 是否保留各阶段的打印输出
+    返回:
+        DataFrame: 每个标的、每组参数一行（symbol、各参数、evaluate返回的各项）
+    """
+    variants = parameter_grid(**grid) if isinstance(grid, dict) else [dict(DEFAULT_PARAMS, **p) for p in grid]
+    if isinstance(sources, dict):
+        tasks = list(sources.items())
+    else:
+        tasks = [(symbol_from_path(path), path) for path in sources]
+
+    if not max_workers or max_workers <= 1:
+        results = [_sweep_symbol(symbol, source, variants, evaluate, backend, verbose) for symbol, source in tasks]
+    elif pool == "process":
+        with SharedArrays() as shared, ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_sweep_symbol, symbol, source if isinstance(source, str) else shared.put_bars(symbol, source),
+                                       variants, evaluate, backend, verbose)
+                       for symbol, source in tasks]
+            results = [future.result() for future in futures]
+    elif pool == "thread":
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, _sweep_symbol, symbol, source, variants,
+                                       evaluate, backend, verbose)
+                       for symbol, source in tasks]
+            results = [future.result() for future in futures]
+    else:
+        raise ValueError(f"未知的并行方式：{pool}")
+    rows = [row for symbol_rows in results for row in symbol_rows]
+    print(f"[参数扫描] {len(tasks)} 个标的 × {len(variants)} 组参数，共 {len(rows)} 行结果")
+    return pd.DataFrame(rows)
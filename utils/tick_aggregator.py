@@ -0,0 +1,197 @@
+# utils/tick_aggregator.py
+from core.Chan_base import KLine
+
+
+# 国内期货常用交易时段（本地时间，"HH:MM"）
+CN_FUTURES_DAY_SESSIONS = (("09:00", "10:15"), ("10:30", "11:30"), ("13:30", "15:00"))
+
+
+def futures_sessions(night_end=None):
+    """
+    生成期货交易时段：日盘 + 可选夜盘（21:00开始，night_end可跨零点，如"23:00"/"01:00"/"02:30"）
+    """
+    sessions = list(CN_FUTURES_DAY_SESSIONS)
+    if night_end:
+        sessions.append(("21:00", night_end))
+    return tuple(sessions)
+
+
+def _parse_clock(text):
+    """内部函数："HH:MM" → 当日秒数"""
+    hour, minute = text.split(":")
+    return int(hour) * 3600 + int(minute) * 60
+
+
+class _OpenBar:
+    """内部类：一个周期上正在形成的K线"""
+    __slots__ = ("start", "end", "kline")
+
+    def __init__(self, start, end, kline):
+        self.start = start
+        self.end = end
+        self.kline = kline
+
+
+class TickAggregator:
+    """
+    Tick→多周期K线聚合器：同时生成多个周期（如1m/5m/15m）的K线，并把收盘K线直接交给增量分析器
+
+    - 周期按交易时段起点对齐，跨越休市的K线在时段结束时截断（如10:00-10:15）
+    - 夜盘可跨零点（如("21:00", "02:30")）
+    - 恰在时段终点的tick计入该时段最后一根K线
+    - 迟到（乱序）的tick：所属K线已收盘（被更晚的tick或on_time收盘）时不再修改K线，按周期计入late
+    - K线时间取收盘时刻（与data目录中的数据一致，如09:00-09:15的K线记为09:15）
+    - 时间戳与仓库其它部分一致：本地时间按UTC换算成秒（pd.to_datetime(...).timestamp()），
+      如使用真实UTC时间戳，传入tz_offset=8*3600
+    """
+    def __init__(self, intervals=(60, 300, 900), sessions=None, symbol="", on_bar=None, on_partial=None, tz_offset=0):
+        """
+        参数:
+            intervals: 周期列表（秒）
+            sessions: 交易时段列表[("HH:MM", "HH:MM"), ...]，None表示全天连续
+            symbol: 标的代码
+            on_bar: 收盘回调 on_bar(interval, kline)
+            on_partial: 未完成K线回调 on_partial(interval, kline, preview)，preview为分析器预览结果或None
+            tz_offset: 时间戳换算为本地时钟的偏移秒数
+        """
+        self.intervals = tuple(intervals)
+        self.sessions = [(_parse_clock(s), _parse_clock(e)) for s, e in sessions] if sessions else None
+        self.symbol = symbol
+        self.on_bar = on_bar
+        self.on_partial = on_partial
+        self.tz_offset = tz_offset
+        self._open = {iv: None for iv in self.intervals}
+        self._count = {iv: 0 for iv in self.intervals}
+        self._closed = {iv: None for iv in self.intervals}     # 周期 → 最后收盘K线的起点
+        self.late = {iv: 0 for iv in self.intervals}           # 周期 → 因所属K线已收盘而丢弃的tick数
+        self._analyzers = {}
+        self._amending = {}         # 周期 → 分析器的最后一根K线是否为未完成K线（amend模式）
+
+    def attach(self, interval, analyzer, feed_partial=False, amend=False):
+        """
+        把某个周期的K线直接交给分析器（如IncrementalChan）：收盘K线调用analyzer.append，
+        feed_partial=True时每个tick后以未完成K线调用analyzer.preview；
+        amend=True时未完成K线直接写入分析器（首个tick调用append，之后调用replace_last），
+        分析器状态即为盘中实时状态，收盘时以最终K线replace_last
+        """
+        if interval not in self._open:
+            raise ValueError(f"未配置的周期：{interval}")
+        self._analyzers[interval] = (analyzer, feed_partial, amend)
+        self._amending[interval] = False
+
+    def _session_of(self, t):
+        """内部函数：返回tick所在交易时段的(起点, 终点)时间戳，不在交易时段内返回None"""
+        if self.sessions is None:
+            return None, None
+        local = t + self.tz_offset
+        sec = local % 86400
+        day_start = t - sec
+        for start, end in self.sessions:
+            if end > start:
+                if start <= sec <= end:
+                    return day_start + start, day_start + end
+            elif sec >= start:
+                return day_start + start, day_start + 86400 + end
+            elif sec <= end:
+                return day_start - 86400 + start, day_start + end
+        return False
+
+    def _bucket(self, t, interval, session):
+        """内部函数：计算tick所属K线的(起点, 终点)"""
+        session_start, session_end = session
+        if session_start is None:
+            start = t - (t + self.tz_offset) % interval
+            return start, start + interval
+        n = int((t - session_start) // interval)
+        last_n = int(-(-(session_end - session_start) // interval)) - 1
+        start = session_start + min(n, last_n) * interval
+        return start, min(start + interval, session_end)
+
+    def _close(self, interval):
+        """内部函数：收盘当前周期的K线并分发"""
+        bar = self._open[interval]
+        if bar is None:
+            return
+        self._open[interval] = None
+        self._closed[interval] = bar.start
+        self._count[interval] += 1
+        if interval in self._analyzers:
+            analyzer = self._analyzers[interval][0]
+            if self._amending[interval]:
+                analyzer.replace_last(bar.kline)
+                self._amending[interval] = False
+            else:
+                analyzer.append(bar.kline)
+        if self.on_bar:
+            self.on_bar(interval, bar.kline)
+
+    def on_tick(self, time, price, volume=0):
+        """
+        接收一笔成交
+
+        参数:
+            time: 时间戳（秒）
+            price: 成交价
+            volume: 本笔成交量（增量，而非累计成交量）
+        返回:
+            bool: tick是否落在交易时段内并被采用（在全部周期上都迟到的tick为False）
+        """
+        session = self._session_of(time)
+        if session is False:
+            return False
+
+        adopted = False
+        for interval in self.intervals:
+            start, end = self._bucket(time, interval, session)
+            bar = self._open[interval]
+            closed = self._closed[interval]
+            if (bar is not None and start < bar.start) or (bar is None and closed is not None and start <= closed):
+                self.late[interval] += 1   # 迟到的tick，所属K线已收盘
+                continue
+            adopted = True
+            if bar is not None and bar.start != start:
+                self._close(interval)
+                bar = None
+
+            if bar is None:
+                kline = KLine(time=end, open=price, high=price, low=price, close=price,
+                              volume=volume, symbol=self.symbol, index=self._count[interval])
+                bar = self._open[interval] = _OpenBar(start, end, kline)
+            else:
+                kline = bar.kline
+                if price > kline.high:
+                    kline.high = price
+                if price < kline.low:
+                    kline.low = price
+                kline.close = price
+                kline.volume += volume
+
+            analyzer, feed_partial, amend = self._analyzers.get(interval, (None, False, False))
+            if amend:
+                if self._amending[interval]:
+                    analyzer.replace_last(kline)
+                else:
+                    analyzer.append(kline)
+                    self._amending[interval] = True
+            if self.on_partial or feed_partial:
+                preview = analyzer.preview(kline) if feed_partial and not amend else None
+                if self.on_partial:
+                    self.on_partial(interval, kline, preview)
+        return adopted
+
+    def on_time(self, now):
+        """定时驱动：收盘所有在now之前已到收盘时刻的K线（无需等待下一笔tick）"""
+        for interval in self.intervals:
+            bar = self._open[interval]
+            if bar is not None and bar.end <= now:
+                self._close(interval)
+
+    def flush(self):
+        """收盘所有未完成K线（如数据结束）"""
+        for interval in self.intervals:
+            self._close(interval)
+
+    def current_bar(self, interval):
+        """返回某周期正在形成的K线，没有则为None"""
+        bar = self._open[interval]
+        return bar.kline if bar else None
@@ -5,11 +5,14 @@ from .plot_utils import (
     draw_strokes,
     create_kline_figure
 )
+from .live_chart import LiveChart, LiveBoard
 
 __all__ = [
     "plot_kline",
     "mark_fractals",
     "draw_strokes",
     "create_kline_figure",
-    "draw_buy_points"
+    "draw_buy_points",
+    "LiveChart",
+    "LiveBoard"
 ]
\ No newline at end of file
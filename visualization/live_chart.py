@@ -0,0 +1,322 @@
+import time
+from datetime import datetime
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.ticker import FuncFormatter
+
+
+class LiveChart:
+    """
+    实时K线图：跟随增量分析器（IncrementalChan）逐根更新，只替换已有图元的数据，不重建坐标轴
+
+    - K线（影线/实体）、分型标记、笔、未完成笔、买卖点各为一个固定图元
+    - x轴为K线序号（休市无空档），只保留最近window根K线；K线走到右边界时翻半页
+    - 坐标范围不变时用blit只重绘这些图元（坐标轴、网格、刻度沿用缓存的背景），
+      滚动或价格超出纵轴范围时才整图重绘；两次重绘间隔不小于min_interval秒，期间的更新合并到下一次
+
+    用法:
+        chart = LiveChart(analyzer, title="rb2601 15分钟")
+        aggregator.attach(900, analyzer, amend=True)
+        ...每个tick或每根K线后: chart.update()
+    """
+    def __init__(self, analyzer, ax=None, window=200, title="", min_interval=0.5, blit=True):
+        """
+        参数:
+            analyzer: IncrementalChan（盘中K线可用replace_last更新，图随之移动）
+            ax: 绘图坐标轴，None时新建
+            window: 显示的K线数
+            title: 标题
+            min_interval: 最小重绘间隔（秒）
+            blit: 是否使用blit局部重绘（后端不支持时自动整图重绘）
+        """
+        if ax is None:
+            _, ax = plt.subplots(figsize=(12, 6))
+        self.analyzer = analyzer
+        self.ax = ax
+        self.window = window
+        self.min_interval = min_interval
+        self.blit = blit and ax.figure.canvas.supports_blit
+
+        self._times = []            # 已同步K线的时间（下标即x坐标）
+        self._x_of_time = {}        # K线时间 → x坐标（分型、笔端点定位用）
+        self._signals = {"buy": ([], []), "sell": ([], [])}
+        self._view_start = 0        # 当前显示的第一根K线
+        self._background = None
+        self._need_full = True      # 坐标范围变化，下次需整图重绘
+        self._stroke_key = None     # 笔图元对应的(分型集合标识, 显示起点)，不变时不必读取笔列表
+        self._dirty = False
+        self._last_draw = 0.0
+
+        # 图元（颜色与plot_utils一致：阳线红、阴线绿，顶分型深红、底分型深绿）
+        self._wicks = LineCollection([], linewidths=1, zorder=2)
+        self._bodies = PolyCollection([], edgecolors='none', alpha=0.8, zorder=3)
+        ax.add_collection(self._wicks)
+        ax.add_collection(self._bodies)
+        self._tops, = ax.plot([], [], linestyle='none', marker='v', color='darkred', markersize=8, zorder=5, label='顶分型')
+        self._bottoms, = ax.plot([], [], linestyle='none', marker='^', color='darkgreen', markersize=8, zorder=5, label='底分型')
+        self._strokes = LineCollection([], linewidths=2, alpha=0.8, zorder=4, label='笔')
+        ax.add_collection(self._strokes)
+        self._tentative, = ax.plot([], [], color='gray', linewidth=2, linestyle='--', alpha=0.8, zorder=4, label='未完成笔')
+        self._buys, = ax.plot([], [], linestyle='none', marker='D', color='blue', markersize=8,
+                              markeredgecolor='black', zorder=6, label='买点')
+        self._sells, = ax.plot([], [], linestyle='none', marker='D', color='orange', markersize=8,
+                               markeredgecolor='black', zorder=6, label='卖点')
+        self._artists = [self._wicks, self._bodies, self._strokes, self._tentative,
+                         self._tops, self._bottoms, self._buys, self._sells]
+        if self.blit:
+            for artist in self._artists:
+                artist.set_animated(True)
+
+        # 坐标轴样式（与plot_kline一致）
+        ax.xaxis.set_major_formatter(FuncFormatter(self._format_x))
+        ax.set_title(title, fontsize=12, fontweight='bold', pad=10)
+        ax.set_ylabel('价格', fontsize=10)
+        ax.grid(True, linestyle='--', alpha=0.5)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.legend(loc='upper left', fontsize=8, framealpha=0.9)
+        ax.set_xlim(-0.5, window - 0.5)
+        self._cid = ax.figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+    # ------------------------------------------------------------------
+    # 数据同步
+    # ------------------------------------------------------------------
+    def _format_x(self, x, pos=None):
+        """内部函数：x轴刻度（K线序号 → 时间）"""
+        i = int(round(x))
+        if 0 <= i < len(self._times):
+            return datetime.fromtimestamp(self._times[i]).strftime('%m-%d %H:%M')
+        return ""
+
+    def _sync_bars(self):
+        """内部函数：同步新增K线与最后一根（可能被替换）K线，返回显示范围内的K线"""
+        klines = self.analyzer.klines
+        n = len(klines)
+        start = max(len(self._times) - 1, 0)
+        del self._times[start:]
+        for i in range(start, n):
+            self._times.append(klines[i].time)
+            self._x_of_time[klines[i].time] = i
+
+        # 到达右边界时翻半页（每window/2根K线才整图重绘一次）
+        if n - 1 >= self._view_start + self.window:
+            self._view_start = max(n - self.window // 2, 0)
+            self.ax.set_xlim(self._view_start - 0.5, self._view_start + self.window - 0.5)
+            self._need_full = True
+        return klines[self._view_start:n]
+
+    def _update_candles(self, visible):
+        """内部函数：重设影线和实体的数据（只含显示范围内的K线），价格超出纵轴范围时扩展"""
+        x0 = self._view_start
+        segments, verts, colors = [], [], []
+        low, high = float('inf'), float('-inf')
+        for x, k in enumerate(visible, x0):
+            segments.append(((x, k.low), (x, k.high)))
+            verts.append(((x - 0.3, k.open), (x - 0.3, k.close), (x + 0.3, k.close), (x + 0.3, k.open)))
+            colors.append('red' if k.close >= k.open else 'green')
+            low = min(low, k.low)
+            high = max(high, k.high)
+        self._wicks.set_segments(segments)
+        self._wicks.set_color(colors)
+        self._bodies.set_verts(verts)
+        self._bodies.set_facecolor(colors)
+
+        if visible:
+            y0, y1 = self.ax.get_ylim()
+            if self._need_full or low < y0 or high > y1:
+                # 留出较宽的余量，价格小幅创新高/新低时不必整图重绘
+                margin = (high - low) * 0.25 or abs(high) * 0.01 or 1.0
+                self.ax.set_ylim(low - margin, high + margin)
+                self._need_full = True
+
+    def _visible_points(self, items, key, end=None):
+        """内部函数：从列表末尾（或第end项之前）向前取显示范围内的项（列表按时间排序），返回[(x, 项)]"""
+        points = []
+        for i in range((len(items) if end is None else end) - 1, -1, -1):
+            item = items[i]
+            x = self._x_of_time.get(key(item))
+            if x is None:
+                continue
+            if x < self._view_start:
+                break
+            points.append((x, item))
+        points.reverse()
+        return points
+
+    def _update_structure(self):
+        """内部函数：分型标记、笔与未完成笔"""
+        tops = self._visible_points(self.analyzer.top_fractals, lambda f: f.time)
+        bottoms = self._visible_points(self.analyzer.bottom_fractals, lambda f: f.time)
+        self._tops.set_data([x for x, _ in tops], [f.price for _, f in tops])
+        self._bottoms.set_data([x for x, _ in bottoms], [f.price for _, f in bottoms])
+
+        # 笔只随分型集合变化：分型集合与显示范围都不变时沿用已有图元，不读取笔列表
+        key = (self.analyzer._fractal_key(), self._view_start)
+        if key == self._stroke_key:
+            return
+        self._stroke_key = key
+
+        # 最后一笔的终点仍可能变化，画成虚线
+        strokes = self.analyzer.strokes
+        visible = self._visible_points(strokes, lambda s: s.end_fractal.time, len(strokes) - 1)
+        segments, colors = [], []
+        for x, s in visible:
+            start_x = self._x_of_time.get(s.start_fractal.time, x)
+            segments.append(((start_x, s.start_fractal.price), (x, s.end_fractal.price)))
+            colors.append('darkred' if s.direction == 'up' else 'darkgreen')
+        self._strokes.set_segments(segments)
+        self._strokes.set_color(colors)
+        last = strokes[-1] if strokes else None
+        xs = [self._x_of_time.get(last.start_fractal.time), self._x_of_time.get(last.end_fractal.time)] if last else [None]
+        if None in xs:
+            self._tentative.set_data([], [])
+        else:
+            self._tentative.set_data(xs, [last.start_fractal.price, last.end_fractal.price])
+
+    def _update_signals(self):
+        """内部函数：买卖点标记"""
+        for kind, line in (("buy", self._buys), ("sell", self._sells)):
+            xs, ys = self._signals[kind]
+            line.set_data(xs, ys)
+
+    def add_signal(self, time, price, kind="buy"):
+        """
+        添加买卖点标记（下次update时显示）
+
+        参数:
+            time: 信号所在K线的时间（须为已接收的K线）
+            price: 标记价格
+            kind: "buy"或"sell"
+        """
+        if kind not in self._signals:
+            raise ValueError(f"未知的信号类型：{kind}")
+        x = self._x_of_time.get(time)
+        if x is None:
+            raise ValueError(f"图中没有该时间的K线：{time}")
+        xs, ys = self._signals[kind]
+        xs.append(x)
+        ys.append(price)
+        self._dirty = True
+
+    def sync(self):
+        """
+        按分析器当前状态更新全部图元的数据（不重绘）
+
+        返回:
+            bool: 坐标范围是否变化（需整图重绘）
+        """
+        visible = self._sync_bars()
+        self._update_candles(visible)
+        self._update_structure()
+        self._update_signals()
+        self._dirty = True
+        return self._need_full
+
+    # ------------------------------------------------------------------
+    # 重绘
+    # ------------------------------------------------------------------
+    def _on_draw(self, event):
+        """内部函数：整图重绘后缓存背景，并画上动态图元"""
+        if not self.blit:
+            return
+        canvas = self.ax.figure.canvas
+        self._background = canvas.copy_from_bbox(self.ax.bbox)
+        for artist in self._artists:
+            self.ax.draw_artist(artist)
+        self._need_full = False
+
+    def blit_artists(self):
+        """只重绘动态图元（需已有背景缓存；返回是否完成）"""
+        if not self.blit or self._background is None or self._need_full:
+            return False
+        canvas = self.ax.figure.canvas
+        canvas.restore_region(self._background)
+        for artist in self._artists:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.ax.bbox)
+        self._dirty = False
+        return True
+
+    def draw(self, force=False):
+        """
+        重绘（距上次重绘不足min_interval秒且force为False时跳过）
+
+        返回:
+            bool: 是否重绘
+        """
+        now = time.monotonic()
+        if not self._dirty or (not force and now - self._last_draw < self.min_interval):
+            return False
+        if not self.blit_artists():
+            canvas = self.ax.figure.canvas
+            canvas.draw()
+            if not self.blit:
+                self._need_full = False
+            self._dirty = False
+        self.ax.figure.canvas.flush_events()
+        self._last_draw = now
+        return True
+
+    def update(self, force=False):
+        """同步分析器状态并按节流规则重绘，返回是否重绘"""
+        self.sync()
+        return self.draw(force)
+
+    def close(self):
+        """断开重绘回调"""
+        self.ax.figure.canvas.mpl_disconnect(self._cid)
+
+
+class LiveBoard:
+    """
+    多标的实时看板：一个图中每个标的一个LiveChart，整体节流
+
+    各图的数据每次update都会同步，但重绘至多每min_interval秒一次；
+    只有坐标范围变化的图需要整图重绘时才重绘整个图，否则各图分别blit
+    """
+    def __init__(self, analyzers, cols=3, window=120, min_interval=1.0, figsize=None, blit=True):
+        """
+        参数:
+            analyzers: {标的: IncrementalChan}
+            cols: 每行的图数
+            window: 每个图显示的K线数
+            min_interval: 最小重绘间隔（秒）
+        """
+        symbols = list(analyzers)
+        rows = max(-(-len(symbols) // cols), 1)
+        self.fig, axes = plt.subplots(rows, cols, figsize=figsize or (5 * cols, 3.2 * rows), squeeze=False)
+        self.charts = {}
+        for ax, symbol in zip(axes.flat, symbols):
+            self.charts[symbol] = LiveChart(analyzers[symbol], ax, window, symbol, 0.0, blit)
+        for ax in list(axes.flat)[len(symbols):]:
+            ax.set_visible(False)
+        self.min_interval = min_interval
+        self._last_draw = 0.0
+        self._dirty = set()
+
+    def update(self, symbols=None, force=False):
+        """
+        同步标的（None为全部）的图元数据，并按节流规则重绘
+
+        返回:
+            bool: 是否重绘
+        """
+        for symbol in (self.charts if symbols is None else symbols):
+            self.charts[symbol].sync()
+            self._dirty.add(symbol)
+        now = time.monotonic()
+        if not self._dirty or (not force and now - self._last_draw < self.min_interval):
+            return False
+
+        charts = [self.charts[symbol] for symbol in self._dirty]
+        if any(chart._need_full or chart._background is None for chart in charts):
+            self.fig.canvas.draw()
+            for chart in self.charts.values():
+                chart._dirty = chart._need_full = False
+        else:
+            for chart in charts:
+                chart.blit_artists()
+        self.fig.canvas.flush_events()
+        self._dirty.clear()
+        self._last_draw = now
+        return True